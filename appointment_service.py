@@ -9,11 +9,19 @@ In production:
 """
 
 from datetime import datetime, date
-from typing import List, Dict, Optional
-from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Iterable, Iterator
 from enum import Enum
+from bisect import bisect_left, insort
+from array import array
+from functools import lru_cache
+import sys
 import uuid
 
+try:
+    import numpy as np
+except ImportError:  # AppointmentTable falls back to pure-Python scans
+    np = None
+
 
 class AppointmentStatus(Enum):
     CONFIRMED = "Confirmed"
@@ -28,24 +36,393 @@ class AppointmentMode(Enum):
     PHONE = "Phone"
 
 
-@dataclass
+# Cached: records on the same day/minute share one int object, and
+# repeated dates skip parsing.
+@lru_cache(maxsize=65536)
+def encode_date(value: str) -> int:
+    """'YYYY-MM-DD' -> proleptic Gregorian ordinal (sorts like the string)."""
+    return date.fromisoformat(value).toordinal()
+
+
+def decode_date(day: int) -> str:
+    return date.fromordinal(day).isoformat()
+
+
+@lru_cache(maxsize=2048)
+def encode_time(value: str) -> int:
+    """'HH:MM' -> minute of day."""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def decode_time(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
 class Appointment:
-    id: str
-    name: str
-    date: str  # YYYY-MM-DD format
-    time: str  # HH:MM format
-    duration: int  # minutes
-    doctor_name: str
-    status: AppointmentStatus
-    mode: AppointmentMode
-    reason: Optional[str] = None
+    """
+    Appointment record.
+
+    Slotted (no per-instance __dict__) with the date stored as a day ordinal
+    and the time as minute of day, so comparisons and sorts are on ints.
+    `date` and `time` still read and write as 'YYYY-MM-DD' / 'HH:MM' strings.
+    Doctor names are interned: records share one string per doctor.
+    """
+
+    __slots__ = ('id', 'name', 'day', 'minute', 'duration', '_doctor_name',
+                 'status', 'mode', 'reason')
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        date: str,  # YYYY-MM-DD format
+        time: str,  # HH:MM format
+        duration: int,  # minutes
+        doctor_name: str,
+        status: AppointmentStatus,
+        mode: AppointmentMode,
+        reason: Optional[str] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.day = encode_date(date)
+        self.minute = encode_time(time)
+        self.duration = duration
+        self.doctor_name = doctor_name
+        self.status = status
+        self.mode = mode
+        self.reason = reason
+
+    @property
+    def date(self) -> str:
+        return decode_date(self.day)
+
+    @date.setter
+    def date(self, value: str) -> None:
+        self.day = encode_date(value)
+
+    @property
+    def time(self) -> str:
+        return decode_time(self.minute)
+
+    @time.setter
+    def time(self, value: str) -> None:
+        self.minute = encode_time(value)
+
+    @property
+    def doctor_name(self) -> str:
+        return self._doctor_name
+
+    @doctor_name.setter
+    def doctor_name(self, value: str) -> None:
+        self._doctor_name = sys.intern(value)
+
+    @property
+    def sort_key(self) -> tuple:
+        return (self.day, self.minute, self.id)
+
+    def _fields(self) -> tuple:
+        return (self.id, self.name, self.day, self.minute, self.duration,
+                self._doctor_name, self.status, self.mode, self.reason)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Appointment):
+            return NotImplemented
+        return self._fields() == other._fields()
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return (
+            f"Appointment(id={self.id!r}, name={self.name!r}, date={self.date!r}, "
+            f"time={self.time!r}, duration={self.duration!r}, "
+            f"doctor_name={self.doctor_name!r}, status={self.status!r}, "
+            f"mode={self.mode!r}, reason={self.reason!r})"
+        )
+
+
+class AppointmentStore:
+    """
+    In-memory appointment store with lookup indexes.
+
+    Mirrors the indexes the Aurora table would carry:
+    - id -> appointment dict for O(1) get, update and delete
+    - sorted (day, minute, id) keys for ordered scans and bisect range queries
+    - day, status and doctor -> set of ids for filter lookups
+    - sorted distinct days, overall and per doctor, for calendar queries
+
+    Mutate appointments through the store (or the module functions) so the
+    indexes stay in step; changing fields on a stored object directly does not
+    re-index it.
+    """
+
+    def __init__(self, appointments: Iterable[Appointment] = ()):
+        self._by_id: Dict[str, Appointment] = {}
+        self._order: List[tuple] = []
+        self._by_date: Dict[str, set] = {}
+        self._by_status: Dict[str, set] = {}
+        self._by_doctor: Dict[str, set] = {}
+        self._days: Dict[Optional[str], List[int]] = {}
+        self._day_counts: Dict[tuple, int] = {}
+        for apt in appointments:
+            self.add(apt)
+
+    @staticmethod
+    def _sort_key(apt: Appointment) -> tuple:
+        return apt.sort_key
+
+    def _secondary(self, apt: Appointment):
+        return (
+            (self._by_date, apt.day),
+            (self._by_status, apt.status.value),
+            (self._by_doctor, apt.doctor_name),
+        )
+
+    def _index(self, apt: Appointment) -> None:
+        insort(self._order, self._sort_key(apt))
+        for index, value in self._secondary(apt):
+            index.setdefault(value, set()).add(apt.id)
+        # None = all doctors
+        for doctor in (None, apt.doctor_name):
+            key = (doctor, apt.day)
+            self._day_counts[key] = self._day_counts.get(key, 0) + 1
+            if self._day_counts[key] == 1:
+                insort(self._days.setdefault(doctor, []), apt.day)
+
+    def _unindex(self, apt: Appointment) -> None:
+        del self._order[bisect_left(self._order, self._sort_key(apt))]
+        for index, value in self._secondary(apt):
+            ids = index[value]
+            ids.discard(apt.id)
+            if not ids:
+                del index[value]
+        for doctor in (None, apt.doctor_name):
+            key = (doctor, apt.day)
+            self._day_counts[key] -= 1
+            if not self._day_counts[key]:
+                del self._day_counts[key]
+                days = self._days[doctor]
+                del days[bisect_left(days, apt.day)]
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Appointment]:
+        return (self._by_id[key[2]] for key in self._order)
+
+    def get(self, appointment_id: str) -> Optional[Appointment]:
+        return self._by_id.get(appointment_id)
+
+    def add(self, apt: Appointment) -> Appointment:
+        if apt.id in self._by_id:
+            raise ValueError(f"Duplicate appointment id {apt.id}")
+        self._by_id[apt.id] = apt
+        self._index(apt)
+        return apt
+
+    append = add  # list-style callers of the former mock_appointments
+
+    def update(self, appointment_id: str, **changes) -> Optional[Appointment]:
+        apt = self._by_id.get(appointment_id)
+        if apt is None:
+            return None
+        # Encode (and so validate) date/time before the record leaves the
+        # indexes: a bad value raises with the store untouched
+        if 'date' in changes:
+            changes['day'] = encode_date(changes.pop('date'))
+        if 'time' in changes:
+            changes['minute'] = encode_time(changes.pop('time'))
+        self._unindex(apt)
+        try:
+            for name, value in changes.items():
+                setattr(apt, name, value)
+        finally:
+            self._index(apt)
+        return apt
+
+    def remove(self, appointment_id: str) -> Optional[Appointment]:
+        apt = self._by_id.pop(appointment_id, None)
+        if apt is not None:
+            self._unindex(apt)
+        return apt
+
+    def _slice(self, lo: int, hi: int) -> List[Appointment]:
+        return [self._by_id[key[2]] for key in self._order[lo:hi]]
+
+    def between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Appointment]:
+        """Appointments with start <= date <= end (either bound optional), sorted."""
+        lo = bisect_left(self._order, (encode_date(start),)) if start else 0
+        hi = bisect_left(self._order, (encode_date(end) + 1,)) if end else len(self._order)
+        return self._slice(lo, hi)
+
+    def before(self, day: str) -> List[Appointment]:
+        return self._slice(0, bisect_left(self._order, (encode_date(day),)))
+
+    def after(self, day: str) -> List[Appointment]:
+        return self._slice(bisect_left(self._order, (encode_date(day) + 1,)), len(self._order))
+
+    def query(
+        self,
+        date: Optional[str] = None,
+        status: Optional[str] = None,
+        doctor_name: Optional[str] = None,
+    ) -> List[Appointment]:
+        """Filtered appointments sorted by (date, time)."""
+        lookups = [
+            index.get(value, set())
+            for index, value in (
+                (self._by_date, date and encode_date(date)),
+                (self._by_status, status),
+                (self._by_doctor, doctor_name),
+            )
+            if value
+        ]
+        if not lookups:
+            return list(self)
+
+        ids = set.intersection(*sorted(lookups, key=len))
+        return sorted((self._by_id[i] for i in ids), key=self._sort_key)
+
+    def days(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        doctor_name: Optional[str] = None,
+    ) -> List[int]:
+        """Sorted distinct day ordinals with appointments, bounds inclusive."""
+        days = self._days.get(doctor_name, [])
+        lo = bisect_left(days, encode_date(start)) if start else 0
+        hi = bisect_left(days, encode_date(end) + 1) if end else len(days)
+        return days[lo:hi]
+
+    def dates(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        doctor_name: Optional[str] = None,
+    ) -> List[str]:
+        return [decode_date(day) for day in self.days(start, end, doctor_name)]
+
+    def doctors(self) -> List[str]:
+        return sorted(self._by_doctor)
+
+
+class AppointmentTable:
+    """
+    Columnar appointment table for replay and analytics jobs.
+
+    Each field is one column: days, minutes and durations in typed `array`s,
+    doctor/status/mode as small integer codes into per-table dictionaries,
+    and the free-text fields in plain lists. A million rows cost a few
+    bytes per numeric field instead of a Python object each.
+
+    `filter` evaluates its predicates over whole columns — as NumPy masks
+    when NumPy is installed (zero-copy views of the arrays), otherwise as
+    a single pure-Python pass — and returns matching row indices.
+    """
+
+    _STATUSES = list(AppointmentStatus)
+    _MODES = list(AppointmentMode)
+
+    def __init__(self, appointments: Iterable[Appointment] = ()):
+        self.ids: List[str] = []
+        self.names: List[str] = []
+        self.reasons: List[Optional[str]] = []
+        self.days = array('i')
+        self.minutes = array('h')
+        self.durations = array('h')
+        self.doctor_codes = array('i')
+        self.status_codes = array('b')
+        self.mode_codes = array('b')
+        self.doctors: List[str] = []
+        self._doctor_code: Dict[str, int] = {}
+        for apt in appointments:
+            self.append(apt)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, apt: Appointment) -> None:
+        code = self._doctor_code.get(apt.doctor_name)
+        if code is None:
+            code = self._doctor_code[apt.doctor_name] = len(self.doctors)
+            self.doctors.append(apt.doctor_name)
+
+        self.ids.append(apt.id)
+        self.names.append(apt.name)
+        self.reasons.append(apt.reason)
+        self.days.append(apt.day)
+        self.minutes.append(apt.minute)
+        self.durations.append(apt.duration)
+        self.doctor_codes.append(code)
+        self.status_codes.append(self._STATUSES.index(apt.status))
+        self.mode_codes.append(self._MODES.index(apt.mode))
+
+    def row(self, i: int) -> Appointment:
+        apt = Appointment.__new__(Appointment)
+        apt.id = self.ids[i]
+        apt.name = self.names[i]
+        apt.day = self.days[i]
+        apt.minute = self.minutes[i]
+        apt.duration = self.durations[i]
+        apt._doctor_name = self.doctors[self.doctor_codes[i]]
+        apt.status = self._STATUSES[self.status_codes[i]]
+        apt.mode = self._MODES[self.mode_codes[i]]
+        apt.reason = self.reasons[i]
+        return apt
+
+    def rows(self, indices: Iterable[int]) -> List[Appointment]:
+        return [self.row(int(i)) for i in indices]
+
+    def filter(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        status: Optional[str] = None,
+        doctor_name: Optional[str] = None,
+    ):
+        """Indices of rows with start <= date <= end, status and doctor matching."""
+        lo = encode_date(start) if start else None
+        hi = encode_date(end) if end else None
+        status_code = (
+            self._STATUSES.index(AppointmentStatus(status)) if status else None
+        )
+        doctor_code = self._doctor_code.get(doctor_name, -1) if doctor_name else None
+
+        if np is not None:
+            return self._filter_numpy(lo, hi, status_code, doctor_code)
+
+        return [
+            i for i, (day, st, doc) in enumerate(
+                zip(self.days, self.status_codes, self.doctor_codes)
+            )
+            if (lo is None or day >= lo)
+            and (hi is None or day <= hi)
+            and (status_code is None or st == status_code)
+            and (doctor_code is None or doc == doctor_code)
+        ]
+
+    def _filter_numpy(self, lo, hi, status_code, doctor_code):
+        mask = np.ones(len(self), dtype=bool)
+        if lo is not None or hi is not None:
+            days = np.frombuffer(self.days, dtype=np.int32)
+            if lo is not None:
+                mask &= days >= lo
+            if hi is not None:
+                mask &= days <= hi
+        if status_code is not None:
+            mask &= np.frombuffer(self.status_codes, dtype=np.int8) == status_code
+        if doctor_code is not None:
+            mask &= np.frombuffer(self.doctor_codes, dtype=np.int32) == doctor_code
+        return np.flatnonzero(mask)
 
 
 # ============================================================================
 # MOCK DATA - Simulating Aurora PostgreSQL fetch
 # In production: SELECT * FROM appointments WHERE clinic_id = ?
 # ============================================================================
-mock_appointments: List[Appointment] = [
+store = AppointmentStore([
     Appointment(
         id="apt-001",
         name="Sarah Johnson",
@@ -267,7 +644,11 @@ mock_appointments: List[Appointment] = [
         mode=AppointmentMode.IN_PERSON,
         reason="Neurology assessment"
     ),
-]
+])
+
+# Former name of the store (a plain list before the indexes): iterating,
+# len() and append() still work
+mock_appointments = store
 
 
 def get_appointments(filters: Optional[Dict] = None) -> List[Appointment]:
@@ -290,19 +671,10 @@ def get_appointments(filters: Optional[Dict] = None) -> List[Appointment]:
     Returns:
         Filtered and sorted list of appointments
     """
-    result = list(mock_appointments)
+    filters = filters or {}
     
-    if filters:
-        if filters.get('date'):
-            result = [apt for apt in result if apt.date == filters['date']]
-        
-        if filters.get('status'):
-            result = [apt for apt in result if apt.status.value == filters['status']]
-    
-    # Sort by date and time
-    result.sort(key=lambda x: (x.date, x.time))
-    
-    return result
+    # Index lookups; results come back sorted by date and time
+    return store.query(date=filters.get('date'), status=filters.get('status'))
 
 
 def update_appointment_status(appointment_id: str, new_status: str) -> Optional[Appointment]:
@@ -355,20 +727,66 @@ def update_appointment_status(appointment_id: str, new_status: str) -> Optional[
     Returns:
         Updated appointment or None if not found
     """
-    for apt in mock_appointments:
-        if apt.id == appointment_id:
-            # Convert string to enum
-            apt.status = AppointmentStatus(new_status)
-            
-            # In production:
-            # - This is where the AppSync subscription would be triggered
-            # - All connected clients would receive the update via WebSocket
-            # - The queue management display would update in real-time
-            # - Notification service would send SMS/email to patient if applicable
-            
-            return apt
-    
-    return None
+    if store.get(appointment_id) is None:
+        return None
+    # Convert string to enum
+    apt = store.update(appointment_id, status=AppointmentStatus(new_status))
+    
+    # In production:
+    # - This is where the AppSync subscription would be triggered
+    # - All connected clients would receive the update via WebSocket
+    # - The queue management display would update in real-time
+    # - Notification service would send SMS/email to patient if applicable
+    
+    return apt
+
+
+def update_appointment_statuses(changes: List[Dict]) -> List[Dict]:
+    """
+    Mutation Function: update_appointment_statuses([{id, status}, ...])
+    
+    Applies many status changes at once (end-of-day check-out).
+    
+    In production this is one statement for the whole batch:
+        ```sql
+        UPDATE appointments
+        SET status = CASE id WHEN :id1 THEN :status1 WHEN :id2 THEN :status2 END,
+            updated_at = NOW()
+        WHERE id IN (:id1, :id2);
+        ```
+    
+    Args:
+        changes: List of dicts with 'id' and 'status'
+    
+    Returns:
+        One result per change: {'id', 'ok', 'error'?}
+    """
+    results = []
+    seen = set()
+    for change in changes:
+        appointment_id = change['id']
+        if store.get(appointment_id) is None:
+            error = 'Appointment not found'
+        elif appointment_id in seen:
+            error = 'Duplicate id in batch'
+        else:
+            try:
+                status = AppointmentStatus(change['status'])
+            except ValueError:
+                error = f"Unknown status '{change['status']}'"
+            else:
+                error = None
+                seen.add(appointment_id)
+                store.update(appointment_id, status=status)
+        
+        result = {'id': appointment_id, 'ok': error is None}
+        if error:
+            result['error'] = error
+        results.append(result)
+    
+    # In production: one AppSync publish per changed appointment
+    
+    return results
 
 
 def create_appointment(data: Dict) -> Appointment:
@@ -415,7 +833,7 @@ def create_appointment(data: Dict) -> Appointment:
         reason=data.get('reason')
     )
     
-    mock_appointments.append(new_appointment)
+    store.add(new_appointment)
     
     # In production: AppSync subscription would be triggered here
     
@@ -448,30 +866,19 @@ def update_appointment(appointment_id: str, data: Dict) -> Optional[Appointment]
     Returns:
         Updated appointment or None if not found
     """
-    for apt in mock_appointments:
-        if apt.id == appointment_id:
-            if 'name' in data:
-                apt.name = data['name']
-            if 'date' in data:
-                apt.date = data['date']
-            if 'time' in data:
-                apt.time = data['time']
-            if 'duration' in data:
-                apt.duration = data['duration']
-            if 'doctor_name' in data:
-                apt.doctor_name = data['doctor_name']
-            if 'mode' in data:
-                apt.mode = AppointmentMode(data['mode'])
-            if 'reason' in data:
-                apt.reason = data['reason']
-            if 'status' in data:
-                apt.status = AppointmentStatus(data['status'])
-            
-            # In production: AppSync subscription would be triggered here
-            
-            return apt
-    
-    return None
+    changes = {
+        key: data[key]
+        for key in ('name', 'date', 'time', 'duration', 'doctor_name', 'reason')
+        if key in data
+    }
+    if 'mode' in data:
+        changes['mode'] = AppointmentMode(data['mode'])
+    if 'status' in data:
+        changes['status'] = AppointmentStatus(data['status'])
+    
+    # In production: AppSync subscription would be triggered here
+    
+    return store.update(appointment_id, **changes)
 
 
 def delete_appointment(appointment_id: str) -> bool:
@@ -502,13 +909,11 @@ def delete_appointment(appointment_id: str) -> bool:
     Returns:
         True if deleted, False if not found
     """
-    global mock_appointments
-    original_length = len(mock_appointments)
-    mock_appointments = [apt for apt in mock_appointments if apt.id != appointment_id]
+    removed = store.remove(appointment_id)
     
     # In production: AppSync subscription would be triggered here
     
-    return len(mock_appointments) < original_length
+    return removed is not None
 
 
 def get_appointments_by_tab(tab: str, reference_date: str) -> List[Appointment]:
@@ -522,27 +927,61 @@ def get_appointments_by_tab(tab: str, reference_date: str) -> List[Appointment]:
     Returns:
         Filtered list of appointments
     """
-    all_appointments = get_appointments()
-    
     if tab == 'today':
-        return [apt for apt in all_appointments if apt.date == reference_date]
+        return store.between(reference_date, reference_date)
     elif tab == 'upcoming':
-        return [apt for apt in all_appointments if apt.date > reference_date]
+        return store.after(reference_date)
     elif tab == 'past':
-        return [apt for apt in all_appointments if apt.date < reference_date]
+        return store.before(reference_date)
     
-    return all_appointments
+    return list(store)
 
 
-def get_appointment_dates() -> List[str]:
+def get_appointment_dates(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    doctor_name: Optional[str] = None,
+) -> List[str]:
     """
     Get unique dates that have appointments (for calendar highlighting).
     
+    In production this would be a DISTINCT over the doctor/date index:
+        ```sql
+        SELECT DISTINCT queue_date FROM appointments
+        WHERE doctor_name = :doctor AND queue_date BETWEEN :start AND :end
+        ORDER BY queue_date;
+        ```
+    
+    Args:
+        start: Optional first date (YYYY-MM-DD), inclusive
+        end: Optional last date (YYYY-MM-DD), inclusive
+        doctor_name: Optional doctor filter
+    
     Returns:
         Sorted list of date strings
     """
-    dates = set(apt.date for apt in mock_appointments)
-    return sorted(list(dates))
+    return store.dates(start, end, doctor_name)
+
+
+def get_month_occupancy(year: int, doctor_name: Optional[str] = None) -> List[int]:
+    """
+    Get a year of calendar highlighting as twelve month bitmaps.
+    
+    Bit (day - 1) of months[month - 1] is set when that day has at least
+    one appointment (same encoding as the backend's /bitmap endpoint).
+    
+    Args:
+        year: Calendar year
+        doctor_name: Optional doctor filter
+    
+    Returns:
+        List of 12 integers
+    """
+    months = [0] * 12
+    for day in store.days(f"{year:04d}-01-01", f"{year:04d}-12-31", doctor_name):
+        d = date.fromordinal(day)
+        months[d.month - 1] |= 1 << (d.day - 1)
+    return months
 
 
 def get_doctors() -> List[str]:
@@ -552,8 +991,7 @@ def get_doctors() -> List[str]:
     Returns:
         List of doctor names
     """
-    doctors = set(apt.doctor_name for apt in mock_appointments)
-    return sorted(list(doctors))
+    return store.doctors()
 
 
 # ============================================================================
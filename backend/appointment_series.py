@@ -0,0 +1,437 @@
+"""
+Recurring appointment series (RRULE-style rules, see recurrence.py).
+
+A series is stored once, in appointment_series: its first occurrence
+(patient, doctor, time_slot, duration, status) and the rule. Exceptions
+and overrides live in appointment_series_overrides, keyed by the original
+start of the occurrence they change: `cancelled` drops it, time_slot /
+duration / status replace the series' values for it.
+
+Occurrences are never expanded ahead of time. Reading a window
+(`window`) selects only the series whose starts_on..ends_on overlaps it,
+seeks each rule straight to the window start and merges the series
+lazily in time order, so a page of `limit` occurrences costs one step per
+series plus `limit`, however long the window and however old the series.
+
+Occurrences from today through SERIES_BOOK_DAYS ahead are booked
+(`book`): each one not booked yet becomes an ordinary appointments row,
+with series_id and occurrence_start set, a queue number, rollups, audit
+entry and change event, written by bulk_import.write_batch. From then on
+it is that appointment (status changes, deletion); deleting it records a
+cancellation so it is not booked again. A unique index on (series_id,
+occurrence_start, queue_date) books each occurrence once, also across
+concurrent requests and workers. Like any booking, an occurrence must not
+overlap the doctor's other bookings: a series or override that would
+collide within the horizon is refused (409), and an occurrence that
+collides when its day comes (say, with a booking made since) is left
+unbooked and logged.
+
+Booking is a write, so only writes do it: the app's background task
+(`maintain`, every BOOKING_INTERVAL_SECONDS) keeps the horizon booked,
+creating or changing a series books its doctor's horizon at once, and a
+new booking first books its doctor/day. Reads (the day listing, GET
+/queue, the daily report) show what is booked; availability also counts
+the occurrences further out (`unbooked`).
+"""
+
+import heapq
+import logging
+import uuid
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+
+from availability import AvailabilityEngine, FREE_STATUSES, MAX_APPOINTMENT_MINUTES
+from database import SessionLocal, env_int, upsert_insert
+from models import AppSettings, Appointment, AppointmentSeries, SeriesOverride
+from bulk_import import write_batch
+import recurrence
+import response_cache
+
+logger = logging.getLogger(__name__)
+
+SERIES_BOOK_DAYS = env_int("SERIES_BOOK_DAYS", 14)
+BOOKING_INTERVAL_SECONDS = 3600
+
+SERIES_COLUMNS = (
+    AppointmentSeries.id, AppointmentSeries.patient_name,
+    AppointmentSeries.doctor_name, AppointmentSeries.time_slot,
+    AppointmentSeries.duration, AppointmentSeries.status,
+    AppointmentSeries.rrule,
+)
+
+
+class Occurrence(NamedTuple):
+    time_slot: datetime
+    id: str
+    series_id: str
+    occurrence_start: datetime
+    patient_name: str
+    doctor_name: str
+    duration: Optional[int]
+    status: str
+
+
+def occurrence_id(series_id, occurrence_start):
+    return f"{series_id}:{occurrence_start.isoformat()}"
+
+
+def _occurrence(series, at, override=None):
+    time_slot, duration, status = at, series.duration, series.status
+    if override is not None:
+        time_slot = override.time_slot or at
+        duration = override.duration if override.duration is not None else duration
+        status = override.status or status
+    return Occurrence(
+        time_slot, occurrence_id(series.id, at), series.id, at,
+        series.patient_name, series.doctor_name, duration, status,
+    )
+
+
+# -------------------------
+# Series and overrides
+# -------------------------
+def create(db, data):
+    try:
+        rule = recurrence.parse(data.rrule)
+        recurrence.check(rule, data.time_slot)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid rrule: {exc}")
+    last = recurrence.last_occurrence(rule, data.time_slot)
+
+    series = AppointmentSeries(
+        **data.model_dump(exclude={"rrule"}),
+        rrule=str(rule),
+        starts_on=data.time_slot.date(),
+        ends_on=last.date() if last else None,
+    )
+    db.add(series)
+    db.flush()
+    _ensure_free(db, [
+        o for o in unbooked(db, *horizon(), data.doctor_name) if o.series_id == series.id
+    ])
+    response_cache.invalidate(db, f"dates:{data.doctor_name}")
+    db.commit()
+    book_ahead(db, data.doctor_name)
+    db.refresh(series)
+    return series
+
+
+def _booked(db, series_id, occurrence_start):
+    return db.scalar(select(Appointment.id).where(
+        Appointment.series_id == series_id,
+        Appointment.occurrence_start == occurrence_start,
+    ))
+
+
+def change_occurrence(db, series_id, occurrence_start, cancelled=False, **changes):
+    """Cancel or override one occurrence that is not booked yet.
+
+    Returns an error string, or None once saved.
+    """
+    series = db.get(AppointmentSeries, series_id)
+    if series is None:
+        return "Series not found"
+    if not recurrence.is_occurrence(recurrence.parse(series.rrule), series.time_slot, occurrence_start):
+        return "No occurrence of this series starts then"
+    appointment_id = _booked(db, series_id, occurrence_start)
+    if appointment_id is not None:
+        return f"Occurrence is already booked as appointment {appointment_id}; change that instead"
+
+    if changes.get("time_slot") == occurrence_start:
+        changes["time_slot"] = None
+    values = {
+        "series_id": series_id, "occurrence_start": occurrence_start,
+        "cancelled": cancelled, "time_slot": None, "duration": None, "status": None,
+        **changes,
+    }
+    stmt = upsert_insert(db)(SeriesOverride).values(**values)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[SeriesOverride.series_id, SeriesOverride.occurrence_start],
+        set_={k: stmt.excluded[k] for k in ("cancelled", "time_slot", "duration", "status")},
+    ))
+    if not cancelled:
+        _ensure_free(db, [_occurrence(series, occurrence_start, SeriesOverride(**values))])
+    response_cache.invalidate(db, f"dates:{series.doctor_name}")
+    db.commit()
+    book_ahead(db, series.doctor_name)  # e.g. moved into the horizon
+    return None
+
+
+def cancel_booked(db, appointment):
+    """Keep a deleted occurrence from being booked again (before commit)."""
+    stmt = upsert_insert(db)(SeriesOverride).values(
+        series_id=appointment.series_id,
+        occurrence_start=appointment.occurrence_start,
+        cancelled=True,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[SeriesOverride.series_id, SeriesOverride.occurrence_start],
+        set_={"cancelled": True},
+    ))
+
+
+# -------------------------
+# Overlap with bookings
+# -------------------------
+def collisions(db, occurrences):
+    """{occurrence id: ids of what it overlaps} for the occurrences that
+    overlap a booking of their doctor, or an earlier one of them."""
+    busy = sorted(
+        (o for o in occurrences if o.status not in FREE_STATUSES),
+        key=lambda o: (o.time_slot, o.id),
+    )
+    if not busy:
+        return {}
+    reach = timedelta(minutes=MAX_APPOINTMENT_MINUTES)
+    start, end = busy[0].time_slot - reach, busy[-1].time_slot + reach
+    settings = db.query(AppSettings).first()
+    engine = AvailabilityEngine.from_settings(settings) if settings else AvailabilityEngine()
+    engine.load(db.execute(select(
+        Appointment.doctor_name, Appointment.time_slot, Appointment.duration, Appointment.id,
+    ).where(
+        Appointment.doctor_name.in_({o.doctor_name for o in busy}),
+        Appointment.queue_date.between(start.date(), end.date()),
+        Appointment.time_slot >= start,
+        Appointment.time_slot < end,
+        Appointment.status.notin_(FREE_STATUSES),
+    )))
+
+    found = {}
+    for o in busy:
+        conflicts = engine.conflicts(o.doctor_name, o.time_slot, o.duration)
+        if conflicts:
+            found[o.id] = conflicts
+        else:
+            engine.add(o.doctor_name, o.time_slot, o.duration, o.id)
+    return found
+
+
+def _ensure_free(db, occurrences):
+    found = collisions(db, occurrences)
+    if found:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Occurrences overlap existing bookings", "conflicts": found},
+        )
+
+
+# -------------------------
+# Reading a window
+# -------------------------
+def _filtered(stmt, doctor_name, patient_name):
+    if doctor_name is not None:
+        stmt = stmt.where(AppointmentSeries.doctor_name == doctor_name)
+    if patient_name is not None:
+        stmt = stmt.where(AppointmentSeries.patient_name == patient_name)
+    return stmt
+
+
+def _merged(series, start, end, overrides):
+    # One heap entry per series holding only its next start; an Occurrence
+    # is built when it is emitted, so a page touches each series once.
+    # Ties on start order by series id, i.e. by occurrence id.
+    heap = []
+    for s in series:
+        starts = recurrence.occurrences(recurrence.parse(s.rrule), s.time_slot, start, end)
+        at = next(starts, None)
+        if at is not None:
+            heap.append((at, s.id, starts, s))
+    heapq.heapify(heap)
+
+    while heap:
+        at, series_id, starts, s = heap[0]
+        override = overrides.get((series_id, at))
+        if override is None:
+            yield _occurrence(s, at)
+        elif not override.cancelled and override.time_slot is None:
+            yield _occurrence(s, at, override)
+        # cancelled, or moved: moved ones come from the time_slot query
+        following = next(starts, None)
+        if following is None:
+            heapq.heappop(heap)
+        else:
+            heapq.heapreplace(heap, (following, series_id, starts, s))
+
+
+def window(db, start, end, doctor_name=None, patient_name=None):
+    """Occurrences with time_slot in [start, end), lazily, in
+    (time_slot, id) order, overrides applied."""
+    series = db.execute(_filtered(
+        select(*SERIES_COLUMNS).where(
+            AppointmentSeries.starts_on <= end.date(),
+            or_(AppointmentSeries.ends_on.is_(None),
+                AppointmentSeries.ends_on >= start.date()),
+        ),
+        doctor_name, patient_name,
+    )).all()
+
+    def overrides_where(*conditions):
+        return db.execute(_filtered(
+            select(SeriesOverride, *SERIES_COLUMNS)
+            .join(AppointmentSeries, AppointmentSeries.id == SeriesOverride.series_id)
+            .where(*conditions),
+            doctor_name, patient_name,
+        )).all()
+
+    # Overrides of occurrences that start in the window...
+    overrides = {
+        (row.SeriesOverride.series_id, row.SeriesOverride.occurrence_start): row.SeriesOverride
+        for row in overrides_where(
+            SeriesOverride.occurrence_start >= start,
+            SeriesOverride.occurrence_start < end,
+        )
+    }
+    # ...and occurrences moved into it, from wherever they started
+    moved = sorted(
+        _occurrence(row, row.SeriesOverride.occurrence_start, row.SeriesOverride)
+        for row in overrides_where(
+            SeriesOverride.time_slot >= start,
+            SeriesOverride.time_slot < end,
+            SeriesOverride.cancelled.is_(False),
+        )
+    )
+
+    if not moved:
+        return _merged(series, start, end, overrides)
+    return heapq.merge(
+        moved, _merged(series, start, end, overrides),
+        key=lambda o: (o.time_slot, o.id),
+    )
+
+
+def _bookings_of(occurrences, *columns):
+    # A superset (series x start range) on the unique index's leading
+    # columns; callers match exact keys. Much cheaper to compile than a
+    # (series_id, occurrence_start) IN list of the same length.
+    starts = [o.occurrence_start for o in occurrences]
+    return select(Appointment.series_id, Appointment.occurrence_start, *columns).where(
+        Appointment.series_id.in_({o.series_id for o in occurrences}),
+        Appointment.occurrence_start.between(min(starts), max(starts)),
+    )
+
+
+def with_bookings(db, occurrences):
+    """Occurrence dicts with the booked appointment's id, queue number
+    and status where there is one."""
+    booked = {}
+    if occurrences:
+        rows = db.execute(_bookings_of(
+            occurrences,
+            Appointment.id, Appointment.queue_number, Appointment.status,
+            Appointment.time_slot, Appointment.duration,
+        ))
+        booked = {(r.series_id, r.occurrence_start): r for r in rows}
+
+    items = []
+    for o in occurrences:
+        item = o._asdict()
+        row = booked.get((o.series_id, o.occurrence_start))
+        item["appointment_id"] = row.id if row else None
+        item["queue_number"] = row.queue_number if row else None
+        if row:
+            item.update(time_slot=row.time_slot, duration=row.duration, status=row.status)
+        items.append(item)
+    return items
+
+
+def days(db, doctor_name, first_day, last_day):
+    """Dates between first_day and last_day with an occurrence."""
+    return {
+        o.time_slot.date()
+        for o in window(
+            db,
+            datetime.combine(first_day, time.min),
+            datetime.combine(last_day + timedelta(days=1), time.min),
+            doctor_name,
+        )
+    }
+
+
+# -------------------------
+# Booking
+# -------------------------
+def unbooked(db, start, end, doctor_name=None):
+    """Occurrences in [start, end), from today on, not booked yet."""
+    start = max(start, datetime.combine(date.today(), time.min))
+    if start >= end:
+        return []
+    occurrences = list(window(db, start, end, doctor_name))
+    if not occurrences:
+        return []
+
+    booked = {
+        (r.series_id, r.occurrence_start)
+        for r in db.execute(_bookings_of(occurrences))
+    }
+    return [o for o in occurrences if (o.series_id, o.occurrence_start) not in booked]
+
+
+def book(db, start, end, doctor_name=None, retry=True):
+    """Book the occurrences in [start, end) that are not booked yet, from
+    today on; commits and returns how many were booked."""
+    occurrences = unbooked(db, start, end, doctor_name)
+    clashes = collisions(db, occurrences)
+    for o in occurrences:
+        if o.id in clashes:
+            logger.warning("Not booking occurrence %s: overlaps %s", o.id, ", ".join(clashes[o.id]))
+    occurrences = [o for o in occurrences if o.id not in clashes]
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "patient_name": o.patient_name,
+            "doctor_name": o.doctor_name,
+            "time_slot": o.time_slot,
+            "duration": o.duration,
+            "queue_date": o.time_slot.date(),
+            "status": o.status,
+            "created_at": now,
+            "updated_at": now,
+            "series_id": o.series_id,
+            "occurrence_start": o.occurrence_start,
+        }
+        for o in occurrences
+    ]
+    if not rows:
+        return 0
+
+    try:
+        write_batch(db, rows, publish=True)
+    except IntegrityError:
+        # booked concurrently by another request: take what is left
+        db.rollback()
+        return book(db, start, end, doctor_name, retry=False) if retry else 0
+    return len(rows)
+
+
+def book_day(db, day, doctor_name=None):
+    start = datetime.combine(day, time.min)
+    return book(db, start, start + timedelta(days=1), doctor_name)
+
+
+def horizon(days=SERIES_BOOK_DAYS):
+    """[start, end) of today and the next `days` days."""
+    start = datetime.combine(date.today(), time.min)
+    return start, start + timedelta(days=days + 1)
+
+
+def book_ahead(db, doctor_name=None, days=SERIES_BOOK_DAYS):
+    """Book today's occurrences and those of the next `days` days."""
+    return book(db, *horizon(days), doctor_name)
+
+
+# -------------------------
+# Background booking (started from the app lifespan)
+# -------------------------
+def maintain():
+    with SessionLocal() as db:
+        booked = book_ahead(db)
+    if booked:
+        logger.info("Booked %d recurring occurrences", booked)
+    return booked
+
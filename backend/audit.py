@@ -0,0 +1,297 @@
+"""
+Append-only audit trail of appointment changes (appointment_audit_log).
+
+Mutating code calls `record(db, action, appointment, old_status)` before
+committing. As with change events, entries leave the session only when the
+transaction commits (a rollback drops them), and are then handed to a
+background writer on the app's event loop: an asyncio queue flushed as one
+executemany INSERT every AUDIT_FLUSH_MS or AUDIT_BATCH_SIZE entries,
+whichever comes first. Requests never wait for the audit insert.
+
+When an insert fails, or the queue is full, entries are appended to the
+spool file (AUDIT_SPOOL, NDJSON) instead. The writer replays the spool on
+start and after its next successful flush. Entries carry their own id and
+are inserted with ON CONFLICT DO NOTHING, so a replay never duplicates
+them. Entries still queued when a process dies uncleanly (at most one
+flush interval) are lost; a clean shutdown drains the queue.
+
+AUDIT_MODE:
+- `async` (default): the batched writer above. Outside the app (CLI
+  imports, scripts) there is no writer; entries are inserted inside the
+  committing transaction instead, as with `sync`. (Inserting after the
+  commit would take a second pooled connection while the session still
+  holds its own, and deadlocks a full pool.)
+- `sync`: inserted inside the audited transaction (one extra statement
+  per commit); nothing can be lost, at the cost of request latency.
+- `off`: nothing is recorded.
+
+    python audit.py replay     # insert spooled entries now
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from database import engine, env_int, upsert_insert
+from models import AppointmentAudit
+from pagination import json_default
+
+logger = logging.getLogger(__name__)
+
+AUDIT_MODE = os.getenv("AUDIT_MODE", "async")
+AUDIT_FLUSH_MS = env_int("AUDIT_FLUSH_MS", 200)
+AUDIT_BATCH_SIZE = env_int("AUDIT_BATCH_SIZE", 500)
+AUDIT_MAX_QUEUED = env_int("AUDIT_MAX_QUEUED", 10000)
+AUDIT_SPOOL = os.getenv("AUDIT_SPOOL", "audit_spool.ndjson")
+
+STOP = None
+
+
+def record(db, action, appointment, old_status=None):
+    """Queue an audit entry on the session; written once it commits.
+
+    `appointment` is a JSON-able snapshot (appointment_payload or an
+    imported row dict).
+    """
+    if AUDIT_MODE == "off":
+        return
+    db.info.setdefault("pending_audit", []).append({
+        "id": str(uuid.uuid4()),
+        "appointment_id": appointment["id"],
+        "action": action,
+        "old_status": old_status,
+        "new_status": None if action == "deleted" else appointment["status"],
+        "data": json.dumps(appointment, default=json_default),
+        "changed_at": datetime.utcnow(),
+    })
+
+
+def insert_entries(bind, entries):
+    stmt = upsert_insert(bind)(AppointmentAudit).on_conflict_do_nothing(
+        index_elements=[AppointmentAudit.id]
+    )
+    with bind.begin() as conn:
+        conn.execute(stmt, entries)
+
+
+# -------------------------
+# Batched writer
+# -------------------------
+class AuditWriter:
+    def __init__(self, bind=engine, flush_ms=AUDIT_FLUSH_MS,
+                 batch_size=AUDIT_BATCH_SIZE, max_queued=AUDIT_MAX_QUEUED,
+                 spool_path=AUDIT_SPOOL):
+        self.bind = bind
+        self.flush_seconds = flush_ms / 1000
+        self.batch_size = batch_size
+        self.max_queued = max_queued
+        self.spool_path = spool_path
+        self.stats = Counter()
+        self.loop = None
+        self._queue = None
+        self._task = None
+        self._spool_lock = threading.Lock()
+        self._replay_needed = False
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.max_queued)
+        await asyncio.to_thread(self.replay)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything queued, then stop."""
+        if self._task is None:
+            return
+        await asyncio.sleep(0)  # let hand-overs already scheduled enqueue first
+        task, self._task = self._task, None
+        await self._queue.put(STOP)
+        await task
+
+    def submit(self, entries):
+        """Hand over one commit's entries; callable from any thread."""
+        loop = self.loop
+        if self._task is None or loop is None or loop.is_closed():
+            self.write(entries)
+            return
+        loop.call_soon_threadsafe(self._enqueue, entries)
+
+    def _enqueue(self, entries):
+        if self._task is None:  # stopped meanwhile; replayed on next start
+            self.spool(entries)
+            return
+        try:
+            self._queue.put_nowait(entries)
+        except asyncio.QueueFull:
+            self.stats["overflowed"] += len(entries)
+            self.spool(entries)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            batch, stopping = ([], True) if item is STOP else (list(item), False)
+            deadline = self.loop.time() + self.flush_seconds
+            while not stopping and len(batch) < self.batch_size:
+                if self._queue.empty():
+                    timeout = deadline - self.loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is STOP:
+                    stopping = True
+                else:
+                    batch.extend(item)
+            if batch:
+                await asyncio.to_thread(self.write, batch)
+
+    def write(self, entries):
+        try:
+            insert_entries(self.bind, entries)
+        except Exception:
+            logger.exception("Audit insert failed; spooling %d entries", len(entries))
+            self.spool(entries)
+            return
+        self.stats["written"] += len(entries)
+        self.stats["flushes"] += 1
+        if self._replay_needed:
+            self.replay()
+
+    # -------------------------
+    # Spool file
+    # -------------------------
+    def spool(self, entries):
+        lines = [
+            json.dumps(e, default=json_default) + "\n" for e in entries
+        ]
+        # O_APPEND writes of whole lines do not interleave between workers
+        with self._spool_lock:
+            fd = os.open(self.spool_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                for line in lines:
+                    os.write(fd, line.encode())
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.stats["spooled"] += len(entries)
+        self._replay_needed = True
+
+    def replay(self):
+        """Insert spooled entries; returns how many were replayed."""
+        # Claim the spool by renaming it so new failures start a fresh file;
+        # claimed files left by a crashed replay are picked up here too.
+        try:
+            os.replace(self.spool_path, f"{self.spool_path}.{uuid.uuid4().hex}.replay")
+        except FileNotFoundError:
+            pass
+
+        self._replay_needed = False
+        replayed = 0
+        for claimed in sorted(glob.glob(glob.escape(self.spool_path) + ".*.replay")):
+            try:
+                with open(claimed) as f:
+                    entries = [_decode(line) for line in f if line.strip()]
+            except FileNotFoundError:
+                continue  # replayed by another worker
+            try:
+                for i in range(0, len(entries), self.batch_size):
+                    insert_entries(self.bind, entries[i:i + self.batch_size])
+            except Exception:
+                logger.exception("Audit spool replay failed; keeping %s", claimed)
+                self._replay_needed = True
+                break
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                pass
+            replayed += len(entries)
+
+        if replayed:
+            self.stats["replayed"] += replayed
+            logger.info("Replayed %d spooled audit entries", replayed)
+        return replayed
+
+
+def _decode(line):
+    entry = json.loads(line)
+    entry["changed_at"] = datetime.fromisoformat(entry["changed_at"])
+    return entry
+
+
+writer = AuditWriter()
+
+
+# -------------------------
+# Session hooks
+# -------------------------
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    if AUDIT_MODE == "sync" or (AUDIT_MODE == "async" and not writer.running):
+        entries = session.info.pop("pending_audit", None)
+        if entries:
+            session.execute(insert(AppointmentAudit), entries)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    entries = session.info.pop("pending_audit", None)
+    if entries:
+        try:
+            writer.submit(entries)
+        except Exception:
+            logger.exception("Failed to hand over %d audit entries", len(entries))
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("pending_audit", None)
+
+
+# -------------------------
+# Reading
+# -------------------------
+def history(db, appointment_id):
+    """Audit entries for one appointment, oldest first."""
+    rows = db.query(AppointmentAudit).filter(
+        AppointmentAudit.appointment_id == appointment_id
+    ).order_by(AppointmentAudit.changed_at, AppointmentAudit.id).all()
+    return [
+        {
+            "action": r.action,
+            "old_status": r.old_status,
+            "new_status": r.new_status,
+            "changed_at": r.changed_at,
+            "appointment": json.loads(r.data),
+        }
+        for r in rows
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the appointment audit log")
+    parser.add_argument("command", choices=["replay"])
+    parser.parse_args()
+    print(f"Replayed {writer.replay()} entries from {AUDIT_SPOOL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Slot availability and overlap detection.
+
+Each doctor's bookings live in an `IntervalIndex`: parallel lists of start
+and end minutes sorted by start, plus the longest booking length seen. Any
+booking overlapping [start, end) must begin in [start - longest, end), so
+one bisect bounds the scan and lookups cost O(log n + k).
+
+`GET /availability` and the booking overlap check build the index from the
+doctor's rows in the requested window (served by the doctor/time index),
+so answers are always current no matter which worker wrote last.
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+# Bookings in these states do not occupy the doctor
+FREE_STATUSES = ("cancelled",)
+
+# Upper bound on a booking's length, used to widen window queries
+MAX_APPOINTMENT_MINUTES = 8 * 60
+
+
+def to_minutes(dt):
+    return (dt - EPOCH) // MINUTE
+
+
+def parse_hhmm(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class IntervalIndex:
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.longest = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def add(self, start, end, item_id=None):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, item_id)
+        self.longest = max(self.longest, end - start)
+
+    def overlapping(self, start, end):
+        """(start, end, id) of every interval intersecting [start, end)."""
+        i = bisect_left(self.starts, start - self.longest)
+        hi = bisect_left(self.starts, end)
+        return [
+            (self.starts[j], self.ends[j], self.ids[j])
+            for j in range(i, hi)
+            if self.ends[j] > start
+        ]
+
+    def busy(self, start, end):
+        """Merged busy intervals clipped to [start, end)."""
+        merged = []
+        for s, e, _ in self.overlapping(start, end):
+            s, e = max(s, start), min(e, end)
+            if merged and s <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], e)
+            else:
+                merged.append([s, e])
+        return merged
+
+    def free_slots(self, open_at, close_at, length, step=None):
+        """Start minutes of every `length` slot on the `step` grid in
+        [open_at, close_at) that does not intersect a booking."""
+        step = step or length
+        slots = []
+        busy = iter(self.busy(open_at, close_at))
+        current = next(busy, None)
+        t = open_at
+        while t + length <= close_at:
+            while current and current[1] <= t:
+                current = next(busy, None)
+            if current and current[0] < t + length:
+                # jump to the first grid point at or after the busy block ends
+                t += -(-(current[1] - t) // step) * step
+                continue
+            slots.append(t)
+            t += step
+        return slots
+
+
+class AvailabilityEngine:
+    """Per-doctor interval indexes plus the clinic's business hours."""
+
+    def __init__(self, business_start="08:00", business_end="18:00", slot_minutes=30):
+        self.open_minute = parse_hhmm(business_start)
+        self.close_minute = parse_hhmm(business_end)
+        self.slot_minutes = slot_minutes
+        self.doctors = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            settings.business_start,
+            settings.business_end,
+            settings.appointment_duration,
+        )
+
+    def index_for(self, doctor_name):
+        return self.doctors.setdefault(doctor_name, IntervalIndex())
+
+    def add(self, doctor_name, time_slot, duration=None, item_id=None):
+        start = to_minutes(time_slot)
+        self.index_for(doctor_name).add(
+            start, start + (duration or self.slot_minutes), item_id
+        )
+
+    def load(self, rows):
+        """rows: (doctor_name, time_slot, duration, id) tuples."""
+        for doctor_name, time_slot, duration, item_id in rows:
+            self.add(doctor_name, time_slot, duration, item_id)
+        return self
+
+    def conflicts(self, doctor_name, time_slot, duration=None, exclude_id=None):
+        index = self.doctors.get(doctor_name)
+        if index is None:
+            return []
+        start = to_minutes(time_slot)
+        return [
+            item_id
+            for _, _, item_id in index.overlapping(
+                start, start + (duration or self.slot_minutes)
+            )
+            if item_id != exclude_id
+        ]
+
+    def free_slots(self, doctor_name, start_date, end_date, length=None):
+        """{date: ["HH:MM", ...]} for every day in [start_date, end_date]."""
+        length = length or self.slot_minutes
+        index = self.doctors.get(doctor_name) or IntervalIndex()
+        days = {}
+        day = start_date
+        while day <= end_date:
+            midnight = to_minutes(datetime.combine(day, datetime.min.time()))
+            slots = index.free_slots(
+                midnight + self.open_minute,
+                midnight + self.close_minute,
+                length,
+                self.slot_minutes,
+            )
+            days[day.isoformat()] = [
+                f"{(s - midnight) // 60:02d}:{(s - midnight) % 60:02d}" for s in slots
+            ]
+            day += timedelta(days=1)
+        return days
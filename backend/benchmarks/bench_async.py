@@ -0,0 +1,118 @@
+"""
+Side-by-side throughput of the sync and async (DB_ASYNC=1) backends.
+
+Each mode runs in its own process (the engine is chosen at import time)
+against the same seeded database. Requests are driven in-process through
+httpx's ASGI transport with a fixed number of concurrent clients, half
+bookings and half doctor/day reads.
+
+    python benchmarks/bench_async.py --requests 2000 --concurrency 100
+
+Needs httpx, plus aiosqlite or asyncpg for the async run.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import scratch_db
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_URL = "sqlite:///bench_async.db"
+DAY = datetime(2025, 1, 6)
+SLOT_MINUTES = 5  # the shortest duration schemas.py accepts
+
+
+async def drive(requests, concurrency):
+    import httpx
+    from main import app
+
+    # A failed request is counted, not raised: on SQLite a transaction
+    # that read before writing can get "database is locked" under load
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def client(http):
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            t0 = time.perf_counter()
+            if i % 2:
+                r = await http.get(f"/appointments/Dr. Bench {i % 10}", params={"date_str": "2025-01-06"})
+            else:
+                # each doctor's bookings back to back, SLOT_MINUTES apart
+                r = await http.post("/appointments", json={
+                    "patient_name": f"Bench Patient {i}",
+                    "doctor_name": f"Dr. Bench {i % 10}",
+                    "time_slot": (DAY + timedelta(minutes=SLOT_MINUTES * (i // 10))).isoformat(),
+                    "duration": SLOT_MINUTES,
+                })
+            errors += r.is_error
+            latencies.append(time.perf_counter() - t0)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "errors": errors,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_mode(mode, args):
+    scratch_db.use(DEFAULT_URL)
+    sys.path.insert(0, BACKEND)
+    from database import Base, engine
+    from migrate import migrate  # imports every model
+
+    Base.metadata.drop_all(bind=engine)
+    migrate()
+    result = asyncio.run(drive(args.requests, args.concurrency))
+    print(json.dumps({"mode": mode, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mode", choices=["sync", "async"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args)
+        return
+
+    url = args.database_url or DEFAULT_URL
+    for mode in ("sync", "async"):
+        env = dict(os.environ, DB_ASYNC="1" if mode == "async" else "0")
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--database-url", url,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<6} {result['rps']:>8} req/s  p50 {result['p50_ms']:>7} ms  "
+              f"p99 {result['p99_ms']:>7} ms  errors {result['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Write throughput with the audit log off, synchronous and batched.
+
+Each AUDIT_MODE runs in its own process against a fresh database: the
+app's lifespan is started (so the batched writer runs), then concurrent
+clients book appointments and change their status. After the run the
+writer is stopped and the audit rows counted, to confirm nothing was lost.
+
+    python benchmarks/bench_audit.py --requests 2000 --concurrency 50
+
+Needs httpx.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import scratch_db
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_URL = "sqlite:///bench_audit.db"
+MODES = ("off", "sync", "async")
+
+
+async def drive(requests, concurrency):
+    import httpx
+    from main import app
+
+    # A failed request is counted, not raised: on SQLite a transaction
+    # that read before writing can get "database is locked" under load
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def client(http):
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            t0 = time.perf_counter()
+            r = await http.post("/appointments", params={"allow_overlap": "true"}, json={
+                "patient_name": f"Bench Patient {i}",
+                "doctor_name": f"Dr. Bench {i % 10}",
+                "time_slot": f"2025-01-06T{8 + i % 10:02d}:{i % 60:02d}:00",
+            })
+            if r.is_error:
+                errors += 1
+                continue
+            r = await http.patch(
+                f"/appointments/{r.json()['id']}/status", params={"status": "completed"}
+            )
+            errors += r.is_error
+            latencies.append(time.perf_counter() - t0)
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(client(http) for _ in range(concurrency)))
+            elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": requests * 2,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests * 2 / elapsed, 1),
+        "errors": errors,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_mode(mode, args):
+    scratch_db.use(DEFAULT_URL)
+    sys.path.insert(0, BACKEND)
+    from sqlalchemy import func, select
+    from database import Base, SessionLocal, engine
+    from migrate import migrate  # imports every model
+    from models import AppointmentAudit
+
+    Base.metadata.drop_all(bind=engine)
+    migrate()
+    result = asyncio.run(drive(args.requests, args.concurrency))
+    with SessionLocal() as db:
+        result["audit_rows"] = db.scalar(select(func.count()).select_from(AppointmentAudit))
+    print(json.dumps({"mode": mode, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--requests", type=int, default=2000, help="bookings (each also updated)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args)
+        return
+
+    url = args.database_url or DEFAULT_URL
+    for mode in MODES:
+        env = dict(os.environ, AUDIT_MODE=mode)
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--database-url", url,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"{mode:<6} {result['rps']:>8} req/s  p50 {result['p50_ms']:>7} ms  "
+              f"p99 {result['p99_ms']:>7} ms  errors {result['errors']}  "
+              f"audit rows {result['audit_rows']}")
+
+
+if __name__ == "__main__":
+    main()
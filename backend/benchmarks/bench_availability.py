@@ -0,0 +1,138 @@
+"""
+Free-slot and overlap lookups: interval index vs a naive scan.
+
+Books D doctors over a horizon of H days (a mix of 15-60 minute bookings
+inside business hours), then times, per doctor:
+- free slots for the whole horizon,
+- N random overlap checks,
+against a naive implementation that scans every booking of the doctor for
+each candidate slot.
+
+    python benchmarks/bench_availability.py --doctors 500 --days 90
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import AvailabilityEngine  # noqa: E402
+
+OPEN, CLOSE, SLOT = 8 * 60, 18 * 60, 30
+
+
+def synthetic(doctors, days, per_day, seed=11):
+    rng = random.Random(seed)
+    first = date(2025, 1, 6)
+    rows = []
+    for d in range(doctors):
+        doctor = f"Dr. {d}"
+        for day in range(days):
+            midnight = datetime.combine(first + timedelta(days=day), datetime.min.time())
+            for _ in range(per_day):
+                start = OPEN + 15 * rng.randrange((CLOSE - OPEN) // 15 - 4)
+                rows.append((
+                    doctor,
+                    midnight + timedelta(minutes=start),
+                    rng.choice((15, 30, 45, 60)),
+                    f"{doctor}-{len(rows)}",
+                ))
+    return first, rows
+
+
+# -------------------------
+# Naive reference
+# -------------------------
+def naive_overlaps(bookings, start, end):
+    return [
+        item_id for s, e, item_id in bookings
+        if s < end and e > start
+    ]
+
+
+def naive_free_slots(bookings, first, days):
+    result = {}
+    for day in range(days):
+        midnight = datetime.combine(first + timedelta(days=day), datetime.min.time())
+        slots = []
+        for minute in range(OPEN, CLOSE - SLOT + 1, SLOT):
+            start = midnight + timedelta(minutes=minute)
+            if not naive_overlaps(bookings, start, start + timedelta(minutes=SLOT)):
+                slots.append(f"{minute // 60:02d}:{minute % 60:02d}")
+        result[(first + timedelta(days=day)).isoformat()] = slots
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--per-day", type=int, default=12)
+    parser.add_argument("--checks", type=int, default=200)
+    parser.add_argument("--naive-doctors", type=int, default=20,
+                        help="doctors timed with the naive scan (it is slow)")
+    args = parser.parse_args()
+
+    first, rows = synthetic(args.doctors, args.days, args.per_day)
+    last = first + timedelta(days=args.days - 1)
+    print(f"{args.doctors} doctors x {args.days} days, {len(rows):,} bookings")
+
+    t0 = time.perf_counter()
+    engine = AvailabilityEngine("08:00", "18:00", SLOT).load(rows)
+    print(f"index build      {time.perf_counter() - t0:8.2f} s")
+
+    by_doctor = {}
+    for doctor, time_slot, duration, item_id in rows:
+        by_doctor.setdefault(doctor, []).append(
+            (time_slot, time_slot + timedelta(minutes=duration), item_id)
+        )
+
+    rng = random.Random(5)
+    probes = [
+        (first + timedelta(days=rng.randrange(args.days)), OPEN + 15 * rng.randrange(36))
+        for _ in range(args.checks)
+    ]
+    probes = [
+        datetime.combine(day, datetime.min.time()) + timedelta(minutes=minute)
+        for day, minute in probes
+    ]
+
+    doctors = list(engine.doctors)
+    t0 = time.perf_counter()
+    for doctor in doctors:
+        engine.free_slots(doctor, first, last)
+    index_free = (time.perf_counter() - t0) / len(doctors)
+
+    t0 = time.perf_counter()
+    for doctor in doctors:
+        for probe in probes:
+            engine.conflicts(doctor, probe, SLOT)
+    index_check = (time.perf_counter() - t0) / (len(doctors) * len(probes))
+
+    sample = doctors[:args.naive_doctors]
+    t0 = time.perf_counter()
+    for doctor in sample:
+        expected = naive_free_slots(by_doctor[doctor], first, args.days)
+        assert expected == engine.free_slots(doctor, first, last), doctor
+    naive_free = (time.perf_counter() - t0) / len(sample)
+
+    t0 = time.perf_counter()
+    for doctor in sample:
+        for probe in probes:
+            expected = naive_overlaps(by_doctor[doctor], probe, probe + timedelta(minutes=SLOT))
+            assert sorted(expected) == sorted(engine.conflicts(doctor, probe, SLOT))
+    naive_check = (time.perf_counter() - t0) / (len(sample) * len(probes))
+
+    print(f"\n{'':<16}{'index':>12}{'naive':>12}{'speedup':>10}")
+    print(f"{'free slots/doc':<16}{index_free * 1000:>10.2f}ms{naive_free * 1000:>10.2f}ms"
+          f"{naive_free / index_free:>9.0f}x")
+    print(f"{'overlap check':<16}{index_check * 1e6:>10.1f}us{naive_check * 1e6:>10.1f}us"
+          f"{naive_check / index_check:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
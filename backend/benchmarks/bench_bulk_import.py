@@ -0,0 +1,85 @@
+"""
+Bulk import throughput in rows per second.
+
+Generates synthetic NDJSON appointments and imports them with
+bulk_import.import_rows at several batch sizes, next to a baseline of
+one create_appointment call per row.
+
+    python benchmarks/bench_bulk_import.py --rows 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_bulk.db")
+
+from database import Base, engine, SessionLocal  # noqa: E402
+from migrate import migrate  # noqa: E402
+from schemas import AppointmentCreate  # noqa: E402
+from bulk_import import import_rows, parse_ndjson  # noqa: E402
+from main import create_appointment  # noqa: E402
+
+START = datetime(2018, 1, 1, 8, 0)
+
+
+def synthetic_lines(rows, seed=1):
+    rng = random.Random(seed)
+    for _ in range(rows):
+        yield json.dumps({
+            "patient_name": f"Patient {rng.randrange(rows // 5 + 1)}",
+            "doctor_name": f"Dr. {rng.randrange(50)}",
+            "time_slot": (START + timedelta(minutes=15 * rng.randrange(35040 * 5))).isoformat(),
+            "status": rng.choice(["waiting", "completed", "cancelled"]),
+        })
+
+
+def reset():
+    Base.metadata.drop_all(bind=engine)
+    migrate()
+
+
+def bench_single(rows):
+    reset()
+    db = SessionLocal()
+    t0 = time.perf_counter()
+    try:
+        for line in synthetic_lines(rows):
+            create_appointment(AppointmentCreate(**json.loads(line)), db=db)
+    finally:
+        db.close()
+    return rows / (time.perf_counter() - t0)
+
+
+def bench_bulk(rows, batch_size):
+    reset()
+    t0 = time.perf_counter()
+    result = import_rows(parse_ndjson(synthetic_lines(rows)), batch_size=batch_size)
+    assert result["inserted"] == rows, result["errors"][:5]
+    return rows / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--single-rows", type=int, default=2_000)
+    parser.add_argument("--batch-sizes", default="1000,5000,20000")
+    args = parser.parse_args()
+
+    print(f"{'POST /appointments loop':<28} {bench_single(args.single_rows):>10.0f} rows/s "
+          f"({args.single_rows} rows)")
+    for batch_size in map(int, args.batch_sizes.split(",")):
+        rate = bench_bulk(args.rows, batch_size)
+        print(f"{'bulk, batch ' + str(batch_size):<28} {rate:>10.0f} rows/s ({args.rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
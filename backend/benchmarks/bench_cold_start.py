@@ -0,0 +1,112 @@
+"""
+Cold start: time from launching the server to its first successful request.
+
+Launches each server command --runs times against an already migrated
+database and polls GET / until it answers 200. Also reports when every
+worker has logged "Application startup complete". Compared:
+
+- preload: `python serve.py` (app imported once, workers forked)
+- uvicorn: `uvicorn main:app --workers N` (every worker imports the app)
+
+    python benchmarks/bench_cold_start.py --workers 4 --runs 5
+
+Needs httpx and uvicorn.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_cold_start.db")
+
+READY_LINE = "Application startup complete"
+
+
+def commands(workers, port):
+    return {
+        "preload": [sys.executable, "serve.py", "--workers", str(workers),
+                    "--host", "127.0.0.1", "--port", str(port)],
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--workers", str(workers),
+                    "--host", "127.0.0.1", "--port", str(port)],
+    }
+
+
+def cold_start(command, workers, port, timeout):
+    import httpx
+
+    t0 = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=BACKEND, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, start_new_session=True,
+    )
+    ready = []
+
+    def watch():
+        for line in process.stderr:
+            if READY_LINE in line:
+                ready.append(time.perf_counter() - t0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+    first = None
+    try:
+        with httpx.Client(timeout=1) as http:
+            while time.perf_counter() - t0 < timeout:
+                try:
+                    if http.get(f"http://127.0.0.1:{port}/").status_code == 200:
+                        first = time.perf_counter() - t0
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        while len(ready) < workers and time.perf_counter() - t0 < timeout:
+            time.sleep(0.005)
+    finally:
+        os.killpg(process.pid, 15)
+        process.wait(timeout=30)
+
+    if first is None:
+        raise RuntimeError(f"No successful request within {timeout}s: {command}")
+    return first, (ready[workers - 1] if len(ready) >= workers else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--modes", nargs="*", default=["preload", "uvicorn"])
+    args = parser.parse_args()
+
+    from migrate import migrate
+    migrate()
+
+    results = {}
+    for mode, command in commands(args.workers, args.port).items():
+        if mode not in args.modes:
+            continue
+        firsts, alls = [], []
+        for _ in range(args.runs):
+            first, all_ready = cold_start(command, args.workers, args.port, args.timeout)
+            firsts.append(first)
+            if all_ready is not None:
+                alls.append(all_ready)
+        ms = lambda values: round(statistics.median(values) * 1000, 1) if values else None  # noqa: E731
+        results[mode] = {"first_request_ms": ms(firsts), "all_workers_ready_ms": ms(alls)}
+        print(f"{mode:<8} first request {results[mode]['first_request_ms']:>8} ms  "
+              f"all {args.workers} workers ready {results[mode]['all_workers_ready_ms']} ms",
+              file=sys.stderr)
+
+    print(json.dumps({"workers": args.workers, "runs": args.runs, "median": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
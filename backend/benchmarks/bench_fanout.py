@@ -0,0 +1,138 @@
+"""
+Fan-out latency of the appointment event hub.
+
+Subscribes N consumers (a mix of all / per-doctor / per-day topics), a
+share of which are deliberately slow, publishes a stream of change events
+and reports publish-to-delivery latency for the fast consumers plus how
+many resyncs the slow ones needed.
+
+With --backend postgres the events take the multi-worker path instead of
+being dispatched in-process: each burst is published on a session and
+committed (one pg_notify per event), and this process LISTENs and fans
+them out as every worker does. Needs a PostgreSQL DATABASE_URL.
+
+    python benchmarks/bench_fanout.py --subscribers 1000 --events 2000
+    DATABASE_URL=postgresql://localhost:5433/emr \
+        python benchmarks/bench_fanout.py --backend postgres
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+
+from database import SessionLocal  # noqa: E402
+import events  # noqa: E402
+
+DOCTORS = [f"Dr. {i}" for i in range(20)]
+DAY = "2025-01-06"
+
+
+def make_event(i, rng):
+    return {
+        "type": "updated",
+        "sent_at": time.perf_counter(),
+        "appointment": {
+            "id": f"apt-{rng.randrange(200)}",
+            "doctor_name": rng.choice(DOCTORS),
+            "time_slot": f"{DAY}T09:00:00",
+            "status": "waiting",
+            "seq": i,
+        },
+    }
+
+
+async def consume(subscription, latencies, slow, stop):
+    while not stop.is_set():
+        try:
+            batch = await asyncio.wait_for(subscription.drain(), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        now = time.perf_counter()
+        if not slow:
+            latencies.extend(now - e["sent_at"] for e in batch if "sent_at" in e)
+        else:
+            await asyncio.sleep(0.05)
+
+
+def commit_events(batch):
+    with SessionLocal() as db:
+        for evt in batch:
+            events.publish(db, evt["type"], evt["appointment"])
+            db.info["pending_events"][-1]["sent_at"] = evt["sent_at"]
+        db.commit()
+
+
+async def run(args):
+    hub = events.hub
+    hub.bind(asyncio.get_running_loop())
+    if args.backend == "postgres":
+        events.backend = events.PostgresBackend()
+        await events.backend.start()
+    rng = random.Random(3)
+
+    latencies, tasks, slow_subs = [], [], []
+    stop = asyncio.Event()
+    for i in range(args.subscribers):
+        kind = i % 3
+        if kind == 0:
+            topic = ("all",)
+        elif kind == 1:
+            topic = ("doctor", rng.choice(DOCTORS))
+        else:
+            topic = ("day", rng.choice(DOCTORS), DAY)
+        slow = rng.random() < args.slow_share
+        sub = hub.subscribe(topic, max_pending=args.max_pending)
+        if slow:
+            slow_subs.append(sub)
+        tasks.append(asyncio.create_task(consume(sub, latencies, slow, stop)))
+
+    t0 = time.perf_counter()
+    for i in range(0, args.events, args.burst):
+        batch = [make_event(j, rng) for j in range(i, min(i + args.burst, args.events))]
+        if args.backend == "postgres":
+            await run_in_threadpool(commit_events, batch)
+        else:
+            hub.dispatch(batch)
+        await asyncio.sleep(0)
+    publish_seconds = time.perf_counter() - t0
+
+    await asyncio.sleep(1)
+    stop.set()
+    await asyncio.gather(*tasks)
+    await events.backend.stop()
+
+    latencies.sort()
+    if not latencies:
+        raise SystemExit("No events were delivered")
+    print(f"{args.backend} backend, {args.subscribers} subscribers ({len(slow_subs)} slow), "
+          f"{args.events} events in bursts of {args.burst}")
+    print(f"dispatch: {args.events / publish_seconds:,.0f} events/s")
+    print(f"delivery latency (fast consumers): "
+          f"p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms, "
+          f"{len(latencies):,} deliveries after coalescing")
+    print(f"slow consumer resyncs: {sum(s.resyncs for s in slow_subs)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--slow-share", type=float, default=0.05)
+    parser.add_argument("--max-pending", type=int, default=100)
+    parser.add_argument("--backend", choices=["local", "postgres"], default="local")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
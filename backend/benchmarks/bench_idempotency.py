@@ -0,0 +1,112 @@
+"""
+Cost of Idempotency-Key handling on bookings, and a retry storm.
+
+Drives POST /appointments in-process (httpx over ASGI) and reports the
+median latency of:
+
+- plain: bookings without the header
+- keyed: bookings with a fresh key each (first execution + store)
+- replay: the same keyed requests sent again (answered from the store)
+
+then fires --copies concurrent copies of one keyed booking and checks a
+single appointment came out of it.
+
+    IDEMPOTENCY_BACKEND=db python benchmarks/bench_idempotency.py --requests 500
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_idempotency.db")
+
+import httpx  # noqa: E402
+from sqlalchemy import delete, func, select  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from migrate import migrate  # noqa: E402
+from models import Appointment, IdempotencyKey  # noqa: E402
+from main import app  # noqa: E402
+import idempotency  # noqa: E402
+
+START = datetime(2031, 1, 6, 8)
+
+
+def booking(i, doctor):
+    return {
+        "patient_name": f"Patient {i}",
+        "doctor_name": doctor,
+        "time_slot": (START + timedelta(minutes=30 * i)).isoformat(),
+    }
+
+
+async def timed(client, requests):
+    times = []
+    for body, headers in requests:
+        t0 = time.perf_counter()
+        response = await client.post("/appointments", json=body, headers=headers)
+        times.append(time.perf_counter() - t0)
+        response.raise_for_status()
+    return statistics.median(times) * 1000
+
+
+async def run(args):
+    with engine.begin() as conn:
+        conn.execute(delete(Appointment))
+        conn.execute(delete(IdempotencyKey))
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            n = args.requests
+            keyed = [
+                (booking(i, "Dr. Keyed"), {"Idempotency-Key": str(uuid.uuid4())})
+                for i in range(n)
+            ]
+            results = [
+                ("plain", await timed(client, [(booking(i, "Dr. Plain"), {}) for i in range(n)])),
+                ("keyed", await timed(client, keyed)),
+                ("replay", await timed(client, keyed)),
+            ]
+
+            headers = {"Idempotency-Key": str(uuid.uuid4())}
+            t0 = time.perf_counter()
+            responses = await asyncio.gather(*[
+                client.post("/appointments", json=booking(0, "Dr. Storm"), headers=headers)
+                for _ in range(args.copies)
+            ])
+            storm = (time.perf_counter() - t0) * 1000
+
+    with SessionLocal() as db:
+        created = db.scalar(
+            select(func.count()).where(Appointment.doctor_name == "Dr. Storm")
+        )
+
+    print(f"backend {idempotency.backend.name}, {n} bookings each")
+    for name, ms in results:
+        print(f"{name:<8}{ms:>8.2f} ms")
+    replayed = sum(r.headers.get("idempotent-replayed") == "true" for r in responses)
+    print(f"storm   {args.copies} copies in {storm:.1f} ms: {created} booking, {replayed} replayed")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--copies", type=int, default=50)
+    args = parser.parse_args()
+
+    migrate()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
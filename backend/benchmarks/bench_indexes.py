@@ -0,0 +1,160 @@
+"""
+Query plan and latency benchmark for the appointments indexes.
+
+Seeds a synthetic appointments table, then runs the hot queries from
+main.py with and without the composite indexes and prints the query plan
+and median latency of each.
+
+    python benchmarks/bench_indexes.py --rows 1000000
+    python benchmarks/bench_indexes.py --database-url postgresql://localhost:5433/emr_bench
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_indexes.db")
+
+from sqlalchemy import text, insert  # noqa: E402
+from database import Base, engine  # noqa: E402
+from models import Appointment  # noqa: E402
+from availability import MAX_APPOINTMENT_MINUTES  # noqa: E402
+from migrate import create_indexes  # noqa: E402
+
+START = datetime(2020, 1, 1, 8, 0)
+STATUSES = ["waiting", "completed", "cancelled"]
+
+# The queries main.py issues; queue_date pins each to its day(s), and on
+# PostgreSQL to one partition
+COLUMNS = "id, patient_name, doctor_name, time_slot, duration, queue_number, status, series_id"
+QUERIES = {
+    "slot_check": (  # doctor_bookings: the overlap check of every booking
+        "SELECT doctor_name, time_slot, duration, id FROM appointments "
+        "WHERE doctor_name = :doctor AND queue_date BETWEEN :prev_day AND :day "
+        "AND time_slot >= :window_start AND time_slot < :day_end "
+        "AND status NOT IN ('cancelled') ORDER BY time_slot"
+    ),
+    "doctor_day": (
+        f"SELECT {COLUMNS} FROM appointments "
+        "WHERE doctor_name = :doctor AND queue_date = :day "
+        "AND time_slot BETWEEN :day_start AND :day_end ORDER BY queue_number"
+    ),
+    "doctor_dates": (
+        "SELECT DISTINCT queue_date FROM appointments "
+        "WHERE doctor_name = :doctor ORDER BY queue_date"
+    ),
+    "patient_history": (
+        f"SELECT {COLUMNS} FROM appointments WHERE patient_name = :patient "
+        "ORDER BY time_slot DESC"
+    ),
+    "daily_report": (
+        f"SELECT {COLUMNS} FROM appointments "
+        "WHERE queue_date = :day AND time_slot BETWEEN :day_start AND :day_end"
+    ),
+}
+
+
+def seed(rows, doctors, patients, batch=50_000):
+    Base.metadata.drop_all(bind=engine, tables=[Appointment.__table__])
+    Base.metadata.create_all(bind=engine, tables=[Appointment.__table__])
+    drop_indexes()
+
+    rng = random.Random(42)
+    # Queue numbers run 1, 2, ... per doctor and day, as bookings hand them
+    # out (uq_appointments_doctor_day_queue rejects repeats)
+    last_number = Counter()
+
+    def row():
+        doctor = f"Dr. {rng.randrange(doctors)}"
+        time_slot = START + timedelta(minutes=15 * rng.randrange(4 * 24 * 365 * 3))
+        last_number[doctor, time_slot.date()] += 1
+        return {
+            "id": str(uuid.uuid4()),
+            "patient_name": f"Patient {rng.randrange(patients)}",
+            "doctor_name": doctor,
+            "time_slot": time_slot,
+            "queue_number": last_number[doctor, time_slot.date()],
+            "status": rng.choice(STATUSES),
+            "created_at": START,
+        }
+
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            conn.execute(insert(Appointment), [row() for _ in range(min(batch, rows - offset))])
+
+
+def drop_indexes():
+    with engine.begin() as conn:
+        for index in Appointment.__table__.indexes:
+            conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == "sqlite":
+        plan = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).all()
+        return "\n".join(f"    {row[-1]}" for row in plan)
+    plan = conn.execute(text(f"EXPLAIN ANALYZE {sql}"), params).all()
+    return "\n".join(f"    {row[0]}" for row in plan)
+
+
+def run(label, repeat, params):
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, sql in QUERIES.items():
+            timings = []
+            for p in params[:repeat]:
+                t0 = time.perf_counter()
+                conn.execute(text(sql), p).all()
+                timings.append((time.perf_counter() - t0) * 1000)
+            print(f"{name:<16} median {statistics.median(timings):9.3f} ms")
+            print(explain(conn, sql, params[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    seed(args.rows, args.doctors, args.patients)
+    print(f"Seeded {args.rows} rows in {time.perf_counter() - t0:.1f}s ({engine.url.drivername})")
+
+    rng = random.Random(7)
+    params = []
+    for _ in range(args.repeat):
+        day = (START + timedelta(days=rng.randrange(365 * 3))).date()
+        day_start = datetime.fromisoformat(f"{day}T00:00:00")
+        params.append({
+            "doctor": f"Dr. {rng.randrange(args.doctors)}",
+            "patient": f"Patient {rng.randrange(args.patients)}",
+            "day": day,
+            "prev_day": day - timedelta(days=1),
+            "window_start": day_start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+            "day_start": day_start,
+            "day_end": datetime.fromisoformat(f"{day}T23:59:59"),
+        })
+
+    run("without indexes", args.repeat, params)
+
+    t0 = time.perf_counter()
+    create_indexes(tables=[Appointment.__table__])
+    print(f"\nBuilt indexes in {time.perf_counter() - t0:.1f}s")
+
+    run("with indexes", args.repeat, params)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Latency of GET /patients/search over a large patient_summary table.
+
+Fills patient_summary with N synthetic patients (the search index is kept
+in sync by the same triggers / pg_trgm index as in production), then times
+patient_search.search for prefix, substring, multi-word and misspelled
+queries and reports p50/p95 per kind.
+
+    python benchmarks/bench_patient_search.py --patients 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_search.db")
+
+from sqlalchemy import insert  # noqa: E402
+
+from database import Base, engine, SessionLocal  # noqa: E402
+from models import PatientSummary  # noqa: E402
+from migrate import migrate  # noqa: E402
+import patient_search  # noqa: E402
+
+FIRST = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael",
+         "Linda", "William", "Elizabeth", "David", "Barbara", "Richard", "Susan",
+         "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen", "Aarav",
+         "Priya", "Wei", "Fatima", "Mohammed", "Olga", "Kenji", "Lucia"]
+LAST = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+        "Davis", "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez",
+        "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+        "Sharma", "Chen", "Khan", "Petrova", "Tanaka", "Rossi", "Okafor"]
+
+
+def synthetic_names(n, rng):
+    # a numeric suffix keeps names unique and realistic in spread
+    return [f"{rng.choice(FIRST)} {rng.choice(LAST)} {i:07d}" for i in range(n)]
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def queries(names, rng, count):
+    kinds = {"prefix": [], "substring": [], "two words": [], "typo": []}
+    for _ in range(count):
+        first, last, suffix = rng.choice(names).split()
+        kinds["prefix"].append(f"{first} {last[:3]}")
+        kinds["substring"].append(suffix[-5:])
+        kinds["two words"].append(f"{last} {suffix}")
+        kinds["typo"].append(f"{typo(first, rng)} {last} {suffix[:4]}")
+    return kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {patient_search.FTS_TABLE}")
+    migrate()
+
+    names = synthetic_names(args.patients, rng)
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for i in range(0, len(names), 50_000):
+            conn.execute(insert(PatientSummary), [
+                {"patient_name": n, "visits": 1, "last_visit": datetime(2025, 1, 6)}
+                for n in names[i:i + 50_000]
+            ])
+    print(f"{args.patients:,} patients indexed in {time.perf_counter() - t0:.1f}s")
+
+    db = SessionLocal()
+    try:
+        for kind, qs in queries(names, rng, args.queries).items():
+            times, hits = [], 0
+            for q in qs:
+                t0 = time.perf_counter()
+                results = patient_search.search(db, q, args.limit)
+                times.append(time.perf_counter() - t0)
+                hits += bool(results)
+            times.sort()
+            print(f"{kind:<10} p50 {times[len(times) // 2] * 1000:6.2f} ms  "
+                  f"p95 {times[int(len(times) * 0.95) - 1] * 1000:6.2f} ms  "
+                  f"({hits}/{len(qs)} with results)  e.g. {qs[0]!r}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
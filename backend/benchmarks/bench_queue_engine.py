@@ -0,0 +1,75 @@
+"""
+Cost of a status change and a position lookup in queue_engine.DayQueue.
+
+Fills one doctor/day queue with --size pending appointments, then applies
+random status changes (cancel, reinstate) and looks up random positions,
+against a baseline that recounts the pending appointments ahead on every
+lookup (what a query over the day's rows does).
+
+    python benchmarks/bench_queue_engine.py --size 5000 --ops 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")  # imported, never queried
+
+from queue_engine import DayQueue, Entry  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    slot = datetime(2025, 1, 6, 8)
+    entries = {
+        f"a{n}": Entry(n, rng.choice([None, 15, 30, 45]), slot, f"Patient {n}")
+        for n in range(1, args.size + 1)
+    }
+    queue = DayQueue()
+    for appointment_id, entry in entries.items():
+        queue.apply(appointment_id, "waiting", entry, slot, 30)
+
+    ids = list(entries)
+    changes = [(rng.choice(ids), rng.choice(["waiting", "cancelled"])) for _ in range(args.ops)]
+    lookups = [rng.choice(ids) for _ in range(args.ops)]
+
+    t0 = time.perf_counter()
+    for appointment_id, status in changes:
+        queue.apply(appointment_id, status, entries[appointment_id], slot, 30)
+    apply_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for appointment_id in lookups:
+        entry = queue.entries.get(appointment_id)
+        if entry is not None:
+            queue.ahead(entry, 30)
+    lookup_s = time.perf_counter() - t0
+
+    baseline_ops = min(args.ops, 2000)
+    t0 = time.perf_counter()
+    for appointment_id in lookups[:baseline_ops]:
+        entry = queue.entries.get(appointment_id)
+        if entry is not None:
+            ahead = [e for e in queue.entries.values() if e.queue_number < entry.queue_number]
+            len(ahead), sum(e.duration or 30 for e in ahead)
+    scan_s = (time.perf_counter() - t0) * args.ops / baseline_ops
+
+    us = lambda s: round(s / args.ops * 1e6, 2)  # noqa: E731
+    print(f"queue size {args.size}, {len(queue.entries)} pending after the run")
+    print(f"status change   {us(apply_s):>9} us/op")
+    print(f"position lookup {us(lookup_s):>9} us/op")
+    print(f"recount ahead   {us(scan_s):>9} us/op (baseline)")
+
+
+if __name__ == "__main__":
+    main()
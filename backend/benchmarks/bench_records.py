@@ -0,0 +1,132 @@
+"""
+Memory and latency of appointment_service record representations.
+
+Compares, for N synthetic records:
+- the previous string-field dataclass in a list,
+- the slotted, integer-encoded Appointment in a list,
+- the columnar AppointmentTable (NumPy masks when NumPy is installed).
+
+    python benchmarks/bench_records.py --records 1000000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from appointment_service import (  # noqa: E402
+    Appointment, AppointmentMode, AppointmentStatus, AppointmentTable,
+    decode_date, encode_date, np,
+)
+
+
+@dataclass
+class LegacyAppointment:
+    id: str
+    name: str
+    date: str
+    time: str
+    duration: int
+    doctor_name: str
+    status: AppointmentStatus
+    mode: AppointmentMode
+    reason: Optional[str] = None
+
+
+def synthetic(n, seed=5):
+    rng = random.Random(seed)
+    first_day = encode_date("2020-01-01")
+    statuses, modes = list(AppointmentStatus), list(AppointmentMode)
+    for i in range(n):
+        minute = 8 * 60 + 15 * rng.randrange(40)
+        yield dict(
+            id=f"apt-{i:08d}",
+            name=f"Patient {rng.randrange(n // 4 + 1)}",
+            date=decode_date(first_day + rng.randrange(5 * 365)),
+            time=f"{minute // 60:02d}:{minute % 60:02d}",
+            duration=rng.choice((15, 30, 45, 60)),
+            # built per record, as parsed input would be: no shared string
+            doctor_name="".join(["Dr. ", str(rng.randrange(300))]),
+            status=rng.choice(statuses),
+            mode=rng.choice(modes),
+            reason=None,
+        )
+
+
+def measure(label, build):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    built = build()
+    elapsed = time.perf_counter() - t0
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, f"{label:<22} build {elapsed:6.2f}s  {size / 2**20:8.1f} MiB"
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return result, best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    n = args.records
+    start, end, status, doctor = "2022-03-01", "2022-05-31", "Scheduled", "Dr. 42"
+
+    # Built from freshly generated input so each representation pays for
+    # the strings it keeps (build time includes generating the input).
+    legacy, line = measure("dataclass list", lambda: [LegacyAppointment(**r) for r in synthetic(n)])
+    print(line)
+    slotted, line = measure("slotted list", lambda: [Appointment(**r) for r in synthetic(n)])
+    print(line)
+    table, line = measure(
+        f"AppointmentTable ({'numpy' if np is not None else 'array'})",
+        lambda: AppointmentTable(slotted),
+    )
+    print(line)
+
+    _, ms = timed(lambda: [
+        a for a in legacy
+        if start <= a.date <= end and a.status.value == status and a.doctor_name == doctor
+    ])
+    print(f"\nfilter  dataclass list {ms:9.2f} ms")
+
+    lo, hi, st = encode_date(start), encode_date(end), AppointmentStatus(status)
+    _, ms = timed(lambda: [
+        a for a in slotted
+        if lo <= a.day <= hi and a.status is st and a.doctor_name == doctor
+    ])
+    print(f"filter  slotted list   {ms:9.2f} ms")
+
+    hits, ms = timed(lambda: table.filter(start, end, status=status, doctor_name=doctor))
+    print(f"filter  table          {ms:9.2f} ms  ({len(hits)} rows)")
+
+    _, ms = timed(lambda: sorted(legacy, key=lambda a: (a.date, a.time)), repeat=2)
+    print(f"\nsort    dataclass list {ms:9.2f} ms")
+    _, ms = timed(lambda: sorted(slotted, key=lambda a: (a.day, a.minute)), repeat=2)
+    print(f"sort    slotted list   {ms:9.2f} ms")
+    if np is not None:
+        _, ms = timed(lambda: np.lexsort((
+            np.frombuffer(table.minutes, dtype=np.int16),
+            np.frombuffer(table.days, dtype=np.int32),
+        )), repeat=2)
+        print(f"sort    table          {ms:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Serialization cost of an appointment listing, per 10k rows.
+
+Fills an in-memory SQLite database with --rows appointments, then times
+reading and encoding all of them to JSON the ways the API can:
+
+- orm_jsonable: Appointment objects through jsonable_encoder + json.dumps
+  (FastAPI's path for an endpoint returning ORM objects, no response_model)
+- orm_pydantic: Appointment objects validated and dumped by Pydantic
+  (FastAPI's path with response_model=list[AppointmentOut])
+- columns_orjson: select(*APPOINTMENT_COLUMNS) rows as dicts + orjson
+  (what GET /appointments, /patients/{name} and /reports/daily do now)
+
+Reports the median fetch, encode and total milliseconds, scaled to 10k rows.
+
+    python benchmarks/bench_serialization.py --rows 10000 --repeat 20
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite://")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import engine, SessionLocal  # noqa: E402
+from migrate import migrate  # noqa: E402
+from models import Appointment  # noqa: E402
+from schemas import AppointmentOut  # noqa: E402
+from serialization import dumps, row_dicts  # noqa: E402
+from main import APPOINTMENT_COLUMNS  # noqa: E402
+
+appointment_list = TypeAdapter(list[AppointmentOut])
+
+
+def fill(n):
+    migrate()
+    start = datetime(2025, 1, 6, 8)
+    rows = []
+    for i in range(n):
+        slot = start + timedelta(days=i // 200, minutes=15 * (i % 40))
+        rows.append({
+            "id": f"{i:08d}-0000-4000-8000-000000000000",
+            "patient_name": f"Patient {i % 5000}",
+            "doctor_name": f"Dr. Bench {i % 5}",
+            "time_slot": slot,
+            "duration": 15 if i % 3 else None,
+            "queue_number": i % 40 + 1 + 40 * (i % 200 // 40),
+            "queue_date": slot.date(),
+            "status": "waiting" if i % 4 else "completed",
+            "created_at": start,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Appointment), rows)
+
+
+def orm_jsonable(db):
+    data = db.scalars(select(Appointment)).all()
+    t = time.perf_counter()
+    return data, t, json.dumps(jsonable_encoder(data)).encode()
+
+
+def orm_pydantic(db):
+    data = db.scalars(select(Appointment)).all()
+    t = time.perf_counter()
+    return data, t, appointment_list.dump_json(data)
+
+
+def columns_orjson(db):
+    data = row_dicts(db.execute(select(*APPOINTMENT_COLUMNS)))
+    t = time.perf_counter()
+    return data, t, dumps(data)
+
+
+VARIANTS = {f.__name__: f for f in (orm_jsonable, orm_pydantic, columns_orjson)}
+
+
+def measure(variant, repeat):
+    fetch, encode, size = [], [], 0
+    for _ in range(repeat):
+        with SessionLocal() as db:  # fresh identity map every run
+            t0 = time.perf_counter()
+            data, t1, body = variant(db)
+            t2 = time.perf_counter()
+        fetch.append(t1 - t0)
+        encode.append(t2 - t1)
+        size = len(body)
+    return statistics.median(fetch), statistics.median(encode), size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fill(args.rows)
+    scale = 10000 / args.rows * 1000  # seconds per run -> ms per 10k rows
+    print(f"{'variant':<16}{'fetch ms':>10}{'encode ms':>11}{'total ms':>10}{'bytes':>11}"
+          "   (per 10k rows)")
+    for name, variant in VARIANTS.items():
+        measure(variant, 2)  # warm-up
+        fetch, encode, size = measure(variant, args.repeat)
+        print(f"{name:<16}{fetch * scale:>10.1f}{encode * scale:>11.1f}"
+              f"{(fetch + encode) * scale:>10.1f}{size:>11}")
+
+
+if __name__ == "__main__":
+    main()
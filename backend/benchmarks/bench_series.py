@@ -0,0 +1,139 @@
+"""
+Reading recurring series: a year's window over many series.
+
+Creates --series weekly/daily/monthly series (first occurrences spread
+over the past --years, most of them endless) and times:
+
+- page: the first --limit occurrences of the next 12 months
+  (GET /series/occurrences): one seek per series plus the page
+- window: every occurrence of the next 12 months, for scale
+- naive: expanding each series from its first occurrence to the window
+  end, as an expander without seeking would
+- book_day: booking one doctor's day (as POST /appointments does
+  first), first time and once booked
+
+    python benchmarks/bench_series.py --series 10000 --years 3
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_series.db")
+
+from sqlalchemy import delete, insert  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from migrate import migrate  # noqa: E402
+from models import Appointment, AppointmentSeries, SeriesOverride  # noqa: E402
+import appointment_series  # noqa: E402
+import recurrence  # noqa: E402
+
+RULES = [
+    "FREQ=WEEKLY", "FREQ=WEEKLY;BYDAY=MO,TH", "FREQ=WEEKLY;INTERVAL=2",
+    "FREQ=WEEKLY;BYDAY=TU,WE,FR", "FREQ=DAILY;INTERVAL=3", "FREQ=MONTHLY",
+    "FREQ=WEEKLY;COUNT=520",
+]
+
+
+def fill(n, years, doctors, rng):
+    with engine.begin() as conn:
+        for model in (Appointment, AppointmentSeries, SeriesOverride):
+            conn.execute(delete(model))
+    today = datetime.combine(date.today(), datetime.min.time())
+    rows = []
+    for i in range(n):
+        rrule = rng.choice(RULES)
+        rule = recurrence.parse(rrule)
+        start = today - timedelta(days=rng.randrange(years * 365)) + timedelta(
+            hours=8 + rng.randrange(9), minutes=15 * rng.randrange(4)
+        )
+        if rule.byday:  # move the first occurrence onto one of its days
+            start += timedelta(days=(rule.byday[0] - start.weekday()) % 7)
+        last = recurrence.last_occurrence(rule, start)
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "patient_name": f"Series Patient {i}",
+            "doctor_name": f"Dr. Series {i % doctors}",
+            "time_slot": start,
+            "duration": 30,
+            "status": "waiting",
+            "rrule": str(rule),
+            "starts_on": start.date(),
+            "ends_on": last.date() if last else None,
+            "created_at": today,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(AppointmentSeries), rows)
+    return rows
+
+
+def timed(fn, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--series", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--doctors", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    migrate()
+    rows = fill(args.series, args.years, args.doctors, random.Random(7))
+    start = datetime.combine(date.today(), datetime.min.time())
+    end = start + timedelta(days=365)
+
+    def page():
+        with SessionLocal() as db:
+            occurrences = appointment_series.window(db, start, end)
+            return len(appointment_series.with_bookings(
+                db, [o for _, o in zip(range(args.limit), occurrences)]
+            ))
+
+    def whole_window():
+        with SessionLocal() as db:
+            return sum(1 for _ in appointment_series.window(db, start, end))
+
+    def naive():
+        return sum(
+            1 for r in rows
+            for _ in recurrence.occurrences(recurrence.parse(r["rrule"]), r["time_slot"], end=end)
+        )
+
+    results = [
+        ("page", *timed(page, args.repeat)),
+        ("window", *timed(whole_window, args.repeat)),
+        ("naive", *timed(naive, 1)),
+    ]
+
+    day = date.today() + timedelta(days=7)
+    with SessionLocal() as db:
+        results.append(("book_day first", *timed(
+            lambda: appointment_series.book_day(db, day, "Dr. Series 0"), 1)))
+        results.append(("book_day again", *timed(
+            lambda: appointment_series.book_day(db, day, "Dr. Series 0"), args.repeat)))
+
+    print(f"{args.series} series, window {start:%Y-%m-%d} .. {end:%Y-%m-%d}")
+    for name, ms, count in results:
+        print(f"{name:<16}{ms:>10.1f} ms  {count:>9} occurrences")
+
+
+if __name__ == "__main__":
+    main()
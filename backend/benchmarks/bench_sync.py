@@ -0,0 +1,106 @@
+"""
+Incremental sync against downloading everything.
+
+Imports --rows appointments through bulk_import (so the version triggers
+run, and their cost shows in the import time), remembers the version,
+changes --changes of them (status updates and deletes), then times:
+
+- sync: GET /sync's query for what changed since that version
+- full: every row with AppointmentOut's columns, as a client that
+  refetches the whole list does
+
+and the size of each JSON body.
+
+    python benchmarks/bench_sync.py --rows 100000 --changes 50
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_sync.db")
+
+from sqlalchemy import delete, select, update  # noqa: E402
+
+from database import SessionLocal, engine  # noqa: E402
+from migrate import migrate  # noqa: E402
+from models import Appointment, AppointmentTombstone  # noqa: E402
+from bulk_import import import_rows  # noqa: E402
+from serialization import dumps, row_dicts  # noqa: E402
+import sync  # noqa: E402
+
+FULL_COLUMNS = sync.COLUMNS[:-1]
+
+
+def fill(n):
+    with engine.begin() as conn:
+        conn.execute(delete(Appointment))
+        conn.execute(delete(AppointmentTombstone))
+    start = datetime(2030, 1, 7, 8)
+    records = (
+        (i, {
+            "patient_name": f"Patient {i % 20000}",
+            "doctor_name": f"Dr. Sync {i % 20}",
+            "time_slot": (start + timedelta(days=i // 400, minutes=15 * (i % 20))).isoformat(),
+        })
+        for i in range(n)
+    )
+    t0 = time.perf_counter()
+    result = import_rows(records)
+    return result["inserted"], time.perf_counter() - t0
+
+
+def change(n, rng):
+    with SessionLocal() as db:
+        ids = db.scalars(select(Appointment.id)).all()
+        picked = rng.sample(ids, n)
+        half = n // 2
+        db.execute(update(Appointment).where(Appointment.id.in_(picked[:half])).values(status="completed"))
+        db.execute(delete(Appointment).where(Appointment.id.in_(picked[half:])))
+        db.commit()
+
+
+def timed(fn, repeat):
+    times, body = [], b""
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            body = fn(db)
+            times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--changes", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    migrate()
+    inserted, seconds = fill(args.rows)
+    print(f"import   {inserted} rows in {seconds:.2f} s ({inserted / seconds:,.0f} rows/s, triggers included)")
+
+    with SessionLocal() as db:
+        since = sync.watermark(db)
+    change(args.changes, random.Random(7))
+
+    results = [
+        ("sync", *timed(lambda db: dumps(sync.changes(db, since)), args.repeat)),
+        ("full", *timed(lambda db: dumps(row_dicts(db.execute(select(*FULL_COLUMNS)))), args.repeat)),
+    ]
+    print(f"{args.changes} changes since version {since}")
+    for name, ms, size in results:
+        print(f"{name:<8}{ms:>10.1f} ms{size:>12} bytes")
+
+
+if __name__ == "__main__":
+    main()
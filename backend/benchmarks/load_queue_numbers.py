@@ -0,0 +1,82 @@
+"""
+Concurrent booking load test for queue number allocation.
+
+Fires parallel `create_appointment` calls for a handful of doctors on one
+day and checks that each doctor's queue numbers come out unique and
+gapless (1..n).
+
+    python benchmarks/load_queue_numbers.py --bookings 500 --workers 64
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import scratch_db  # noqa: E402
+scratch_db.use("sqlite:///bench_queue.db")
+
+from database import Base, engine, SessionLocal  # noqa: E402
+from migrate import migrate  # noqa: E402
+from schemas import AppointmentCreate  # noqa: E402
+from main import create_appointment  # noqa: E402
+
+DAY = datetime(2025, 1, 6, 0, 0)
+SLOT_MINUTES = 5  # the shortest duration schemas.py accepts
+
+
+def book(i, doctors):
+    # Each doctor's bookings follow one another without overlapping, so
+    # none is rejected by the overlap check (up to 288 per doctor per day)
+    db = SessionLocal()
+    try:
+        created = create_appointment(
+            AppointmentCreate(
+                patient_name=f"Load Patient {i}",
+                doctor_name=f"Dr. Load {i % doctors}",
+                time_slot=DAY + timedelta(minutes=SLOT_MINUTES * (i // doctors)),
+                duration=SLOT_MINUTES,
+            ),
+            db=db,
+        )
+        return created["doctor_name"], created["queue_number"]
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1], parents=[scratch_db.parser]
+    )
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--doctors", type=int, default=4)
+    args = parser.parse_args()
+
+    Base.metadata.drop_all(bind=engine)
+    migrate()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(lambda i: book(i, args.doctors), range(args.bookings)))
+    elapsed = time.perf_counter() - t0
+
+    numbers = defaultdict(list)
+    for doctor, number in results:
+        numbers[doctor].append(number)
+
+    for doctor, issued in sorted(numbers.items()):
+        expected = list(range(1, len(issued) + 1))
+        assert sorted(issued) == expected, f"{doctor}: duplicate or missing queue numbers"
+        print(f"{doctor}: {len(issued)} bookings, numbers 1..{len(issued)} unique")
+
+    print(f"{args.bookings} bookings in {elapsed:.2f}s "
+          f"({args.bookings / elapsed:.0f}/s, {args.workers} workers) - OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Concurrent load test of every HTTP endpoint, with JSON results.
+
+Runs each scenario in turn: `--concurrency` clients issue `--requests`
+requests built from the seed_clinic.py manifest (random doctors, days and
+patients from a fixed seed), then reports p50/p95/p99/max latency,
+throughput and error count per scenario as JSON.
+
+Targets a running server with --url, otherwise the app in-process through
+httpx's ASGI transport (DATABASE_URL must then point at the seeded DB).
+With --baseline, scenarios whose p95 or throughput regressed by more than
+--tolerance are listed and the exit status is 1, for CI.
+
+    python benchmarks/seed_clinic.py --reset
+    python benchmarks/load_test.py --out results.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --baseline results.json
+
+Streaming endpoints (WebSocket/SSE) and bulk import have their own
+benchmarks (bench_fanout.py, bench_bulk_import.py).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_clinic.db")
+
+from seed_clinic import patient_name  # noqa: E402
+
+
+# -------------------------
+# Scenarios: name -> fn(rng, ctx) returning (method, path, kwargs)
+# -------------------------
+def random_day(rng, ctx):
+    first = date.fromisoformat(ctx["first_day"])
+    last = date.fromisoformat(ctx["last_day"])
+    return first + timedelta(days=rng.randrange((last - first).days + 1))
+
+
+def random_doctor(rng, ctx):
+    return rng.choice(ctx["doctors"])
+
+
+def random_patient(rng, ctx):
+    return patient_name(rng.randrange(ctx["patients"]))
+
+
+SCENARIOS = {
+    "health": lambda rng, ctx: ("GET", "/", {}),
+    "appointments_page": lambda rng, ctx: (
+        "GET", "/appointments", {"params": {"limit": 100}}),
+    "appointments_by_doctor_day": lambda rng, ctx: (
+        "GET", f"/appointments/{random_doctor(rng, ctx)}",
+        {"params": {"date_str": random_day(rng, ctx).isoformat()}}),
+    "appointment_dates": lambda rng, ctx: (
+        "GET", f"/appointments/dates/{random_doctor(rng, ctx)}", {}),
+    "appointment_bitmap": lambda rng, ctx: (
+        "GET", f"/appointments/dates/{random_doctor(rng, ctx)}/bitmap",
+        {"params": {"year": random_day(rng, ctx).year}}),
+    "availability": lambda rng, ctx: (
+        "GET", "/availability",
+        {"params": {"doctor": random_doctor(rng, ctx),
+                    "start": random_day(rng, ctx).isoformat()}}),
+    "queue": lambda rng, ctx: (
+        "GET", f"/queue/{random_doctor(rng, ctx)}",
+        {"params": {"date": random_day(rng, ctx).isoformat()}}),
+    "patients_page": lambda rng, ctx: (
+        "GET", "/patients", {"params": {"limit": 100}}),
+    "patients_prefix": lambda rng, ctx: (
+        "GET", "/patients",
+        {"params": {"q": random_patient(rng, ctx)[:-2], "limit": 100}}),
+    "patient_search": lambda rng, ctx: (
+        "GET", "/patients/search",
+        {"params": {"q": random_patient(rng, ctx)[-6:-1]}}),
+    "patient_details": lambda rng, ctx: (
+        "GET", f"/patients/{random_patient(rng, ctx)}", {}),
+    "report_daily": lambda rng, ctx: (
+        "GET", "/reports/daily",
+        {"params": {"date": random_day(rng, ctx).isoformat()}}),
+    "report_weekly": lambda rng, ctx: (
+        "GET", "/reports/weekly",
+        {"params": {"start_date": random_day(rng, ctx).isoformat()}}),
+    "report_doctor_workload": lambda rng, ctx: ("GET", "/reports/doctor-workload", {}),
+    "report_cancellations": lambda rng, ctx: ("GET", "/reports/cancellations", {}),
+    "settings": lambda rng, ctx: ("GET", "/settings", {}),
+    "create_appointment": lambda rng, ctx: (
+        "POST", "/appointments",
+        {"params": {"allow_overlap": "true"},
+         "json": {
+             "patient_name": random_patient(rng, ctx),
+             "doctor_name": random_doctor(rng, ctx),
+             "time_slot": datetime.combine(
+                 random_day(rng, ctx), datetime.min.time()
+             ).replace(hour=8 + rng.randrange(10)).isoformat(),
+         }}),
+    "update_status": lambda rng, ctx: (
+        "PATCH", f"/appointments/{rng.choice(ctx['ids'])}/status",
+        {"params": {"status": rng.choice(["waiting", "completed"])}}),
+    "update_status_batch": lambda rng, ctx: (
+        "PATCH", "/appointments/status",
+        {"json": [{"id": i, "status": "waiting"} for i in rng.sample(ctx["ids"], 25)]}),
+}
+
+
+# -------------------------
+# Load generator
+# -------------------------
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+async def run_scenario(http, name, build, ctx, args):
+    rng = random.Random(f"{args.seed}:{name}")
+    requests = [build(rng, ctx) for _ in range(args.requests)]
+    queue = asyncio.Queue()
+    for request in requests[:args.warmup]:
+        await http.request(request[0], request[1], **request[2])
+    for request in requests:
+        queue.put_nowait(request)
+
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        while not queue.empty():
+            method, path, kwargs = queue.get_nowait()
+            t0 = time.perf_counter()
+            response = await http.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    ms = lambda s: round(s * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": ms(sum(latencies) / len(latencies)),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]),
+    }
+
+
+async def drive(args, ctx):
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(
+            base_url=args.url, timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+    else:
+        from main import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60
+        )
+
+    results = {}
+    async with client as http:
+        page = await http.get("/appointments", params={"limit": 1000})
+        ctx["ids"] = [a["id"] for a in page.json()]
+
+        for name, build in SCENARIOS.items():
+            if args.scenarios and name not in args.scenarios:
+                continue
+            results[name] = await run_scenario(http, name, build, ctx, args)
+            r = results[name]
+            print(f"{name:<28} {r['rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f}  "
+                  f"p95 {r['p95_ms']:>8.2f}  p99 {r['p99_ms']:>8.2f} ms"
+                  f"{'  errors ' + str(r['errors']) if r['errors'] else ''}",
+                  file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, baseline, tolerance):
+    found = []
+    for name, r in results.items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            found.append(f"{name}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            found.append(f"{name}: throughput {base['rps']} -> {r['rps']} req/s")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--manifest", default="bench_clinic.json")
+    parser.add_argument("--url", help="running server; default is in-process")
+    parser.add_argument("--requests", type=int, default=500, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS))
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", help="earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        ctx = json.load(f)
+
+    results = asyncio.run(drive(args, ctx))
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "database": ctx["database"],
+        "clinic": ctx["params"],
+        "python": platform.python_version(),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "scenarios": results,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+The database of a benchmark that wipes tables.
+
+Such a benchmark runs against its own SQLite file unless given
+`--database-url` on the command line. A DATABASE_URL already in the
+environment is ignored, so one left pointing at a real database in a
+developer's shell is never dropped.
+
+    scratch_db.use("sqlite:///bench_x.db")  # before importing the backend
+    parser = argparse.ArgumentParser(parents=[scratch_db.parser])
+"""
+
+import argparse
+import os
+
+parser = argparse.ArgumentParser(add_help=False)
+parser.add_argument(
+    "--database-url",
+    help="database to wipe and run against (default: the benchmark's own SQLite file)",
+)
+
+
+def use(default_url):
+    """Point DATABASE_URL at --database-url, or else at default_url."""
+    url = parser.parse_known_args()[0].database_url or default_url
+    os.environ["DATABASE_URL"] = url
+    return url
@@ -0,0 +1,107 @@
+"""
+Seed a synthetic clinic for the load test.
+
+Generates `--doctors` doctors seeing `--patients` patients over `--years`
+of weekdays, `--per-day` non-overlapping bookings per doctor per day, with
+a fixed random seed so every run produces the same data. Rows go through
+bulk_import.import_rows, so the queue counters, patient summary and report
+rollups are maintained exactly as in production.
+
+Writes a JSON manifest (names, date range, parameters) that
+load_test.py uses to build its requests.
+
+    DATABASE_URL=sqlite:///bench_clinic.db python benchmarks/seed_clinic.py --reset
+    DATABASE_URL=postgresql://localhost:5433/emr_bench python benchmarks/seed_clinic.py \\
+        --doctors 200 --patients 50000 --years 3 --reset
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///bench_clinic.db")
+
+from database import Base, engine  # noqa: E402
+from bulk_import import import_rows  # noqa: E402
+from migrate import migrate  # noqa: E402
+
+FIRST_DAY = date(2023, 1, 2)  # a Monday
+SLOTS = [(8 + m // 60, m % 60) for m in range(0, 10 * 60, 30)]  # 08:00..17:30
+STATUSES = ["waiting"] * 2 + ["completed"] * 7 + ["cancelled"]
+
+
+def doctor_name(i):
+    return f"Dr. Bench {i:04d}"
+
+
+def patient_name(i):
+    return f"Bench Patient {i:06d}"
+
+
+def clinic_days(years):
+    day = FIRST_DAY
+    end = FIRST_DAY + timedelta(days=365 * years)
+    while day < end:
+        if day.weekday() < 5:
+            yield day
+        day += timedelta(days=1)
+
+
+def synthetic_rows(args):
+    rng = random.Random(args.seed)
+    row_number = 0
+    for day in clinic_days(args.years):
+        for d in range(args.doctors):
+            for hour, minute in rng.sample(SLOTS, min(args.per_day, len(SLOTS))):
+                row_number += 1
+                yield row_number, {
+                    "patient_name": patient_name(rng.randrange(args.patients)),
+                    "doctor_name": doctor_name(d),
+                    "time_slot": datetime(day.year, day.month, day.day, hour, minute),
+                    "status": rng.choice(STATUSES),
+                }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=5000)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--per-day", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="drop all tables first")
+    parser.add_argument("--manifest", default="bench_clinic.json")
+    args = parser.parse_args()
+
+    if args.reset:
+        Base.metadata.drop_all(bind=engine)
+    migrate()
+
+    t0 = time.perf_counter()
+    result = import_rows(synthetic_rows(args))
+    elapsed = time.perf_counter() - t0
+
+    days = list(clinic_days(args.years))
+    manifest = {
+        "database": engine.url.render_as_string(hide_password=True),
+        "doctors": [doctor_name(d) for d in range(args.doctors)],
+        "patients": args.patients,
+        "first_day": days[0].isoformat(),
+        "last_day": days[-1].isoformat(),
+        "appointments": result["inserted"],
+        "params": vars(args),
+    }
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"Seeded {result['inserted']:,} appointments in {elapsed:.1f}s "
+          f"({result['failed']} failed); manifest in {args.manifest}")
+
+
+if __name__ == "__main__":
+    main()
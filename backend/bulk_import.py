@@ -0,0 +1,213 @@
+"""
+Bulk appointment import from CSV or NDJSON.
+
+Rows are validated one by one (bad rows are reported, not fatal), then
+written in batches: each batch reserves the queue numbers of every
+(doctor, day) it touches in one counter upsert, inserts all rows in a
+single executemany — or COPY on PostgreSQL/psycopg2 — updates the patient
+summary and report rollups with one upsert each, and commits.
+
+    python bulk_import.py history.csv --batch-size 5000
+    python bulk_import.py export.ndjson
+
+CSV files need a header row with patient_name, doctor_name, time_slot and
+optionally status; NDJSON lines are objects with the same keys.
+"""
+
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+
+from database import SessionLocal
+from models import Appointment
+from schemas import AppointmentCreate, AppointmentOut
+from queue_numbers import reserve_queue_numbers
+from patient_summary import record_visits
+import audit
+import events
+import report_rollups
+import response_cache
+
+DEFAULT_BATCH_SIZE = 5000
+
+COPY_COLUMNS = (
+    "id", "patient_name", "doctor_name", "time_slot", "duration",
+    "queue_number", "queue_date", "status", "created_at", "updated_at",
+    "series_id", "occurrence_start",
+)
+
+
+def parse_csv(lines):
+    for row_number, row in enumerate(csv.DictReader(lines), start=1):
+        yield row_number, row
+
+
+def parse_ndjson(lines):
+    for row_number, line in enumerate(lines, start=1):
+        if line.strip():
+            yield row_number, line
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+
+def _validate(raw):
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object")
+    fields = {k: v for k, v in raw.items() if v not in (None, "")}
+    return AppointmentCreate(**fields)
+
+
+def _error_message(exc):
+    if isinstance(exc, ValidationError):
+        return "; ".join(
+            f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()
+        )
+    return str(exc)
+
+
+def _assign_queue_numbers(db, batch):
+    by_day = defaultdict(list)
+    for row in batch:
+        by_day[(row["doctor_name"], row["queue_date"])].append(row)
+
+    last_numbers = reserve_queue_numbers(
+        db, {key: len(rows) for key, rows in by_day.items()}
+    )
+    for key, rows in by_day.items():
+        rows.sort(key=lambda r: r["time_slot"])
+        first = last_numbers[key] - len(rows) + 1
+        for number, row in enumerate(rows, start=first):
+            row["queue_number"] = number
+
+
+def _copy_rows(db, batch):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([row.get(c) for c in COPY_COLUMNS])
+    buf.seek(0)
+
+    cursor = db.connection().connection.driver_connection.cursor()
+    cursor.copy_expert(
+        f"COPY appointments ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def _update_derived_tables(db, batch):
+    patients = {}
+    for row in batch:
+        visits, last = patients.get(row["patient_name"], (0, row["time_slot"]))
+        patients[row["patient_name"]] = (visits + 1, max(last, row["time_slot"]))
+    record_visits(db, [
+        {"patient_name": name, "visits": visits, "last_visit": last}
+        for name, (visits, last) in patients.items()
+    ])
+
+    report_rollups.bump_many(
+        db, Counter((r["queue_date"], r["doctor_name"], r["status"]) for r in batch)
+    )
+
+
+def write_batch(db, batch, publish=False):
+    """Insert rows (dicts without queue_number) and commit; with publish,
+    a change event is sent per row, as for single bookings."""
+    _assign_queue_numbers(db, batch)
+
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copy_rows(db, batch)
+    else:
+        db.execute(insert(Appointment.__table__), batch)
+
+    _update_derived_tables(db, batch)
+    for row in batch:
+        audit.record(db, "created", row)
+        if publish:
+            events.publish(
+                db, "created", AppointmentOut.model_validate(row).model_dump(mode="json")
+            )
+    response_cache.invalidate(
+        db, "patients", "reports",
+        *{f"dates:{row['doctor_name']}" for row in batch}
+    )
+    db.commit()
+
+
+def import_rows(records, batch_size=DEFAULT_BATCH_SIZE, session_factory=SessionLocal):
+    """Import (row_number, raw) records; returns counts and per-row errors."""
+    inserted = 0
+    errors = []
+    batch = []
+    now = datetime.utcnow()
+
+    db = session_factory()
+    try:
+        for row_number, raw in records:
+            try:
+                appointment = _validate(raw)
+            except (ValueError, TypeError, ValidationError) as exc:
+                errors.append({"row": row_number, "error": _error_message(exc)})
+                continue
+
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "patient_name": appointment.patient_name,
+                "doctor_name": appointment.doctor_name,
+                "time_slot": appointment.time_slot,
+                "duration": appointment.duration,
+                "queue_date": appointment.time_slot.date(),
+                "status": appointment.status,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+            if len(batch) >= batch_size:
+                write_batch(db, batch)
+                inserted += len(batch)
+                batch = []
+
+        if batch:
+            write_batch(db, batch)
+            inserted += len(batch)
+    finally:
+        db.close()
+
+    return {"inserted": inserted, "failed": len(errors), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import appointments")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=sorted(PARSERS))
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+
+    t0 = time.perf_counter()
+    with open(args.path, newline="", encoding="utf-8") as f:
+        result = import_rows(PARSERS[fmt](f), batch_size=args.batch_size)
+    elapsed = time.perf_counter() - t0
+
+    for error in result["errors"]:
+        print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {result['inserted']} rows, {result['failed']} failed "
+          f"in {elapsed:.1f}s ({result['inserted'] / max(elapsed, 1e-9):.0f} rows/s)")
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
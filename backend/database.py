@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -7,10 +9,40 @@ DATABASE_URL = os.getenv(
     "postgresql://localhost:5433/emr"
 )
 
-engine = create_engine(
-    DATABASE_URL,
-    echo=True  # optional, shows SQL logs
-)
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+# -------------------------
+# Engine settings (all overridable from the environment)
+# -------------------------
+DB_ASYNC = env_flag("DB_ASYNC")
+
+ENGINE_OPTIONS = {
+    "echo": env_flag("DB_ECHO"),  # logs every statement; keep off in production
+    "pool_pre_ping": env_flag("DB_POOL_PRE_PING", True),
+}
+
+if not DATABASE_URL.startswith("sqlite"):
+    ENGINE_OPTIONS.update(
+        pool_size=env_int("DB_POOL_SIZE", 10),
+        max_overflow=env_int("DB_MAX_OVERFLOW", 20),
+        pool_timeout=env_int("DB_POOL_TIMEOUT", 30),
+        pool_recycle=env_int("DB_POOL_RECYCLE", 1800),
+    )
+
+# Connections each worker opens at startup, so early requests skip connect
+DB_POOL_WARM = env_int("DB_POOL_WARM", 4)
+
+engine = create_engine(DATABASE_URL, **ENGINE_OPTIONS)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -19,3 +51,63 @@ SessionLocal = sessionmaker(
 )
 
 Base = declarative_base()
+
+
+def warm_pool(bind, size=DB_POOL_WARM):
+    """Open `size` connections at once and return them to the pool."""
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(bind.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+# Dialect insert() with on_conflict_do_update (PostgreSQL and SQLite share the API)
+def upsert_insert(db):
+    bind = db.get_bind() if hasattr(db, "get_bind") else db
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+# -------------------------
+# Async engine (DB_ASYNC=1): asyncpg for PostgreSQL, aiosqlite for SQLite
+# -------------------------
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(async_url(DATABASE_URL), **ENGINE_OPTIONS)
+
+    AsyncSessionLocal = async_sessionmaker(
+        autoflush=False,
+        bind=async_engine
+    )
+
+
+async def warm_async_pool(size=DB_POOL_WARM):
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(await async_engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
@@ -0,0 +1,234 @@
+"""
+Appointment change events and the in-process pub/sub hub behind
+/ws/appointments and /events/appointments.
+
+Mutating endpoints call `publish(db, type, appointment)` before committing.
+The event is only delivered once the transaction commits (a rollback drops
+it) and goes through the configured backend:
+
+- `local` (default): dispatched straight to this process's hub.
+- `postgres`: sent with pg_notify inside the transaction; every worker
+  LISTENs on the channel, so all uvicorn workers see every change.
+
+Subscribers choose a topic: everything, one doctor, or one doctor's day.
+Each subscriber holds pending events keyed by appointment id, so a burst of
+updates to one appointment collapses into its latest state. A subscriber
+that falls `max_pending` events behind has its backlog replaced by a single
+`resync` event (refetch, then continue) instead of slowing publishers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "local")
+MAX_PENDING = int(os.getenv("EVENTS_MAX_PENDING", 500))
+PG_CHANNEL = "appointment_events"
+
+RESYNC = "__resync__"
+
+
+def _merge(previous, current):
+    """Coalesce two pending events for the same appointment."""
+    if previous["type"] == "created":
+        if current["type"] == "deleted":
+            return None  # never seen by the subscriber, nothing to report
+        return {**current, "type": "created"}
+    return current
+
+
+class Subscription:
+    def __init__(self, hub, topic, max_pending=MAX_PENDING):
+        self.hub = hub
+        self.topic = topic
+        self.max_pending = max_pending
+        self.resyncs = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def push(self, evt):
+        key = evt.get("appointment", {}).get("id", RESYNC)
+        previous = self._pending.pop(key, None)
+        if previous is not None:
+            evt = _merge(previous, evt)
+            if evt is None:
+                return
+
+        if len(self._pending) >= self.max_pending:
+            self._pending.clear()
+            self._pending[RESYNC] = {"type": "resync"}
+            self.resyncs += 1
+
+        self._pending[key] = evt
+        self._ready.set()
+
+    async def drain(self):
+        """Wait for at least one event and return everything pending."""
+        while not self._pending:
+            self._ready.clear()
+            await self._ready.wait()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+def topics_for(evt):
+    appointment = evt.get("appointment")
+    if appointment is None:
+        return None  # resync/broadcast: every subscriber
+    doctor = appointment["doctor_name"]
+    return [
+        ("all",),
+        ("doctor", doctor),
+        ("day", doctor, appointment["time_slot"][:10]),
+    ]
+
+
+def topic_key(doctor=None, day=None):
+    if doctor and day:
+        return ("day", doctor, day)
+    if doctor:
+        return ("doctor", doctor)
+    return ("all",)
+
+
+class Hub:
+    def __init__(self):
+        self.loop = None
+        self._topics = {}
+
+    def bind(self, loop):
+        self.loop = loop
+
+    def subscribe(self, topic, max_pending=MAX_PENDING):
+        subscription = Subscription(self, topic, max_pending)
+        self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._topics.get(subscription.topic)
+        if subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[subscription.topic]
+
+    @property
+    def subscriber_count(self):
+        return sum(len(s) for s in self._topics.values())
+
+    def dispatch(self, events):
+        """Fan events out to subscribers; must run on the hub's loop."""
+        for evt in events:
+            topics = topics_for(evt)
+            if topics is None:
+                targets = [s for subs in self._topics.values() for s in subs]
+            else:
+                targets = [s for t in topics for s in self._topics.get(t, ())]
+            for subscription in targets:
+                subscription.push(evt)
+
+    def dispatch_threadsafe(self, events):
+        if self.loop is None or self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.dispatch, events)
+
+
+hub = Hub()
+
+
+# -------------------------
+# Backends
+# -------------------------
+class LocalBackend:
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def before_commit(self, session, events):
+        pass
+
+    def after_commit(self, events):
+        hub.dispatch_threadsafe(events)
+
+
+class PostgresBackend:
+    def __init__(self, url=DATABASE_URL):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+        self._conn = None
+
+    async def start(self):
+        import asyncpg
+
+        self._conn = await asyncpg.connect(self.dsn)
+        await self._conn.add_listener(PG_CHANNEL, self._on_notify)
+
+    async def stop(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        hub.dispatch([json.loads(payload)])  # one event per NOTIFY
+
+    def before_commit(self, session, events):
+        # NOTIFY is transactional: delivered to listeners only on commit
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            [{"channel": PG_CHANNEL, "payload": json.dumps(e)} for e in events],
+        )
+
+    def after_commit(self, events):
+        pass
+
+
+BACKENDS = {"local": LocalBackend, "postgres": PostgresBackend}
+backend = BACKENDS[EVENTS_BACKEND]()
+
+
+# -------------------------
+# Publishing
+# -------------------------
+def publish(db, type_, appointment):
+    """Queue a change event on the session; sent when it commits."""
+    db.info.setdefault("pending_events", []).append(
+        {"type": type_, "appointment": appointment}
+    )
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    events = session.info.get("pending_events")
+    if events:
+        backend.before_commit(session, events)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    events = session.info.pop("pending_events", None)
+    if events:
+        try:
+            backend.after_commit(events)
+        except Exception:
+            logger.exception("Failed to dispatch appointment events")
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("pending_events", None)
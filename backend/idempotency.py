@@ -0,0 +1,349 @@
+"""
+Idempotency-Key support for mutating requests (POST / PUT / PATCH / DELETE).
+
+A client that may retry sends a unique `Idempotency-Key` header (a UUID)
+and repeats it on every retry. The first request runs; its response
+(status, headers, body) is stored under the key, and a retry gets that
+stored response back, with `Idempotent-Replayed: true`, instead of running
+again: no second booking, no second queue number.
+
+- Duplicates that arrive while the first is still running wait for it and
+  get its response: one execution however many copies are in flight.
+- The key is bound to the request it was first used with (method, path,
+  query and body); reusing it for a different request is a 422.
+- Server errors (5xx) are not kept, so a retry after one runs again, as
+  does a duplicate that was waiting on it.
+- Requests without the header are untouched.
+
+Backends (IDEMPOTENCY_BACKEND):
+
+- `memory` (default): per-process LRU of IDEMPOTENCY_MAX_ENTRIES responses,
+  each kept IDEMPOTENCY_TTL seconds. Duplicates are only recognised by the
+  worker that served the first request.
+- `db`: the idempotency_keys table, shared by every worker. A request
+  claims its key with an insert; a duplicate in another worker polls until
+  the response is stored (up to IDEMPOTENCY_WAIT_SECONDS, then 409). A
+  claim whose worker died lapses after IDEMPOTENCY_CLAIM_SECONDS. Expired
+  rows are cleaned up by `python idempotency.py purge`.
+- `off`: the header is ignored.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select, update
+
+from database import engine, env_int, upsert_insert
+from models import IdempotencyKey
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+IDEMPOTENCY_TTL = env_int("IDEMPOTENCY_TTL", 86400)
+IDEMPOTENCY_MAX_ENTRIES = env_int("IDEMPOTENCY_MAX_ENTRIES", 10000)
+IDEMPOTENCY_WAIT_SECONDS = env_int("IDEMPOTENCY_WAIT_SECONDS", 10)
+IDEMPOTENCY_CLAIM_SECONDS = env_int("IDEMPOTENCY_CLAIM_SECONDS", 60)
+
+KEY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+METHODS = ("POST", "PUT", "PATCH", "DELETE")
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+
+
+# -------------------------
+# Backends
+# -------------------------
+# Entries are dicts: fingerprint, status, headers ([name, value] pairs), body.
+class MemoryBackend:
+    name = "memory"
+    blocking = False
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def claim(self, key, fingerprint):
+        # Duplicates within this process wait on the running request (see
+        # IdempotencyMiddleware.running); there is nobody else to ask.
+        return True
+
+    def store(self, key, entry):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def release(self, key):
+        pass
+
+
+class DbBackend:
+    name = "db"
+    blocking = True
+
+    def __init__(self, bind=engine, ttl=IDEMPOTENCY_TTL, claim_seconds=IDEMPOTENCY_CLAIM_SECONDS):
+        self.bind = bind
+        self.ttl = ttl
+        self.claim_seconds = claim_seconds
+
+    def get(self, key):
+        with self.bind.connect() as conn:
+            row = conn.execute(select(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status.is_not(None),
+                IdempotencyKey.expires_at > datetime.utcnow(),
+            )).first()
+        if row is None:
+            return None
+        return {
+            "fingerprint": row.fingerprint,
+            "status": row.status,
+            "headers": json.loads(row.headers),
+            "body": row.body,
+        }
+
+    def claim(self, key, fingerprint):
+        """Insert a running row for `key`, or take over an expired one;
+        False while another request holds it."""
+        now = datetime.utcnow()
+        values = {
+            "key": key, "fingerprint": fingerprint, "status": None,
+            "headers": None, "body": None,
+            "expires_at": now + timedelta(seconds=self.claim_seconds),
+        }
+        stmt = upsert_insert(self.bind)(IdempotencyKey).values(**values)
+        with self.bind.begin() as conn:
+            result = conn.execute(stmt.on_conflict_do_update(
+                index_elements=[IdempotencyKey.key],
+                set_={k: stmt.excluded[k] for k in values if k != "key"},
+                where=IdempotencyKey.expires_at <= now,
+            ))
+        return result.rowcount == 1
+
+    def store(self, key, entry):
+        with self.bind.begin() as conn:
+            conn.execute(update(IdempotencyKey).where(IdempotencyKey.key == key).values(
+                status=entry["status"],
+                headers=json.dumps(entry["headers"]),
+                body=entry["body"],
+                expires_at=datetime.utcnow() + timedelta(seconds=self.ttl),
+            ))
+
+    def release(self, key):
+        with self.bind.begin() as conn:
+            conn.execute(delete(IdempotencyKey).where(
+                IdempotencyKey.key == key, IdempotencyKey.status.is_(None)
+            ))
+
+    def purge(self):
+        with self.bind.begin() as conn:
+            return conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+            ).rowcount
+
+
+BACKENDS = {"memory": MemoryBackend, "db": DbBackend, "off": lambda: None}
+backend = BACKENDS[IDEMPOTENCY_BACKEND]()
+
+
+async def _call(method, *args):
+    if backend.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+# -------------------------
+# Middleware
+# -------------------------
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _fingerprint(scope, body):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1")):
+        digest.update(part.encode() + b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _send(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _error(send, status, detail, headers=()):
+    body = dumps({"detail": detail})
+    await _send(send, status, [
+        ("content-type", "application/json"), ("content-length", str(len(body))), *headers,
+    ], body)
+
+
+async def _replay(send, entry, fingerprint):
+    if entry["fingerprint"] != fingerprint:
+        await _error(send, 422, "Idempotency-Key was already used for a different request")
+        return
+    await _send(send, entry["status"], [*entry["headers"], (REPLAYED_HEADER.lower(), "true")], entry["body"])
+
+
+class IdempotencyMiddleware:
+    """Pure ASGI middleware; see the module docstring."""
+
+    def __init__(self, app):
+        self.app = app
+        self.running = {}  # key -> future of the entry, per process
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS or backend is None:
+            await self.app(scope, receive, send)
+            return
+        key = _header(scope, KEY_HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _error(send, 400, f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+            return
+
+        body = await _read_body(receive)
+        fingerprint = _fingerprint(scope, body)
+        while True:
+            running = self.running.get(key)
+            if running is not None:
+                entry = await asyncio.shield(running)
+                if entry is None:  # it ended without a response to share
+                    continue
+                await _replay(send, entry, fingerprint)
+                return
+
+            # Registered before the first await, so later duplicates in
+            # this process wait on it instead of asking the backend
+            future = asyncio.get_running_loop().create_future()
+            self.running[key] = future
+            try:
+                entry = await _call(backend.get, key)
+                if entry is None:
+                    if await _call(backend.claim, key, fingerprint):
+                        entry = await self._run(scope, receive, send, key, body, fingerprint)
+                        # a 5xx is not kept, so waiters run the request again
+                        future.set_result(entry if entry["status"] < 500 else None)
+                        return
+                    entry = await self._wait(key)
+                if entry is None:
+                    await _error(send, 409, "A request with this Idempotency-Key is still in progress",
+                                 [("retry-after", "1")])
+                    return
+                future.set_result(entry)
+                await _replay(send, entry, fingerprint)
+                return
+            finally:
+                del self.running[key]
+                if not future.done():
+                    future.set_result(None)
+
+    async def _run(self, scope, receive, send, key, body, fingerprint):
+        sent_body = False
+
+        async def replay_receive():
+            nonlocal sent_body
+            if not sent_body:
+                sent_body = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status, headers, chunks = 500, [], []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [
+                    (k.decode("latin-1"), v.decode("latin-1"))
+                    for k, v in message.get("headers", [])
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture)
+        except BaseException:
+            await _call(backend.release, key)
+            raise
+
+        entry = {"fingerprint": fingerprint, "status": status, "headers": headers, "body": b"".join(chunks)}
+        try:
+            if status < 500:
+                await _call(backend.store, key, entry)
+            else:
+                await _call(backend.release, key)
+        except Exception:
+            logger.exception("Storing the response for an Idempotency-Key failed")
+        return entry
+
+    async def _wait(self, key):
+        """The response of a request another worker is running, or None
+        if it takes longer than IDEMPOTENCY_WAIT_SECONDS."""
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_SECONDS)
+            entry = await _call(backend.get, key)
+            if entry is not None:
+                return entry
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Idempotency key store maintenance")
+    parser.add_argument("command", choices=["purge"])
+    parser.parse_args()
+    print(f"Purged {DbBackend().purge()} expired idempotency keys")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,163 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Body, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
-from datetime import datetime
-from database import Base, engine, SessionLocal
-from models import Appointment
-from schemas import AppointmentCreate, AppointmentOut
-from sqlalchemy import func
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+from database import (
+    engine, SessionLocal, DB_ASYNC, AsyncSessionLocal, async_engine,
+    warm_pool, warm_async_pool,
+)
+from contextlib import asynccontextmanager
+import asyncio
+import functools
+import inspect
+import io
+import itertools
+import json
+import logging
+from models import Appointment, AppointmentSeries, AppSettings, PatientSummary, DailyStatusCount
+from schemas import (
+    APPOINTMENT_OUT_FIELDS, AppointmentCreate, AppointmentOut, PatientDetailsOut,
+    SettingsOut, SettingsUpdate, StatusChange,
+    SeriesCreate, SeriesOut, OccurrenceUpdate, OccurrenceOut, SyncOut,
+)
+from serialization import ORJSONResponse, row_dicts
+from queue_numbers import next_queue_number
+from pagination import (
+    CURSOR_HEADER, after_cursor, decode_cursor, encode_cursor, ndjson_lines,
+    encode_key_cursor, decode_key_cursor,
+)
+from patient_summary import record_visit, remove_visit
+import report_rollups
+from bulk_import import DEFAULT_BATCH_SIZE, PARSERS, import_rows
+import appointment_series
+import audit
+import events
+import idempotency
+from queue_engine import queues
+import response_cache
+from occupancy import month_bitmaps
+import metrics
+import partitions
+import patient_search
+import sync
+from availability import AvailabilityEngine, FREE_STATUSES, MAX_APPOINTMENT_MINUTES
+from sqlalchemy import case, func, select, update
+from collections import Counter
+
+PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_SIZE = 1000
+SSE_HEARTBEAT_SECONDS = 15
+MAX_AVAILABILITY_DAYS = 92
+MAX_STATUS_BATCH = 500
 
+ACTIVE_STATUSES = ("waiting", "confirmed", "scheduled", "upcoming")
+STATUSES = ACTIVE_STATUSES + ("completed", "cancelled")
+# Status changes allowed from each status: an active booking can become
+# anything, a cancelled one can only be reinstated (if its slot is still
+# free), a completed one is final.
+TRANSITIONS = {
+    **{status: STATUSES for status in ACTIVE_STATUSES},
+    "cancelled": ACTIVE_STATUSES,
+    "completed": (),
+}
 
-app = FastAPI(title="EMR Appointment Service")
+
+# -------------------------
+# Async mode
+# -------------------------
+# With DB_ASYNC=1 get_db yields an AsyncSession and every endpoint that
+# takes `db` is run through AsyncSession.run_sync on the event loop, so
+# requests are no longer capped by the threadpool size.
+def run_with_async_session(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, db, **kwargs):
+        return await db.run_sync(
+            lambda session: endpoint(*args, db=session, **kwargs)
+        )
+    return wrapper
+
+
+class DbRoute(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        if DB_ASYNC and "db" in inspect.signature(endpoint).parameters:
+            endpoint = run_with_async_session(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+async def partition_maintenance():
+    while True:
+        try:
+            await run_in_threadpool(partitions.maintain)
+        except Exception:
+            logging.getLogger(__name__).exception("Partition maintenance failed")
+        await asyncio.sleep(partitions.MAINTENANCE_INTERVAL_SECONDS)
+
+
+# Books recurring occurrences ahead, so that reads never write
+async def series_booking():
+    while True:
+        try:
+            await run_in_threadpool(appointment_series.maintain)
+        except Exception:
+            logging.getLogger(__name__).exception("Booking recurring occurrences failed")
+        await asyncio.sleep(appointment_series.BOOKING_INTERVAL_SECONDS)
+
+
+# The schema is not touched here: run `python migrate.py` (or
+# `python serve.py --migrate`) before starting workers.
+def warm_up():
+    """Fill the pool and compile the hot read queries once, so the first
+    requests a worker serves skip connecting and SQL compilation."""
+    warm_pool(engine)
+    today = date.today()
+    with SessionLocal() as db:
+        db.query(AppSettings).first()
+        db.scalars(after_cursor(
+            select(Appointment), Appointment.time_slot, Appointment.id, None
+        ).limit(1)).all()
+        appointment_days(db, "", today, today)
+        status_counts(db, today, today)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    events.hub.bind(asyncio.get_running_loop())
+    await events.backend.start()
+    await audit.writer.start()
+    await queues.start()
+    await run_in_threadpool(warm_up)
+    if async_engine is not None:
+        await warm_async_pool()
+    booking = asyncio.create_task(series_booking())
+    maintenance = None
+    if engine.dialect.name == "postgresql":
+        maintenance = asyncio.create_task(partition_maintenance())
+    yield
+    booking.cancel()
+    if maintenance is not None:
+        maintenance.cancel()
+    await queues.stop()
+    await audit.writer.stop()
+    await events.backend.stop()
+
+
+app = FastAPI(
+    title="EMR Appointment Service",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+app.router.route_class = DbRoute
+
+# -------------------------
+# Idempotency-Key (retried mutations run once, see idempotency.py)
+# -------------------------
+# Added before CORS so replayed responses still get CORS headers
+app.add_middleware(idempotency.IdempotencyMiddleware)
 
 # -------------------------
 # CORS
@@ -23,19 +172,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CURSOR_HEADER, "ETag", idempotency.REPLAYED_HEADER],
 )
 
-Base.metadata.create_all(bind=engine)
+# -------------------------
+# Metrics (/metrics)
+# -------------------------
+# Added last so it is the outermost middleware and times everything
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine)
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
 
 # -------------------------
 # DB Dependency
 # -------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+if DB_ASYNC:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+def appointment_payload(appointment):
+    return AppointmentOut.model_validate(appointment).model_dump(mode="json")
+
+
+# Listings select only AppointmentOut's columns and return the rows as
+# dicts (serialization.row_dicts): no Appointment objects, identity map or
+# per-row validation on the way out.
+APPOINTMENT_COLUMNS = tuple(getattr(Appointment, f) for f in APPOINTMENT_OUT_FIELDS)
 
 # -------------------------
 # Health Check
@@ -50,35 +227,110 @@ def health_check():
 @app.post("/appointments", response_model=AppointmentOut)
 def create_appointment(
     appointment: AppointmentCreate,
+    allow_overlap: bool = False,
     db: Session = Depends(get_db)
 ):
     appointment_date = appointment.time_slot.date()
+    # Recurring occurrences that day get their queue numbers (and are
+    # conflict-checked against) before this booking
+    appointment_series.book_day(db, appointment_date, appointment.doctor_name)
 
-    queue_count = db.query(Appointment).filter(
-        Appointment.doctor_name == appointment.doctor_name,
-        Appointment.time_slot.between(
-            datetime.fromisoformat(f"{appointment_date}T00:00:00"),
-            datetime.fromisoformat(f"{appointment_date}T23:59:59"),
+    # Taken first: the counter row lock serializes bookings for this
+    # doctor/day, so the overlap check below cannot race another booking.
+    queue_number = next_queue_number(
+        db, appointment.doctor_name, appointment_date
+    )
+
+    if not allow_overlap:
+        ensure_slot_free(
+            db, appointment.doctor_name, appointment.time_slot,
+            appointment.duration
         )
-    ).count()
 
     new_appointment = Appointment(
         patient_name=appointment.patient_name,
         doctor_name=appointment.doctor_name,
         time_slot=appointment.time_slot,
-        queue_number=queue_count + 1,
+        duration=appointment.duration,
+        queue_number=queue_number,
+        queue_date=appointment_date,
         status=appointment.status,
     )
 
     db.add(new_appointment)
+    record_visit(db, appointment.patient_name, appointment.time_slot)
+    report_rollups.bump(
+        db, appointment_date, appointment.doctor_name, appointment.status
+    )
+    response_cache.invalidate(
+        db, f"dates:{appointment.doctor_name}", "patients", "reports"
+    )
+    db.flush()
+    payload = appointment_payload(new_appointment)
+    events.publish(db, "created", payload)
+    audit.record(db, "created", payload)
     db.commit()
-    db.refresh(new_appointment)
 
-    return new_appointment
+    # Not refreshed: a refresh would check a connection out again and hold
+    # it while the response is validated, which waits for a threadpool
+    # thread; with every thread waiting for a connection that deadlocks.
+    return payload
+
+# -------------------------
+# Get ALL appointments (for dashboard, reports, etc.)
+# -------------------------
+# JSON pages of `limit` rows with the next page's cursor in X-Next-Cursor,
+# or format=ndjson to stream every row after `cursor` with flat memory.
+def stream_appointments(cursor: Optional[str]):
+    db = SessionLocal()
+    try:
+        stmt = after_cursor(
+            select(*APPOINTMENT_COLUMNS),
+            Appointment.time_slot, Appointment.id, cursor
+        ).execution_options(yield_per=STREAM_BATCH_SIZE)
+        yield from ndjson_lines(db.execute(stmt).mappings())
+    finally:
+        db.close()
+
 
-@app.get("/appointments/all")
-def get_all_appointments(db: Session = Depends(get_db)):
-    return db.query(Appointment).all()
+# -------------------------
+# Bulk create (CSV or NDJSON body, chosen by Content-Type)
+# -------------------------
+@app.post("/appointments/bulk")
+async def bulk_create_appointments(
+    request: Request,
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=50000)
+):
+    body = (await request.body()).decode("utf-8")
+    fmt = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    records = PARSERS[fmt](io.StringIO(body))
+    return await run_in_threadpool(import_rows, records, batch_size)
+
+@app.get("/appointments", response_model=list[AppointmentOut])
+@app.get("/appointments/all", response_model=list[AppointmentOut])
+def get_all_appointments(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    db: Session = Depends(get_db)
+):
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_appointments(cursor),
+            media_type="application/x-ndjson",
+        )
+
+    stmt = after_cursor(
+        select(*APPOINTMENT_COLUMNS), Appointment.time_slot, Appointment.id, cursor
+    ).limit(limit)
+    appointments = row_dicts(db.execute(stmt))
+
+    headers = {}
+    if len(appointments) == limit:
+        last = appointments[-1]
+        headers[CURSOR_HEADER] = encode_cursor(last["time_slot"], last["id"])
+
+    return ORJSONResponse(appointments, headers=headers)
 
 # -------------------------
 # Get appointments by doctor + date
@@ -92,10 +344,13 @@ def get_appointments_by_doctor(
     day_start = datetime.fromisoformat(f"{date_str}T00:00:00")
     day_end = datetime.fromisoformat(f"{date_str}T23:59:59")
 
-    return db.query(Appointment).filter(
+    # queue_date (the partition key) lets PostgreSQL prune to one month
+    stmt = select(*APPOINTMENT_COLUMNS).where(
         Appointment.doctor_name == doctor_name,
+        Appointment.queue_date == day_start.date(),
         Appointment.time_slot.between(day_start, day_end)
-    ).order_by(Appointment.queue_number).all()
+    ).order_by(Appointment.queue_number)
+    return ORJSONResponse(row_dicts(db.execute(stmt)))
 
 # -------------------------
 # Update appointment status
@@ -113,130 +368,433 @@ def update_status(
     if not appointment:
         return {"error": "Appointment not found"}
 
-    appointment.status = status
+    error = status_error(appointment.status, status)
+    if error:
+        return {"error": error}
+    if appointment.status in FREE_STATUSES and status not in FREE_STATUSES:
+        ensure_slot_free(
+            db, appointment.doctor_name, appointment.time_slot,
+            appointment.duration, exclude_id=appointment.id
+        )
+
+    report_rollups.move(
+        db, appointment.queue_date, appointment.doctor_name,
+        appointment.status, status
+    )
+    old_status, appointment.status = appointment.status, status
+    payload = appointment_payload(appointment)
+    response_cache.invalidate(db, "reports")
+    events.publish(db, "updated", payload)
+    audit.record(db, "updated", payload, old_status)
     db.commit()
 
     return {"message": "Status updated"}
 
-@app.get("/appointments/dates/{doctor_name}")
-def get_appointment_dates(doctor_name: str, db: Session = Depends(get_db)):
-    dates = db.query(Appointment.time_slot).filter(
-        Appointment.doctor_name == doctor_name
-    ).all()
+# -------------------------
+# Batch status update (end-of-day: many patients at once)
+# -------------------------
+def status_error(old, new):
+    if new not in STATUSES:
+        return f"Unknown status '{new}'"
+    if new != old and new not in TRANSITIONS.get(old, STATUSES):
+        return f"A {old} appointment cannot become {new}"
+    return None
+
+
+def transition_error(db, appointment, status):
+    error = status_error(appointment.status, status)
+    if error:
+        return error
+    if appointment.status in FREE_STATUSES and status not in FREE_STATUSES:
+        if slot_conflicts(
+            db, appointment.doctor_name, appointment.time_slot,
+            appointment.duration, exclude_id=appointment.id
+        ):
+            return "Time slot overlaps an existing booking"
+    return None
+
+
+# One SELECT (row-locked on PostgreSQL) and one UPDATE ... CASE for the
+# whole batch; valid changes commit together, invalid ones are reported.
+# Reinstated bookings are checked against stored bookings, not against
+# other changes in the same batch.
+@app.patch("/appointments/status")
+def update_statuses(
+    changes: list[StatusChange] = Body(..., min_length=1, max_length=MAX_STATUS_BATCH),
+    db: Session = Depends(get_db)
+):
+    ids = [c.id for c in changes]
+    found = {
+        a.id: a for a in db.scalars(
+            select(Appointment).where(Appointment.id.in_(ids)).with_for_update()
+        )
+    }
+
+    results, new_status, rollup = [], {}, Counter()
+    for change in changes:
+        appointment = found.get(change.id)
+        if appointment is None:
+            error = "Appointment not found"
+        elif change.id in new_status:
+            error = "Duplicate id in batch"
+        else:
+            error = transition_error(db, appointment, change.status)
+
+        if error:
+            results.append({"id": change.id, "ok": False, "error": error})
+            continue
+
+        old = appointment.status
+        new_status[change.id] = change.status
+        results.append({"id": change.id, "ok": True, "from": old, "to": change.status})
+        if old != change.status:
+            rollup[(appointment.queue_date, appointment.doctor_name, old)] -= 1
+            rollup[(appointment.queue_date, appointment.doctor_name, change.status)] += 1
 
-    return list({d[0].date().isoformat() for d in dates})
+    changed = {i: s for i, s in new_status.items() if found[i].status != s}
+    if changed:
+        db.execute(
+            update(Appointment)
+            .where(Appointment.id.in_(list(changed)))
+            .values(status=case(changed, value=Appointment.id)),
+            execution_options={"synchronize_session": False},
+        )
+        report_rollups.bump_many(db, {k: n for k, n in rollup.items() if n})
+        response_cache.invalidate(db, "reports")
+        for appointment_id, status in changed.items():
+            payload = appointment_payload(found[appointment_id])
+            payload["status"] = status
+            events.publish(db, "updated", payload)
+            audit.record(db, "updated", payload, found[appointment_id].status)
+    db.commit()
+
+    return {"updated": len(changed), "results": results}
 
 # -------------------------
-# Get ALL appointments (for dashboard, reports, etc.)
+# Live appointment changes (WebSocket + SSE)
+# -------------------------
+# Optional `doctor` and `date` narrow the topic. Messages carry every event
+# pending for the client: {"events": [{"type": ..., "appointment": {...}}]}.
+@app.websocket("/ws/appointments")
+async def appointments_ws(
+    websocket: WebSocket,
+    doctor: Optional[str] = None,
+    date: Optional[str] = None
+):
+    await websocket.accept()
+    subscription = events.hub.subscribe(events.topic_key(doctor, date))
+    try:
+        while True:
+            await websocket.send_json({"events": await subscription.drain()})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+
+
+async def sse_stream(request: Request, subscription):
+    try:
+        while True:
+            try:
+                batch = await asyncio.wait_for(
+                    subscription.drain(), SSE_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            yield "".join(
+                f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in batch
+            )
+    finally:
+        subscription.close()
+
+
+@app.get("/events/appointments")
+async def appointments_sse(
+    request: Request,
+    doctor: Optional[str] = None,
+    date: Optional[str] = None
+):
+    subscription = events.hub.subscribe(events.topic_key(doctor, date))
+    return StreamingResponse(
+        sse_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -------------------------
+# Delete appointment
+# -------------------------
+@app.delete("/appointments/{appointment_id}")
+def delete_appointment(appointment_id: str, db: Session = Depends(get_db)):
+    appointment = db.query(Appointment).filter(
+        Appointment.id == appointment_id
+    ).first()
+
+    if not appointment:
+        return {"error": "Appointment not found"}
+
+    payload = appointment_payload(appointment)
+    events.publish(db, "deleted", payload)
+    audit.record(db, "deleted", payload, appointment.status)
+    db.delete(appointment)
+    if appointment.series_id:
+        appointment_series.cancel_booked(db, appointment)
+    db.flush()
+    remove_visit(db, appointment.patient_name, appointment.time_slot)
+    report_rollups.bump(
+        db, appointment.queue_date, appointment.doctor_name,
+        appointment.status, -1
+    )
+    response_cache.invalidate(
+        db, f"dates:{appointment.doctor_name}", "patients", "reports"
+    )
+    db.commit()
+
+    return {"message": "Appointment deleted"}
+
+# -------------------------
+# Audit trail
+# -------------------------
+# Entries are written in the background, within AUDIT_FLUSH_MS of the change
+@app.get("/appointments/{appointment_id}/audit")
+def get_appointment_audit(appointment_id: str, db: Session = Depends(get_db)):
+    return audit.history(db, appointment_id)
+
 # -------------------------
-@app.get("/appointments")
-def get_all_appointments(db: Session = Depends(get_db)):
-    return db.query(Appointment).all()
+# Calendar highlighting
+# -------------------------
+# DISTINCT queue_date (= date(time_slot)) per doctor is answered from the
+# (doctor_name, queue_date, queue_number) unique index alone.
+def appointment_days(db, doctor_name, start=None, end=None):
+    stmt = select(Appointment.queue_date).distinct().where(
+        Appointment.doctor_name == doctor_name
+    )
+    if start:
+        stmt = stmt.where(Appointment.queue_date >= start)
+    if end:
+        stmt = stmt.where(Appointment.queue_date <= end)
+    days = db.scalars(stmt.order_by(Appointment.queue_date)).all()
+    if start and end:  # plus recurring occurrences not booked yet
+        days = sorted(set(days) | appointment_series.days(db, doctor_name, start, end))
+    return days
+
+
+@app.get("/appointments/dates/{doctor_name}")
+def get_appointment_dates(
+    request: Request,
+    doctor_name: str,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db)
+):
+    return response_cache.respond(
+        request, [f"dates:{doctor_name}"],
+        lambda: [
+            d.isoformat()
+            for d in appointment_days(db, doctor_name, date_from, date_to)
+        ]
+    )
+
+
+# Twelve month bitmaps (bit day-1 set = busy day), see occupancy.py
+@app.get("/appointments/dates/{doctor_name}/bitmap")
+def get_appointment_bitmap(
+    request: Request,
+    doctor_name: str,
+    year: int = Query(..., ge=1900, le=9999),
+    db: Session = Depends(get_db)
+):
+    def compute():
+        days = appointment_days(
+            db, doctor_name, date(year, 1, 1), date(year, 12, 31)
+        )
+        return {"year": year, "months": month_bitmaps(year, days)}
+
+    return response_cache.respond(request, [f"dates:{doctor_name}"], compute)
 
 # -------------------------
-# Get all patients (derived from appointments)
+# Get all patients (from the patient_summary table)
 # -------------------------
+# Optional case-sensitive name prefix `q`; next page cursor in X-Next-Cursor.
 @app.get("/patients")
-def get_patients(db: Session = Depends(get_db)):
-    rows = db.query(
-        Appointment.patient_name,
-        func.count(Appointment.id).label("visits"),
-        func.max(Appointment.time_slot).label("last_visit")
-    ).group_by(Appointment.patient_name).all()
-
-    return [
-        {
-            "name": r.patient_name,
-            "visits": r.visits,
-            "last_visit": r.last_visit.date()
-        }
-        for r in rows
-    ]
+def get_patients(
+    request: Request,
+    response: Response,
+    q: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    def compute():
+        stmt = select(PatientSummary).order_by(PatientSummary.patient_name)
+        if q:
+            stmt = stmt.where(
+                PatientSummary.patient_name >= q,
+                PatientSummary.patient_name < q + "\U0010ffff",
+            )
+        if cursor:
+            stmt = stmt.where(PatientSummary.patient_name > decode_key_cursor(cursor))
+
+        rows = db.scalars(stmt.limit(limit)).all()
+
+        if len(rows) == limit:
+            response.headers[CURSOR_HEADER] = encode_key_cursor(rows[-1].patient_name)
+
+        return [
+            {
+                "name": r.patient_name,
+                "visits": r.visits,
+                "last_visit": r.last_visit.date()
+            }
+            for r in rows
+        ]
+
+    return response_cache.respond(request, ["patients"], compute, response)
+
+
+# -------------------------
+# Patient search (prefix, substring and typo-tolerant; see patient_search.py)
+# -------------------------
+@app.get("/patients/search")
+def search_patients(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    return response_cache.respond(
+        request, ["patients"],
+        lambda: [
+            {
+                "name": r.patient_name,
+                "visits": r.visits,
+                "last_visit": r.last_visit.date(),
+                "score": score,
+            }
+            for r, score in patient_search.search(db, q, limit)
+        ]
+    )
 
 
 # -------------------------
 # Get patient details
 # -------------------------
-@app.get("/patients/{patient_name}")
+@app.get("/patients/{patient_name}", response_model=PatientDetailsOut)
 def get_patient_details(patient_name: str, db: Session = Depends(get_db)):
-    appointments = db.query(Appointment).filter(
-        Appointment.patient_name == patient_name
-    ).order_by(Appointment.time_slot.desc()).all()
+    appointments = row_dicts(db.execute(
+        select(*APPOINTMENT_COLUMNS)
+        .where(Appointment.patient_name == patient_name)
+        .order_by(Appointment.time_slot.desc())
+    ))
 
-    return {
+    return ORJSONResponse({
         "patient_name": patient_name,
         "total_visits": len(appointments),
         "appointments": appointments
-    }
+    })
 
 # =========================
 # REPORTS
 # =========================
 
+# Counts come from the daily_status_counts rollup, not the appointments table
+def status_counts(db, start_day, end_day):
+    rows = db.query(
+        DailyStatusCount.status,
+        func.sum(DailyStatusCount.count)
+    ).filter(
+        DailyStatusCount.day.between(start_day, end_day)
+    ).group_by(DailyStatusCount.status).all()
+
+    return {status: count for status, count in rows if count}
+
+
+# Cached per URL until an appointment write invalidates "reports"
 @app.get("/reports/daily")
-def daily_report(date: str, db: Session = Depends(get_db)):
-    day_start = datetime.fromisoformat(f"{date}T00:00:00")
-    day_end = datetime.fromisoformat(f"{date}T23:59:59")
+def daily_report(
+    request: Request,
+    date: str,
+    include_appointments: bool = True,
+    db: Session = Depends(get_db)
+):
+    return response_cache.respond(
+        request, ["reports"],
+        lambda: build_daily_report(db, date, include_appointments)
+    )
 
-    appointments = db.query(Appointment).filter(
-        Appointment.time_slot.between(day_start, day_end)
-    ).all()
 
-    return {
+def build_daily_report(db, date, include_appointments):
+    day = datetime.fromisoformat(date).date()
+    counts = status_counts(db, day, day)
+
+    report = {
         "date": date,
-        "total_appointments": len(appointments),
+        "total_appointments": sum(counts.values()),
         "by_status": {
-            "scheduled": sum(a.status == "waiting" for a in appointments),
-            "confirmed": sum(a.status == "completed" for a in appointments),
-            "cancelled": sum(a.status == "cancelled" for a in appointments),
+            "scheduled": counts.get("waiting", 0),
+            "confirmed": counts.get("completed", 0),
+            "cancelled": counts.get("cancelled", 0),
         },
-        "appointments": appointments,
     }
 
+    if include_appointments:
+        report["appointments"] = row_dicts(db.execute(
+            select(*APPOINTMENT_COLUMNS).where(
+                Appointment.queue_date == day,
+                Appointment.time_slot.between(
+                    datetime.fromisoformat(f"{date}T00:00:00"),
+                    datetime.fromisoformat(f"{date}T23:59:59"),
+                )
+            )
+        ))
+
+    return report
+
 
 @app.get("/reports/weekly")
-def weekly_report(start_date: str, db: Session = Depends(get_db)):
-    start = datetime.fromisoformat(f"{start_date}T00:00:00")
-    end = start.replace(day=start.day + 6, hour=23, minute=59, second=59)
+def weekly_report(request: Request, start_date: str, db: Session = Depends(get_db)):
+    def compute():
+        start = datetime.fromisoformat(start_date).date()
+        end = start + timedelta(days=6)
 
-    rows = db.query(
-        Appointment.status,
-        func.count(Appointment.id)
-    ).filter(
-        Appointment.time_slot.between(start, end)
-    ).group_by(Appointment.status).all()
+        return {
+            "start_date": start_date,
+            "summary": status_counts(db, start, end),
+        }
 
-    return {
-        "start_date": start_date,
-        "summary": {status: count for status, count in rows},
-    }
+    return response_cache.respond(request, ["reports"], compute)
 
 
 @app.get("/reports/doctor-workload")
-def doctor_workload(db: Session = Depends(get_db)):
-    rows = db.query(
-        Appointment.doctor_name,
-        func.count(Appointment.id)
-    ).group_by(Appointment.doctor_name).all()
+def doctor_workload(request: Request, db: Session = Depends(get_db)):
+    def compute():
+        rows = db.query(
+            DailyStatusCount.doctor_name,
+            func.sum(DailyStatusCount.count)
+        ).group_by(DailyStatusCount.doctor_name).all()
 
-    return [{"doctor": d, "appointments": c} for d, c in rows]
+        return [{"doctor": d, "appointments": c} for d, c in rows if c]
+
+    return response_cache.respond(request, ["reports"], compute)
 
 
 @app.get("/reports/cancellations")
-def cancellation_report(db: Session = Depends(get_db)):
-    rows = db.query(
-        Appointment.doctor_name,
-        func.count(Appointment.id)
-    ).filter(Appointment.status == "cancelled") \
-     .group_by(Appointment.doctor_name).all()
+def cancellation_report(request: Request, db: Session = Depends(get_db)):
+    def compute():
+        rows = db.query(
+            DailyStatusCount.doctor_name,
+            func.sum(DailyStatusCount.count)
+        ).filter(DailyStatusCount.status == "cancelled") \
+         .group_by(DailyStatusCount.doctor_name).all()
 
-    return [{"doctor": d, "cancelled": c} for d, c in rows]
+        return [{"doctor": d, "cancelled": c} for d, c in rows if c]
 
-from models import AppSettings
-from schemas import SettingsOut, SettingsUpdate
+    return response_cache.respond(request, ["reports"], compute)
 
-@app.get("/settings", response_model=SettingsOut)
-def get_settings(db: Session = Depends(get_db)):
+def clinic_settings(db):
     settings = db.query(AppSettings).first()
     if not settings:
         settings = AppSettings()
@@ -246,6 +804,14 @@ def get_settings(db: Session = Depends(get_db)):
     return settings
 
 
+@app.get("/settings", response_model=SettingsOut)
+def get_settings(request: Request, db: Session = Depends(get_db)):
+    return response_cache.respond(
+        request, ["settings"],
+        lambda: SettingsOut.model_validate(clinic_settings(db))
+    )
+
+
 @app.put("/settings", response_model=SettingsOut)
 def update_settings(payload: SettingsUpdate, db: Session = Depends(get_db)):
     settings = db.query(AppSettings).first()
@@ -255,7 +821,215 @@ def update_settings(payload: SettingsUpdate, db: Session = Depends(get_db)):
 
     for key, value in payload.dict().items():
         setattr(settings, key, value)
+    response_cache.invalidate(db, "settings")
 
     db.commit()
     db.refresh(settings)
     return settings
+
+
+# =========================
+# AVAILABILITY
+# =========================
+
+def doctor_bookings(db, doctor_name, start, end):
+    """Rows occupying the doctor between start and end (doctor/time index)."""
+    return db.query(
+        Appointment.doctor_name,
+        Appointment.time_slot,
+        Appointment.duration,
+        Appointment.id
+    ).filter(
+        Appointment.doctor_name == doctor_name,
+        Appointment.queue_date.between(
+            (start - timedelta(minutes=MAX_APPOINTMENT_MINUTES)).date(), end.date()
+        ),
+        Appointment.time_slot >= start - timedelta(minutes=MAX_APPOINTMENT_MINUTES),
+        Appointment.time_slot < end,
+        Appointment.status.notin_(FREE_STATUSES)
+    ).order_by(Appointment.time_slot).all()
+
+
+def slot_conflicts(db, doctor_name, time_slot, duration, exclude_id=None):
+    settings = clinic_settings(db)
+    end = time_slot + timedelta(minutes=duration or settings.appointment_duration)
+
+    engine = AvailabilityEngine.from_settings(settings).load(
+        doctor_bookings(db, doctor_name, time_slot, end)
+    )
+    return engine.conflicts(doctor_name, time_slot, duration, exclude_id)
+
+
+def ensure_slot_free(db, doctor_name, time_slot, duration, exclude_id=None):
+    conflicts = slot_conflicts(db, doctor_name, time_slot, duration, exclude_id)
+    if conflicts:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": "Time slot overlaps an existing booking",
+                    "conflicts": conflicts},
+        )
+
+
+@app.get("/availability")
+def get_availability(
+    doctor: str,
+    start: str,
+    end: Optional[str] = None,
+    duration: Optional[int] = Query(None, ge=5, le=MAX_APPOINTMENT_MINUTES),
+    db: Session = Depends(get_db)
+):
+    first_day = datetime.fromisoformat(start).date()
+    last_day = datetime.fromisoformat(end).date() if end else first_day
+    if not 0 <= (last_day - first_day).days < MAX_AVAILABILITY_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range must span 1 to {MAX_AVAILABILITY_DAYS} days",
+        )
+
+    window = (
+        datetime.combine(first_day, datetime.min.time()),
+        datetime.combine(last_day + timedelta(days=1), datetime.min.time()),
+    )
+    settings = clinic_settings(db)
+    engine = AvailabilityEngine.from_settings(settings).load(
+        doctor_bookings(db, doctor, *window)
+    )
+    # Occurrences not booked yet (past the booking horizon) are busy too;
+    # counted in memory, since a read does not book them
+    engine.load(
+        (o.doctor_name, o.time_slot, o.duration, o.id)
+        for o in appointment_series.unbooked(db, *window, doctor)
+        if o.status not in FREE_STATUSES
+    )
+
+    return {
+        "doctor": doctor,
+        "slot_minutes": duration or settings.appointment_duration,
+        "free": engine.free_slots(doctor, first_day, last_day, duration),
+    }
+
+
+# =========================
+# RECURRING SERIES
+# =========================
+
+# Stored once; occurrences are expanded per window (appointment_series.py)
+@app.post("/series", response_model=SeriesOut)
+def create_series(series: SeriesCreate, db: Session = Depends(get_db)):
+    return appointment_series.create(db, series)
+
+
+# Occurrences between two dates (inclusive), optionally of one doctor's or
+# patient's series, with the booked appointment where there is one;
+# next page cursor in X-Next-Cursor.
+@app.get("/series/occurrences", response_model=list[OccurrenceOut])
+def get_occurrences(
+    start: date,
+    end: date,
+    doctor: Optional[str] = None,
+    patient: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    window_start = datetime.combine(start, datetime.min.time())
+    window_end = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    after = decode_cursor(cursor) if cursor else None
+    if after:
+        window_start = max(window_start, after[0])
+
+    occurrences = appointment_series.window(db, window_start, window_end, doctor, patient)
+    if after:
+        occurrences = itertools.dropwhile(lambda o: (o.time_slot, o.id) <= after, occurrences)
+    page = list(itertools.islice(occurrences, limit))
+
+    headers = {}
+    if len(page) == limit:
+        headers[CURSOR_HEADER] = encode_cursor(page[-1].time_slot, page[-1].id)
+    return ORJSONResponse(appointment_series.with_bookings(db, page), headers=headers)
+
+
+@app.get("/series/{series_id}")
+def get_series(series_id: str, db: Session = Depends(get_db)):
+    series = db.get(AppointmentSeries, series_id)
+    if not series:
+        return {"error": "Series not found"}
+    return SeriesOut.model_validate(series)
+
+
+# Occurrences are addressed by their original start, e.g.
+# /series/<id>/occurrences/2025-03-03T09:00:00; booked ones are changed
+# through their appointment instead.
+@app.patch("/series/{series_id}/occurrences/{occurrence_start}")
+def update_occurrence(
+    series_id: str,
+    occurrence_start: datetime,
+    changes: OccurrenceUpdate,
+    db: Session = Depends(get_db)
+):
+    error = appointment_series.change_occurrence(
+        db, series_id, occurrence_start, **changes.model_dump(exclude_unset=True)
+    )
+    if error:
+        return {"error": error}
+    return {"message": "Occurrence updated"}
+
+
+@app.delete("/series/{series_id}/occurrences/{occurrence_start}")
+def cancel_occurrence(
+    series_id: str,
+    occurrence_start: datetime,
+    db: Session = Depends(get_db)
+):
+    error = appointment_series.change_occurrence(
+        db, series_id, occurrence_start, cancelled=True
+    )
+    if error:
+        return {"error": error}
+    return {"message": "Occurrence cancelled"}
+
+
+# =========================
+# LIVE QUEUE
+# =========================
+
+# Positions skip completed/cancelled bookings; ETAs scale the booked
+# minutes ahead by the doctor's observed pace (see queue_engine.py)
+@app.get("/queue/{doctor_name}")
+def get_queue(
+    doctor_name: str,
+    day: Optional[date] = Query(None, alias="date"),
+    appointment_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    day = day or date.today()
+    snapshot = queues.snapshot(
+        db, doctor_name, day, clinic_settings(db), appointment_id
+    )
+    if snapshot is None:
+        return {"error": "Appointment is not waiting in this queue"}
+    return snapshot
+
+
+# =========================
+# OFFLINE SYNC
+# =========================
+
+# Appointments changed and ids deleted after version `since` (0 = all), in
+# pages; clients store the returned version for the next call (see sync.py)
+@app.get("/sync", response_model=SyncOut)
+def sync_changes(
+    since: int = Query(0, ge=0),
+    doctor: Optional[str] = None,
+    limit: int = Query(sync.SYNC_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    return ORJSONResponse(sync.changes(db, since, limit, doctor))
+
+
+# -------------------------
+# Response cache metrics
+# -------------------------
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.snapshot()
@@ -0,0 +1,250 @@
+"""
+Request and database instrumentation, exposed on /metrics for Prometheus.
+
+`MetricsMiddleware` times every request and records, per route template:
+
+- request latency and response size histograms,
+- how many SQL statements the request ran and how long they took, counted
+  by SQLAlchemy cursor events into a per-request context variable,
+
+plus the time taken to open each new database connection.
+
+Opt-in diagnostics (environment):
+
+- SLOW_QUERY_MS: log statements slower than this, with their parameters,
+  on the `emr.slow_query` logger (0 = off).
+- DETECT_N_PLUS_ONE: flag requests that run the same SELECT at least
+  N_PLUS_ONE_THRESHOLD times — the signature of a lazy load in a loop.
+  Flagged requests are logged, counted and get an X-N-Plus-One header.
+
+With several worker processes set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates all of them (see prometheus_client's multiprocess mode).
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, Counter as PromCounter,
+    Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+from database import env_flag, env_int
+import response_cache
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("emr.slow_query")
+
+SLOW_QUERY_MS = env_int("SLOW_QUERY_MS", 0)
+DETECT_N_PLUS_ONE = env_flag("DETECT_N_PLUS_ONE")
+N_PLUS_ONE_THRESHOLD = env_int("N_PLUS_ONE_THRESHOLD", 10)
+
+N_PLUS_ONE_HEADER = "X-N-Plus-One"
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+SIZE_BUCKETS = tuple(4 ** i * 64 for i in range(10))  # 64 B .. 16 MiB
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size",
+    ["method", "route"], buckets=SIZE_BUCKETS,
+)
+REQUEST_STATEMENTS = Histogram(
+    "db_statements_per_request", "SQL statements executed per request",
+    ["method", "route"], buckets=STATEMENT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS,
+)
+DB_CONNECT = Histogram(
+    "db_connect_seconds", "Time to open a new database connection",
+    buckets=LATENCY_BUCKETS,
+)
+SLOW_QUERIES = PromCounter(
+    "db_slow_queries_total", "Statements slower than SLOW_QUERY_MS", ["route"],
+)
+N_PLUS_ONE = PromCounter(
+    "db_n_plus_one_requests_total", "Requests flagged as N+1 query patterns",
+    ["method", "route"],
+)
+
+
+class RequestStats:
+    __slots__ = ("scope", "statements", "db_seconds", "selects")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.selects = Counter() if DETECT_N_PLUS_ONE else None
+
+
+# Shared by the threadpool / run_sync code serving the request
+current_request = ContextVar("current_request", default=None)
+
+
+def _route_label(scope):
+    """Route template (/appointments/{appointment_id}), set once routed."""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# -------------------------
+# SQLAlchemy hooks
+# -------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request.get()
+
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += elapsed
+        if stats.selects is not None and statement.lstrip()[:6].upper() == "SELECT":
+            stats.selects[statement] += 1
+
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        route = _route_label(stats.scope) if stats is not None else "none"
+        SLOW_QUERIES.labels(route).inc()
+        slow_query_logger.warning(
+            "%.1f ms [%s] %s %s",
+            elapsed * 1000, route, statement,
+            "<executemany>" if executemany else repr(parameters)[:500],
+        )
+
+
+def _do_connect(dialect, connection_record, cargs, cparams):
+    connection_record.info["connect_start"] = time.perf_counter()
+
+
+def _connect(dbapi_connection, connection_record):
+    DB_CONNECT.observe(time.perf_counter() - connection_record.info.pop("connect_start"))
+
+
+def instrument_engine(engine):
+    """Attach statement timing and connection timing to a sync Engine."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    # Listeners on the engine, unlike a patched pool, carry over to the
+    # pools that dispose() and recreate() put in its place
+    event.listen(engine, "do_connect", _do_connect)
+    event.listen(engine, "connect", _connect)
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task like BaseHTTPMiddleware)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+        t0 = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                flagged = _n_plus_one(stats)
+                if flagged:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (N_PLUS_ONE_HEADER.lower().encode(), str(flagged).encode())
+                    ]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            self._observe(scope, stats, status, size, time.perf_counter() - t0)
+
+    @staticmethod
+    def _observe(scope, stats, status, size, elapsed):
+        method = scope["method"]
+        route = _route_label(scope)
+        REQUEST_LATENCY.labels(method, route, str(status)).observe(elapsed)
+        RESPONSE_SIZE.labels(method, route).observe(size)
+        REQUEST_STATEMENTS.labels(method, route).observe(stats.statements)
+        REQUEST_DB_TIME.labels(method, route).observe(stats.db_seconds)
+
+        if _n_plus_one(stats):
+            N_PLUS_ONE.labels(method, route).inc()
+            statement, count = stats.selects.most_common(1)[0]
+            logger.warning(
+                "Possible N+1 on %s %s: %d x %s", method, route, count,
+                " ".join(statement.split())[:300],
+            )
+
+
+def _n_plus_one(stats):
+    """Repeat count of the most repeated SELECT if it crosses the threshold."""
+    if not stats.selects:
+        return 0
+    count = stats.selects.most_common(1)[0][1]
+    return count if count >= N_PLUS_ONE_THRESHOLD else 0
+
+
+# -------------------------
+# Exposition
+# -------------------------
+class CacheCollector:
+    """Response cache hit/miss counters, read from response_cache at scrape."""
+
+    def collect(self):
+        snapshot = response_cache.snapshot()
+        for name in ("hits", "misses", "invalidations"):
+            family = CounterMetricFamily(
+                f"response_cache_{name}", f"Response cache {name}", labels=["namespace"]
+            )
+            for namespace, value in snapshot[name].items():
+                family.add_metric([namespace], value)
+            yield family
+        yield CounterMetricFamily(
+            "response_cache_not_modified", "304 responses served",
+            value=snapshot["not_modified"],
+        )
+        yield GaugeMetricFamily(
+            "response_cache_entries", "Cached responses", value=snapshot["entries"]
+        )
+
+
+cache_collector = CacheCollector()
+REGISTRY.register(cache_collector)
+
+
+def render():
+    """(body, content type) for GET /metrics."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(cache_collector)  # this worker's cache only
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,143 @@
+"""
+Schema migrations for the EMR backend.
+
+`create_all` only creates missing tables; it never adds columns or indexes
+to a table that already exists. Running this module brings an existing
+SQLite `appointments.db` or PostgreSQL database up to date:
+
+    python migrate.py
+
+On PostgreSQL indexes are built with CREATE INDEX CONCURRENTLY so bookings
+are not blocked while a large table is indexed (except on a partitioned
+`appointments`, where PostgreSQL does not allow it), and upcoming monthly
+partitions are created (see partitions.py). It also installs the triggers
+that version appointment changes for GET /sync (see sync.py).
+"""
+
+from sqlalchemy import bindparam, inspect, select, func, text, update
+from database import Base, engine
+from models import Appointment, DailyStatusCount, PatientSummary, QueueCounter
+import partitions
+import patient_search
+import patient_summary
+import report_rollups
+import sync
+
+
+def _create_index(conn, index):
+    postgres = (
+        conn.dialect.name == "postgresql"
+        and not partitions.is_partitioned(conn, index.table.name)
+    )
+    if postgres:
+        index.dialect_options["postgresql"]["concurrently"] = True
+    try:
+        index.create(bind=conn, checkfirst=True)
+    finally:
+        if postgres:
+            index.dialect_options["postgresql"]["concurrently"] = False
+
+
+def create_indexes(bind=engine, tables=None):
+    tables = tables or Base.metadata.sorted_tables
+    # CONCURRENTLY cannot run inside a transaction block
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table in tables:
+            if not table.indexes:
+                continue
+            for index in table.indexes:
+                _create_index(conn, index)
+            conn.execute(text(f"ANALYZE {table.name}"))
+
+
+def add_missing_columns(conn):
+    # Added as nullable so existing rows are accepted; backfills below fill them
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"
+            ))
+
+
+def backfill_queue_dates(conn):
+    rows = conn.execute(
+        select(Appointment.id, Appointment.time_slot)
+        .where(Appointment.queue_date.is_(None))
+    ).all()
+    if rows:
+        conn.execute(
+            update(Appointment).where(Appointment.id == bindparam("row_id")),
+            [{"row_id": r.id, "queue_date": r.time_slot.date()} for r in rows],
+        )
+
+
+def renumber_duplicate_queues(conn):
+    # Bookings made before the counter table could race and share a number;
+    # the unique index cannot be built until those days are renumbered.
+    duplicated = conn.execute(
+        select(Appointment.doctor_name, Appointment.queue_date)
+        .group_by(Appointment.doctor_name, Appointment.queue_date)
+        .having(func.count() > func.count(Appointment.queue_number.distinct()))
+    ).all()
+    for doctor_name, queue_date in duplicated:
+        ids = conn.execute(
+            select(Appointment.id).where(
+                Appointment.doctor_name == doctor_name,
+                Appointment.queue_date == queue_date,
+            ).order_by(Appointment.queue_number, Appointment.created_at, Appointment.id)
+        ).scalars().all()
+        conn.execute(
+            update(Appointment).where(Appointment.id == bindparam("row_id")),
+            [{"row_id": i, "queue_number": n} for n, i in enumerate(ids, start=1)],
+        )
+
+
+def seed_queue_counters(conn):
+    rows = conn.execute(
+        select(
+            Appointment.doctor_name,
+            Appointment.queue_date,
+            func.max(Appointment.queue_number),
+        ).group_by(Appointment.doctor_name, Appointment.queue_date)
+    ).all()
+    if rows:
+        conn.execute(QueueCounter.__table__.insert(), [
+            {"doctor_name": d, "day": day, "last_number": n} for d, day, n in rows
+        ])
+
+
+# Derived tables filled from existing appointments when first created
+SEEDERS = {
+    QueueCounter.__tablename__: seed_queue_counters,
+    PatientSummary.__tablename__: patient_summary.rebuild,
+    DailyStatusCount.__tablename__: report_rollups.rebuild,
+}
+
+
+def migrate(bind=engine):
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        new_tables = [name for name in SEEDERS if not inspector.has_table(name)]
+        add_missing_columns(conn)
+        Base.metadata.create_all(bind=conn)
+        backfill_queue_dates(conn)
+        renumber_duplicate_queues(conn)
+        sync.backfill(conn)
+        for name in new_tables:
+            SEEDERS[name](conn)
+        partitions.ensure_partitions(conn)
+        patient_search.install(conn)
+        sync.install(conn)
+    create_indexes(bind)
+
+
+if __name__ == "__main__":
+    migrate()
+    print(f"Schema up to date ({engine.url.render_as_string(hide_password=True)})")
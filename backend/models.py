@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer
+from sqlalchemy import BigInteger, Boolean, Column, String, DateTime, Date, Integer, Index, LargeBinary, Text
 from database import Base
 import uuid
 from datetime import datetime
@@ -10,9 +10,134 @@ class Appointment(Base):
     patient_name = Column(String, nullable=False)
     doctor_name = Column(String, nullable=False)
     time_slot = Column(DateTime, nullable=False)
+    duration = Column(Integer, nullable=True)  # minutes; NULL = clinic default
     queue_number = Column(Integer, nullable=False)
+    queue_date = Column(
+        Date,
+        nullable=False,
+        default=lambda ctx: ctx.get_current_parameters()["time_slot"].date(),
+    )
     status = Column(String, default="waiting")
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Set on occurrences booked from a recurring series (appointment_series.py)
+    series_id = Column(String, nullable=True)
+    occurrence_start = Column(DateTime, nullable=True)
+    # Change version for GET /sync, set by the database on every insert and
+    # update (sync.py installs the triggers); never written by the app
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(BigInteger, nullable=True)
+
+    # Queue counts, doctor/day listings and calendar dates filter on
+    # doctor + time range; patient history is read newest first;
+    # reports group by status within a time window; full listings page
+    # through (time_slot, id).
+    __table_args__ = (
+        Index("ix_appointments_time_id", time_slot, id),
+        Index("ix_appointments_doctor_time", doctor_name, time_slot),
+        Index("ix_appointments_patient_time", patient_name, time_slot.desc()),
+        Index("ix_appointments_status_time", status, time_slot),
+        Index("ix_appointments_version", version),
+        Index(
+            "uq_appointments_doctor_day_queue",
+            doctor_name, queue_date, queue_number,
+            unique=True,
+        ),
+        # One booking per occurrence; queue_date keeps it valid on the
+        # partitioned table (an occurrence's day never changes once booked)
+        Index(
+            "uq_appointments_series_occurrence",
+            series_id, occurrence_start, queue_date,
+            unique=True,
+        ),
+    )
+
+
+# Last queue number handed out per doctor per day
+class QueueCounter(Base):
+    __tablename__ = "queue_counters"
+
+    doctor_name = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    last_number = Column(Integer, nullable=False, default=0)
+
+
+# Per-patient visit count and latest visit, kept in step with appointments
+# by patient_summary.py so /patients never aggregates the full table
+class PatientSummary(Base):
+    __tablename__ = "patient_summary"
+
+    patient_name = Column(String, primary_key=True)
+    visits = Column(Integer, nullable=False, default=0)
+    last_visit = Column(DateTime, nullable=False)
+
+
+# Appointment counts per (day, doctor, status), kept in step with
+# appointments by report_rollups.py so reports never read raw rows
+class DailyStatusCount(Base):
+    __tablename__ = "daily_status_counts"
+
+    day = Column(Date, primary_key=True)
+    doctor_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+# Append-only history of appointment changes, written in batches by audit.py
+class AppointmentAudit(Base):
+    __tablename__ = "appointment_audit_log"
+
+    id = Column(String, primary_key=True)
+    appointment_id = Column(String, nullable=False)
+    action = Column(String, nullable=False)  # created / updated / deleted
+    old_status = Column(String, nullable=True)
+    new_status = Column(String, nullable=True)
+    data = Column(Text, nullable=False)  # JSON snapshot of the appointment
+    changed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_audit_appointment_time", appointment_id, changed_at),
+    )
+
+
+# A recurring appointment stored once: its first occurrence and an
+# RRULE-style rule (recurrence.py). starts_on / ends_on bound the dates it
+# can occur on (ends_on NULL = endless) so window reads skip other series.
+class AppointmentSeries(Base):
+    __tablename__ = "appointment_series"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    patient_name = Column(String, nullable=False)
+    doctor_name = Column(String, nullable=False)
+    time_slot = Column(DateTime, nullable=False)  # first occurrence
+    duration = Column(Integer, nullable=True)
+    status = Column(String, default="waiting")
+    rrule = Column(String, nullable=False)
+    starts_on = Column(Date, nullable=False)
+    ends_on = Column(Date, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_series_doctor_start", doctor_name, starts_on),
+        Index("ix_series_patient_start", patient_name, starts_on),
+    )
+
+
+# Per-occurrence exceptions (cancelled) and overrides (any of time_slot,
+# duration, status set), keyed by the occurrence's original start
+class SeriesOverride(Base):
+    __tablename__ = "appointment_series_overrides"
+
+    series_id = Column(String, primary_key=True)
+    occurrence_start = Column(DateTime, primary_key=True)
+    cancelled = Column(Boolean, nullable=False, default=False)
+    time_slot = Column(DateTime, nullable=True)  # moved to; NULL = unchanged
+    duration = Column(Integer, nullable=True)
+    status = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_series_overrides_start", occurrence_start),
+        Index("ix_series_overrides_time", time_slot),
+    )
 
 from sqlalchemy import Column, String, Boolean, Integer
 from database import Base
@@ -34,3 +159,46 @@ class AppSettings(Base):
 
     two_factor_auth = Column(Boolean, default=False)
     session_timeout = Column(Boolean, default=True)
+
+
+# What GET /sync reports for deleted appointments: one row per deleted id,
+# written by a delete trigger with the deletion's change version
+class AppointmentTombstone(Base):
+    __tablename__ = "appointment_tombstones"
+
+    id = Column(String, primary_key=True)
+    doctor_name = Column(String, nullable=False)
+    version = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_tombstones_version", version),
+    )
+
+
+# Single row: the last change version handed out (SQLite; PostgreSQL uses
+# transaction ids) and the newest version whose tombstones were pruned
+class SyncClock(Base):
+    __tablename__ = "sync_clock"
+
+    id = Column(Integer, primary_key=True, default=1)
+    version = Column(BigInteger, nullable=False, default=1)
+    pruned_version = Column(BigInteger, nullable=False, default=0)
+
+
+# Responses to requests sent with an Idempotency-Key (idempotency.py, db
+# backend). status is NULL while the first request is still running;
+# expires_at is then a short claim, afterwards the retention.
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    status = Column(Integer, nullable=True)
+    headers = Column(Text, nullable=True)  # JSON [[name, value], ...]
+    body = Column(LargeBinary, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_idempotency_keys_expires", expires_at),
+    )
@@ -0,0 +1,19 @@
+"""
+Month-level occupancy bitmaps for the calendar view.
+
+A month is one integer with bit (day - 1) set when the doctor has at least
+one appointment that day, so a whole year is twelve integers of at most 31
+bits each (safe for JavaScript bitwise operators):
+
+    const busy = (months[m - 1] >> (day - 1)) & 1
+"""
+
+
+def month_bitmaps(year, days):
+    """Twelve bitmaps for `year` from an iterable of dates (others ignored)."""
+    months = [0] * 12
+    for day in days:
+        if day.year == year:
+            months[day.month - 1] |= 1 << (day.day - 1)
+    return months
+
@@ -0,0 +1,61 @@
+"""
+Keyset pagination and NDJSON streaming helpers.
+
+Appointment pages are ordered by (time_slot, id), patient pages by name,
+and the cursor is the position of the last row returned, so fetching page
+N costs the same as page 1 — no OFFSET scan — and rows inserted while
+paging never shift the window.
+"""
+
+import base64
+from datetime import date, datetime
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from serialization import dumps
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(time_slot, row_id):
+    raw = f"{time_slot.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        time_slot, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(time_slot), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_key_cursor(key):
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_key_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor.encode()).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(stmt, time_col, id_col, cursor):
+    stmt = stmt.order_by(time_col, id_col)
+    if cursor:
+        stmt = stmt.where(tuple_(time_col, id_col) > tuple_(*decode_cursor(cursor)))
+    return stmt
+
+
+def json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield dumps(dict(row)).decode() + "\n"
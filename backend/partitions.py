@@ -0,0 +1,313 @@
+"""
+Monthly partitioning and archival of `appointments` for long retention.
+
+PostgreSQL: `appointments` becomes a declarative RANGE-partitioned table
+with one partition per month (appointments_pYYYY_MM) plus a default
+partition. The partition key is queue_date, which always equals
+date(time_slot): partitioning on it keeps the (doctor_name, queue_date,
+queue_number) unique index enforceable (unique indexes on a partitioned
+table must contain the partition key) and gives the same monthly ranges.
+Queries prune partitions when they filter on queue_date, which the
+doctor/day, report and availability queries in main.py do.
+
+Future partitions are created ahead of time by `migrate.py`, by the
+app's background maintenance task and by `python partitions.py ensure`.
+Bookings further ahead land in the default partition and move into their
+month's partition when it is created.
+
+SQLite has no partitioning; archival there rolls cold rows over into an
+`appointments_archive` table in the same database instead.
+
+Archival (`python partitions.py archive --keep-months 24`) moves every
+month older than the retention window out of the hot table:
+
+- PostgreSQL: each cold partition is written to a gzip-compressed NDJSON
+  file in ARCHIVE_DIR (the compressed store), then detached and dropped.
+- SQLite: cold rows move into appointments_archive. The move leaves no
+  tombstones: /sync clients keep archived appointments.
+
+Report rollups and patient summaries keep counting archived visits; note
+that their `rebuild` commands recompute from live rows only.
+
+    python partitions.py convert    # one-off: partition an existing table (PostgreSQL)
+    python partitions.py ensure     # create partitions for the coming months
+    python partitions.py list
+    python partitions.py archive --keep-months 24 [--dry-run]
+"""
+
+import argparse
+import gzip
+import logging
+import os
+import re
+from datetime import date
+
+from sqlalchemy import inspect, text
+
+from database import engine, env_int
+from models import Appointment
+from pagination import ndjson_lines
+import sync
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = env_int("PARTITION_MONTHS_AHEAD", 3)
+ARCHIVE_AFTER_MONTHS = env_int("ARCHIVE_AFTER_MONTHS", 24)
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+MAINTENANCE_INTERVAL_SECONDS = 6 * 3600
+# pg_advisory_xact_lock key: one worker at a time creates partitions
+PARTITION_LOCK_KEY = 0x656D7270
+
+TABLE = Appointment.__tablename__
+ARCHIVE_TABLE = f"{TABLE}_archive"
+PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+# -------------------------
+# PostgreSQL partitions
+# -------------------------
+def is_partitioned(conn, table=TABLE):
+    if conn.dialect.name != "postgresql":
+        return False
+    return bool(conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+    ), {"table": table}).first())
+
+
+def partitions(conn):
+    """{first day of month: partition name}, oldest first."""
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": TABLE}).scalars()
+    months = {}
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match[1]), int(match[2]), 1)] = name
+    return dict(sorted(months.items()))
+
+
+def create_partition(conn, month):
+    """Create the month's partition; rows of that month already in the
+    default partition (PostgreSQL refuses the CREATE while it holds any)
+    are moved into it, all in the caller's transaction."""
+    name, default = partition_name(month), f"{TABLE}_default"
+    bounds = {"start": month, "end": add_months(month, 1)}
+    in_month = "queue_date >= :start AND queue_date < :end"
+    create = text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+    held = conn.execute(text(f"SELECT 1 FROM {default} WHERE {in_month} LIMIT 1"), bounds).first()
+    if not held:
+        conn.execute(create)
+        return
+
+    conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {default}"))
+    conn.execute(create)
+    # A move, not a deletion: no tombstones from the detached default
+    conn.execute(text(f"ALTER TABLE {default} DISABLE TRIGGER USER"))
+    conn.execute(text(f"INSERT INTO {name} SELECT * FROM {default} WHERE {in_month}"), bounds)
+    conn.execute(text(f"DELETE FROM {default} WHERE {in_month}"), bounds)
+    conn.execute(text(f"ALTER TABLE {default} ENABLE TRIGGER USER"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {default} DEFAULT"))
+
+
+def ensure_partitions(conn, first_month=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create monthly partitions from first_month (default: this month)
+    through months_ahead months from now. No-op unless partitioned.
+
+    Every worker runs this from its maintenance task; the advisory lock
+    (released at commit) lets one create the partitions at a time.
+    """
+    if not is_partitioned(conn):
+        return []
+    conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    existing = partitions(conn)
+    month = first_month or month_start(date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+    created = []
+    while month <= last:
+        if month not in existing:
+            create_partition(conn, month)
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def convert(conn):
+    """Rebuild `appointments` as a partitioned table, in one transaction.
+
+    Copies every row, so run it in a maintenance window on large tables.
+    """
+    if is_partitioned(conn):
+        return False
+
+    legacy = f"{TABLE}_unpartitioned"
+    for index in Appointment.__table__.indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE}_pkey TO {legacy}_pkey"))
+
+    conn.execute(text(
+        f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (queue_date)"
+    ))
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, queue_date)"))
+    conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+
+    oldest = conn.execute(text(f"SELECT min(queue_date) FROM {legacy}")).scalar()
+    ensure_partitions(conn, month_start(oldest) if oldest else None)
+
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {legacy}"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+
+    # On the parent (not CONCURRENTLY); each partition gets its own copy
+    for index in Appointment.__table__.indexes:
+        index.create(bind=conn)
+    # LIKE copies no triggers: put back the /sync version and tombstone ones
+    sync.install(conn)
+    return True
+
+
+# -------------------------
+# Archival
+# -------------------------
+def _export_partition(conn, name, directory):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.ndjson.gz")
+    rows = conn.execute(
+        text(f"SELECT * FROM {name} ORDER BY time_slot, id")
+        .execution_options(yield_per=5000)
+    ).mappings()
+    count = 0
+    with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+        for line in ndjson_lines(rows):
+            f.write(line)
+            count += 1
+    os.replace(path + ".tmp", path)
+    return path, count
+
+
+def _archive_partitions(conn, cutoff, directory, dry_run):
+    archived = []
+    for month, name in partitions(conn).items():
+        if add_months(month, 1) > cutoff:
+            break
+        if dry_run:
+            archived.append({"month": month.isoformat(), "partition": name})
+            continue
+        path, count = _export_partition(conn, name, directory)
+        conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        archived.append({"month": month.isoformat(), "rows": count, "file": path})
+    return archived
+
+
+def _sync_archive_columns(conn):
+    inspector = inspect(conn)
+    if not inspector.has_table(ARCHIVE_TABLE):
+        conn.execute(text(f"CREATE TABLE {ARCHIVE_TABLE} AS SELECT * FROM {TABLE} WHERE 0"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_{ARCHIVE_TABLE}_time ON {ARCHIVE_TABLE} (time_slot)"
+        ))
+        return
+    existing = {c["name"] for c in inspector.get_columns(ARCHIVE_TABLE)}
+    for column in Appointment.__table__.columns:
+        if column.name not in existing:
+            conn.execute(text(
+                f"ALTER TABLE {ARCHIVE_TABLE} ADD COLUMN {column.name} "
+                f"{column.type.compile(dialect=conn.dialect)}"
+            ))
+
+
+def _rollover(conn, cutoff, dry_run):
+    count = conn.execute(
+        text(f"SELECT count(*) FROM {TABLE} WHERE queue_date < :cutoff"),
+        {"cutoff": cutoff},
+    ).scalar()
+    if dry_run or not count:
+        return [{"before": cutoff.isoformat(), "rows": count}]
+
+    _sync_archive_columns(conn)
+    columns = ", ".join(c.name for c in Appointment.__table__.columns)
+    conn.execute(text(
+        f"INSERT INTO {ARCHIVE_TABLE} ({columns}) "
+        f"SELECT {columns} FROM {TABLE} WHERE queue_date < :cutoff"
+    ), {"cutoff": cutoff})
+    # Archived rows were not deleted: without its trigger for the move, the
+    # DELETE leaves no tombstones for /sync clients. DDL is transactional
+    # in SQLite, so no other writer runs without the trigger.
+    conn.execute(text("DROP TRIGGER IF EXISTS appointments_tombstone"))
+    conn.execute(text(f"DELETE FROM {TABLE} WHERE queue_date < :cutoff"), {"cutoff": cutoff})
+    sync.install(conn)
+    return [{"before": cutoff.isoformat(), "rows": count, "table": ARCHIVE_TABLE}]
+
+
+def archive(bind=engine, keep_months=ARCHIVE_AFTER_MONTHS, directory=ARCHIVE_DIR, dry_run=False):
+    """Move months older than `keep_months` out of the hot table."""
+    cutoff = add_months(month_start(date.today()), -keep_months)
+    with bind.begin() as conn:
+        if is_partitioned(conn):
+            return _archive_partitions(conn, cutoff, directory, dry_run)
+        if conn.dialect.name == "sqlite":
+            return _rollover(conn, cutoff, dry_run)
+    raise RuntimeError(f"{TABLE} is not partitioned; run `python partitions.py convert` first")
+
+
+# -------------------------
+# Background maintenance (started from the app lifespan on PostgreSQL)
+# -------------------------
+def maintain(bind=engine):
+    with bind.begin() as conn:
+        created = ensure_partitions(conn)
+    if created:
+        logger.info("Created partitions %s", ", ".join(created))
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition and archive appointments")
+    parser.add_argument("command", choices=["convert", "ensure", "list", "archive"])
+    parser.add_argument("--keep-months", type=int, default=ARCHIVE_AFTER_MONTHS)
+    parser.add_argument("--dir", default=ARCHIVE_DIR)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        for entry in archive(keep_months=args.keep_months, directory=args.dir, dry_run=args.dry_run):
+            print(entry)
+        return
+
+    with engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            parser.error(f"{args.command} needs PostgreSQL; on SQLite use `archive`")
+        if args.command == "convert":
+            print("Converted" if convert(conn) else "Already partitioned")
+        elif args.command == "ensure":
+            print(ensure_partitions(conn) or "Partitions up to date")
+        else:
+            for month, name in partitions(conn).items():
+                print(month.isoformat()[:7], name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""
+Ranked prefix / fuzzy patient name search behind GET /patients/search.
+
+Searches patient_summary (one row per patient). A trigram index supplies
+a bounded set of candidates, which `score()` ranks the same way on both
+backends: prefix matches first, then word-prefix and substring matches,
+then trigram similarity, so typos ("jonh smtih") still find the patient.
+
+- PostgreSQL: a pg_trgm GIN index on patient_summary.patient_name answers
+  both `ILIKE 'q%'` and the word-similarity operator `<%`. Being an index,
+  it is always in sync.
+- SQLite: an FTS5 table with the trigram tokenizer (`patient_search`),
+  kept in sync by triggers on patient_summary, so every code path that
+  adds or removes a patient (bookings, deletes, bulk import, rebuilds)
+  updates it. Candidates are name prefixes (primary key range) and
+  substrings (FTS); only when neither matches are misspelled words
+  retried with one transposition or deletion applied.
+
+`install(conn)` creates either one and is run by migrate.py.
+
+    python patient_search.py rebuild   # refill the SQLite FTS table
+"""
+
+import argparse
+
+from sqlalchemy import select, text
+
+from database import engine
+from models import PatientSummary
+
+FTS_TABLE = "patient_search"
+TRGM_INDEX = "ix_patient_summary_name_trgm"
+SIMILARITY_THRESHOLD = 0.4
+CANDIDATES_PER_RESULT = 10
+
+
+# -------------------------
+# Schema
+# -------------------------
+# FTS5 rows are found by the trigram index itself on delete (names shorter
+# than a trigram fall back to a scan); patient_summary has no stable integer
+# rowid to use as external content, since VACUUM may renumber it.
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    f"USING fts5(patient_name, tokenize='trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON patient_summary BEGIN
+            INSERT INTO {FTS_TABLE} (patient_name) VALUES (new.patient_name);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON patient_summary BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid IN (
+                SELECT rowid FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH '"' || replace(old.patient_name, '"', '""') || '"'
+                  AND patient_name = old.patient_name
+                UNION ALL
+                SELECT rowid FROM {FTS_TABLE}
+                WHERE length(old.patient_name) < 3 AND patient_name = old.patient_name
+                LIMIT 1
+            );
+        END""",
+]
+
+
+def install(conn):
+    """Create the search index; fills the FTS table when first created."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON patient_summary "
+            f"USING gin (patient_name gin_trgm_ops)"
+        ))
+        return
+
+    exists = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE name = :name"
+    ), {"name": FTS_TABLE}).first()
+    for statement in SQLITE_DDL:
+        conn.execute(text(statement))
+    if not exists:
+        rebuild(conn)
+
+
+def rebuild(conn):
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE} (patient_name) SELECT patient_name FROM patient_summary"
+    ))
+
+
+# -------------------------
+# Ranking
+# -------------------------
+def trigrams(value):
+    """pg_trgm-style trigrams: per lower-cased word, padded with two spaces
+    in front and one behind."""
+    grams = set()
+    for word in value.lower().split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    ta, tb = trigrams(a), trigrams(b)
+    if not ta or not tb:
+        return 0.0
+    return len(ta & tb) / len(ta | tb)
+
+
+def score(name, q):
+    """Prefix > word prefix > substring, then trigram similarity (0..1)."""
+    lowered, needle = name.lower(), q.lower()
+    if lowered.startswith(needle):
+        tier = 3
+    elif any(word.startswith(needle) for word in lowered.split()):
+        tier = 2
+    elif needle in lowered:
+        tier = 1
+    else:
+        tier = 0
+    return tier + similarity(name, q)
+
+
+def _phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _typo_variants(word):
+    """The word with one adjacent transposition or one deleted character,
+    plus its head and tail (covers a missing or wrong letter mid-word)."""
+    terms = {word}
+    terms.update(
+        word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(len(word) - 1)
+    )
+    terms.update(word[:i] + word[i + 1:] for i in range(len(word)))
+    if len(word) >= 6:
+        terms.update((word[:-2], word[2:]))
+    return sorted(t for t in terms if len(t) >= 3)
+
+
+# -------------------------
+# Search
+# -------------------------
+def _ranked(db, names, q, limit):
+    """Top `limit` candidates by score(), as [(PatientSummary, score)]."""
+    best = sorted(set(names), key=lambda n: (-score(n, q), n))[:limit]
+    if not best:
+        return []
+    rows = {
+        r.patient_name: r
+        for r in db.query(PatientSummary).filter(PatientSummary.patient_name.in_(best))
+    }
+    return [(rows[n], round(score(n, q), 3)) for n in best if n in rows]
+
+
+def _prefix_candidates(db, q, n):
+    """Name-prefix matches from the patient_summary primary key, for the
+    capitalisations people actually type."""
+    names = []
+    for prefix in {q, q.lower(), q.title()}:
+        names += db.scalars(
+            select(PatientSummary.patient_name).where(
+                PatientSummary.patient_name >= prefix,
+                PatientSummary.patient_name < prefix + "\U0010ffff",
+            ).order_by(PatientSummary.patient_name).limit(n)
+        ).all()
+    return names
+
+
+def _fts_candidates(db, query, n):
+    # no ORDER BY rank: bm25 would score every match, and score() re-ranks
+    return db.execute(text(
+        f"SELECT patient_name FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q LIMIT :n"
+    ), {"q": query, "n": n}).scalars().all()
+
+
+def _typo_query(db, q):
+    """FTS5 query requiring every word; words that match nowhere as typed
+    may match with one of their _typo_variants instead."""
+    groups = []
+    for word in q.lower().split():
+        if len(word) < 3:
+            continue
+        if len(word) < 4 or _fts_candidates(db, _phrase(word), 1):
+            groups.append(_phrase(word))
+        else:
+            groups.append("(" + " OR ".join(map(_phrase, _typo_variants(word))) + ")")
+    return " AND ".join(groups)
+
+
+def _search_sqlite(db, q, limit):
+    n = limit * CANDIDATES_PER_RESULT
+    names = _prefix_candidates(db, q, n)
+    if len(q) >= 3 and len(names) < limit:
+        # substring anywhere in the name (trigram index); prefix matches
+        # always outrank these, so skip it when there are enough of them
+        names += _fts_candidates(db, _phrase(q), n)
+    if not names:
+        fuzzy = _typo_query(db, q)
+        if fuzzy:
+            names = _fts_candidates(db, fuzzy, n)
+    return _ranked(db, names, q, limit)
+
+
+def _search_postgres(db, q, limit):
+    db.execute(
+        text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+        {"t": str(SIMILARITY_THRESHOLD)},
+    )
+    names = db.execute(text(
+        "SELECT patient_name FROM patient_summary "
+        "WHERE :q <% patient_name OR patient_name ILIKE :prefix "
+        "ORDER BY patient_name ILIKE :prefix DESC, "
+        "word_similarity(:q, patient_name) DESC, patient_name "
+        "LIMIT :n"
+    ), {"q": q, "prefix": _like_prefix(q), "n": limit * CANDIDATES_PER_RESULT}).scalars().all()
+    return _ranked(db, names, q, limit)
+
+
+def _like_prefix(q):
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def search(db, q, limit):
+    """[(PatientSummary, score)] best first."""
+    q = " ".join(q.split())
+    if not q:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, q, limit)
+    return _search_sqlite(db, q, limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the patient search index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            print("PostgreSQL uses a pg_trgm index; nothing to rebuild")
+            return
+        install(conn)
+        rebuild(conn)
+        count = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+    print(f"Indexed {count} patients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Incremental maintenance of the `patient_summary` table.
+
+Every appointment insert or delete adjusts one summary row in the same
+transaction, so `/patients` is a primary-key range read instead of a
+GROUP BY over all appointments. Visit counts and the latest visit do not
+depend on status, so status changes leave the summary untouched.
+
+A plain table is used on PostgreSQL too: a materialized view can only be
+refreshed wholesale, which is the full aggregate this replaces.
+
+    python patient_summary.py check     # diff the table against the live aggregate
+    python patient_summary.py rebuild   # recompute it from appointments
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import case, delete, func, select, update
+from database import engine, upsert_insert
+from models import Appointment, PatientSummary
+
+
+def record_visits(db, visits):
+    """Apply [{patient_name, visits, last_visit}] in one executemany."""
+    stmt = upsert_insert(db)(PatientSummary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PatientSummary.patient_name],
+        set_={
+            "visits": PatientSummary.visits + stmt.excluded.visits,
+            "last_visit": case(
+                (stmt.excluded.last_visit > PatientSummary.last_visit,
+                 stmt.excluded.last_visit),
+                else_=PatientSummary.last_visit,
+            ),
+        },
+    )
+    db.execute(stmt, sorted(visits, key=lambda v: v["patient_name"]))
+
+
+def record_visit(db, patient_name, time_slot):
+    record_visits(
+        db, [{"patient_name": patient_name, "visits": 1, "last_visit": time_slot}]
+    )
+
+
+def remove_visit(db, patient_name, time_slot):
+    """Call after the appointment row has been deleted and flushed."""
+    row = db.execute(
+        update(PatientSummary)
+        .where(PatientSummary.patient_name == patient_name)
+        .values(visits=PatientSummary.visits - 1)
+        .returning(PatientSummary.visits, PatientSummary.last_visit)
+    ).first()
+    if row is None:
+        return
+
+    if row.visits <= 0:
+        db.execute(
+            delete(PatientSummary).where(PatientSummary.patient_name == patient_name)
+        )
+    elif row.last_visit <= time_slot:
+        # The removed visit was the latest one; the patient/time index
+        # answers the new maximum without scanning other patients.
+        latest = db.scalar(
+            select(func.max(Appointment.time_slot))
+            .where(Appointment.patient_name == patient_name)
+        )
+        db.execute(
+            update(PatientSummary)
+            .where(PatientSummary.patient_name == patient_name)
+            .values(last_visit=latest)
+        )
+
+
+def live_aggregate():
+    return select(
+        Appointment.patient_name,
+        func.count(Appointment.id).label("visits"),
+        func.max(Appointment.time_slot).label("last_visit"),
+    ).group_by(Appointment.patient_name)
+
+
+def rebuild(conn):
+    conn.execute(delete(PatientSummary))
+    conn.execute(
+        PatientSummary.__table__.insert().from_select(
+            ["patient_name", "visits", "last_visit"], live_aggregate()
+        )
+    )
+
+
+def diff(conn):
+    """Return (patient_name, stored, live) for every row that disagrees."""
+    stored = {
+        r.patient_name: (r.visits, r.last_visit)
+        for r in conn.execute(select(PatientSummary))
+    }
+    live = {
+        r.patient_name: (r.visits, r.last_visit)
+        for r in conn.execute(live_aggregate())
+    }
+    return [
+        (name, stored.get(name), live.get(name))
+        for name in sorted(stored.keys() | live.keys())
+        if stored.get(name) != live.get(name)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild patient_summary")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.command == "rebuild":
+            rebuild(conn)
+        mismatches = diff(conn)
+
+    for name, stored, live in mismatches:
+        print(f"{name}: summary={stored} live={live}")
+    print(f"{len(mismatches)} mismatched patients")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
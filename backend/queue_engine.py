@@ -0,0 +1,366 @@
+"""
+Live queue positions and estimated waits per doctor and day (GET /queue).
+
+queue_number is handed out once at booking and never changes, so completed
+and cancelled appointments leave gaps. The engine keeps each (doctor, day)
+queue in memory as Fenwick trees indexed by queue_number over the pending
+appointments (not completed or cancelled): one counts them, one sums their
+explicit `duration`, one counts those on the clinic default duration. An
+appointment's position and the minutes booked ahead of it are prefix sums,
+and every status change is an O(log n) point update.
+
+The estimated wait is the minutes ahead times the doctor's pace that day:
+an EWMA of observed service time over booked time, measured between
+consecutive completions (from the audit log on load, live afterwards).
+
+Days are loaded from the database on first use, and today's for every
+doctor at startup. The engine follows changes through the event hub
+(events.py): with EVENTS_BACKEND=postgres every worker applies every
+change made by any worker. A day is also reloaded once it is
+QUEUE_RESYNC_SECONDS old, which bounds drift from writes that publish no
+event (bulk import) or several workers on the `local` event backend.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+
+from database import SessionLocal, env_int
+from models import Appointment, AppointmentAudit
+import events
+
+logger = logging.getLogger(__name__)
+
+QUEUE_RESYNC_SECONDS = env_int("QUEUE_RESYNC_SECONDS", 60)
+QUEUE_MAX_DAYS = env_int("QUEUE_MAX_DAYS", 2048)
+
+DONE_STATUSES = ("completed", "cancelled")
+PACE_ALPHA = 0.3
+PACE_MIN, PACE_MAX = 0.25, 4.0
+MAX_PENDING_EVENTS = 100000
+
+
+class Fenwick:
+    """Prefix sums over 1-based positions with O(log n) updates; grows."""
+
+    __slots__ = ("tree",)
+
+    def __init__(self, size=64):
+        self.tree = [0] * (size + 1)
+
+    def add(self, i, delta):
+        if i >= len(self.tree):
+            self._grow(i)
+        tree = self.tree
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i):
+        """Sum of positions 1..i."""
+        tree = self.tree
+        i = min(i, len(tree) - 1)
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _grow(self, i):
+        size = len(self.tree) - 1
+        values = [self.prefix(k) - self.prefix(k - 1) for k in range(1, size + 1)]
+        self.tree = [0] * (max(2 * size, i) + 1)
+        for k, value in enumerate(values, start=1):
+            if value:
+                self.add(k, value)
+
+
+class Entry(NamedTuple):
+    queue_number: int
+    duration: Optional[int]
+    time_slot: datetime
+    patient_name: str
+
+
+class DayQueue:
+    def __init__(self):
+        self.entries = {}  # pending appointment id -> Entry
+        self.count = Fenwick()
+        self.minutes = Fenwick()
+        self.defaults = Fenwick()
+        self.pace = 1.0
+        self.last_completed = None
+        self.loaded_at = time.monotonic()
+
+    def _index(self, entry, sign):
+        self.count.add(entry.queue_number, sign)
+        if entry.duration:
+            self.minutes.add(entry.queue_number, sign * entry.duration)
+        else:
+            self.defaults.add(entry.queue_number, sign)
+
+    def apply(self, appointment_id, status, entry, completed_at, default_minutes):
+        """Move one appointment to `status`; entry=None removes it."""
+        old = self.entries.pop(appointment_id, None)
+        if old is not None:
+            self._index(old, -1)
+        if entry is not None and status not in DONE_STATUSES:
+            self.entries[appointment_id] = entry
+            self._index(entry, 1)
+        elif old is not None and status == "completed":
+            self.completed(completed_at, old.duration or default_minutes)
+
+    def completed(self, at, booked_minutes):
+        """Fold the time since the previous completion into the pace."""
+        if self.last_completed is not None and booked_minutes:
+            observed = (at - self.last_completed).total_seconds() / 60
+            sample = max(observed / booked_minutes, PACE_MIN)
+            if sample <= PACE_MAX:  # longer gaps are idle time, not service
+                self.pace += PACE_ALPHA * (sample - self.pace)
+        self.last_completed = at
+
+    def ahead(self, entry, default_minutes):
+        """(appointments ahead, booked minutes ahead)."""
+        before = entry.queue_number - 1
+        return (
+            self.count.prefix(before),
+            self.minutes.prefix(before) + self.defaults.prefix(before) * default_minutes,
+        )
+
+
+def _entry(row):
+    return Entry(row.queue_number, row.duration, row.time_slot, row.patient_name)
+
+
+def _key(appointment):
+    return appointment["doctor_name"], date.fromisoformat(appointment["time_slot"][:10])
+
+
+def _payload_entry(appointment):
+    return Entry(
+        appointment["queue_number"], appointment["duration"],
+        datetime.fromisoformat(appointment["time_slot"]), appointment["patient_name"],
+    )
+
+
+# -------------------------
+# Engine
+# -------------------------
+class QueueEngine:
+    def __init__(self, resync_seconds=QUEUE_RESYNC_SECONDS, max_days=QUEUE_MAX_DAYS):
+        self.resync_seconds = resync_seconds
+        self.max_days = max_days
+        self.default_minutes = 30
+        self._days = OrderedDict()
+        self._loading = {}  # key -> one buffer of events per load in progress
+        self._lock = threading.Lock()
+        self._task = None
+
+    def _read(self, db, keys):
+        """Pending rows and today's pace for (doctor, day) keys, from the DB."""
+        doctors = {d for d, _ in keys}
+        days = {day for _, day in keys}
+        queues = {key: DayQueue() for key in keys}
+
+        rows = db.execute(
+            select(
+                Appointment.id, Appointment.doctor_name, Appointment.queue_date,
+                Appointment.queue_number, Appointment.duration,
+                Appointment.time_slot, Appointment.patient_name,
+            ).where(
+                Appointment.queue_date.in_(days),
+                Appointment.doctor_name.in_(doctors),
+                Appointment.status.notin_(DONE_STATUSES),
+            )
+        )
+        for row in rows:
+            queue = queues.get((row.doctor_name, row.queue_date))
+            if queue is not None:
+                queue.entries[row.id] = entry = _entry(row)
+                queue._index(entry, 1)
+
+        completions = db.execute(
+            select(
+                Appointment.doctor_name, Appointment.queue_date,
+                Appointment.duration, AppointmentAudit.changed_at,
+            ).join(
+                AppointmentAudit, AppointmentAudit.appointment_id == Appointment.id
+            ).where(
+                Appointment.queue_date.in_(days),
+                Appointment.doctor_name.in_(doctors),
+                AppointmentAudit.new_status == "completed",
+            ).order_by(AppointmentAudit.changed_at)
+        )
+        for row in completions:
+            queue = queues.get((row.doctor_name, row.queue_date))
+            if queue is not None:
+                queue.completed(row.changed_at, row.duration or self.default_minutes)
+        return queues
+
+    def _load(self, db, keys):
+        # Events arriving while the rows are read are buffered and applied
+        # on top: they carry full state in commit order, so replaying them
+        # over the snapshot leaves every appointment at its latest state.
+        buffer = []
+        with self._lock:
+            for key in keys:
+                self._loading.setdefault(key, []).append(buffer)
+
+        queues = None
+        try:
+            queues = self._read(db, keys)
+        finally:
+            with self._lock:
+                for key in keys:
+                    buffers = self._loading[key]
+                    buffers.remove(buffer)
+                    if not buffers:
+                        del self._loading[key]
+                if queues is not None:
+                    for evt in buffer:
+                        self._apply_one(queues[_key(evt["appointment"])], evt)
+                    for key, queue in queues.items():
+                        self._days[key] = queue
+                        self._days.move_to_end(key)
+                    while len(self._days) > self.max_days:
+                        self._days.popitem(last=False)
+        return queues
+
+    def day(self, db, doctor_name, day):
+        key = (doctor_name, day)
+        with self._lock:
+            queue = self._days.get(key)
+            if queue is not None and time.monotonic() - queue.loaded_at < self.resync_seconds:
+                self._days.move_to_end(key)
+                return queue
+        return self._load(db, [key])[key]
+
+    def warm(self, day=None):
+        """Load every doctor's queue for `day` (default today)."""
+        day = day or date.today()
+        with SessionLocal() as db:
+            doctors = db.scalars(
+                select(Appointment.doctor_name).distinct()
+                .where(Appointment.queue_date == day)
+            ).all()
+            if doctors:
+                self._load(db, [(d, day) for d in doctors])
+        return len(doctors)
+
+    def reset(self):
+        with self._lock:
+            self._days.clear()
+
+    def forget(self, doctor_name, day):
+        """Reload this queue from the database on next use."""
+        with self._lock:
+            self._days.pop((doctor_name, day), None)
+
+    # -------------------------
+    # Following changes
+    # -------------------------
+    def apply(self, batch):
+        """Apply change events (events.py format), on the event loop."""
+        with self._lock:
+            for evt in batch:
+                if evt["type"] == "resync":
+                    self._days.clear()  # missed events: reload lazily
+                    continue
+                key = _key(evt["appointment"])
+                for buffer in self._loading.get(key, ()):
+                    buffer.append(evt)
+                queue = self._days.get(key)
+                if queue is not None:
+                    self._apply_one(queue, evt)
+
+    def _apply_one(self, queue, evt):
+        appointment = evt["appointment"]
+        deleted = evt["type"] == "deleted"
+        queue.apply(
+            appointment["id"], appointment["status"],
+            None if deleted else _payload_entry(appointment),
+            datetime.utcnow(), self.default_minutes,
+        )
+
+    async def _follow(self, subscription):
+        try:
+            while True:
+                self.apply(await subscription.drain())
+        finally:
+            subscription.close()
+
+    async def start(self):
+        subscription = events.hub.subscribe(events.topic_key(), MAX_PENDING_EVENTS)
+        self._task = asyncio.create_task(self._follow(subscription))
+        try:
+            loaded = await asyncio.to_thread(self.warm)
+        except Exception:
+            logger.exception("Queue warm-up failed; days load on first use")
+        else:
+            logger.info("Queue engine warmed with %d doctors", loaded)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # -------------------------
+    # Reading
+    # -------------------------
+    def snapshot(self, db, doctor_name, day, settings, appointment_id=None):
+        """Pending queue in order with positions and estimated start times.
+
+        With appointment_id only that appointment is returned (O(log n)),
+        or None when it is not waiting in this queue.
+        """
+        self.default_minutes = settings.appointment_duration
+        queue = self.day(db, doctor_name, day)
+        opening = datetime.combine(day, datetime.strptime(settings.business_start, "%H:%M").time())
+        start = max(datetime.now(), opening)
+
+        with self._lock:
+            pace = queue.pace
+            if appointment_id is not None:
+                entry = queue.entries.get(appointment_id)
+                if entry is None:
+                    return None
+                ahead, minutes = queue.ahead(entry, self.default_minutes)
+                items = [(appointment_id, entry, ahead, minutes)]
+            else:
+                items, ahead, minutes = [], 0, 0
+                for appointment_id, entry in sorted(
+                    queue.entries.items(), key=lambda item: item[1].queue_number
+                ):
+                    items.append((appointment_id, entry, ahead, minutes))
+                    ahead += 1
+                    minutes += entry.duration or self.default_minutes
+            waiting = len(queue.entries)
+
+        def row(appointment_id, entry, ahead, minutes):
+            wait = round(minutes * pace)
+            return {
+                "id": appointment_id,
+                "patient_name": entry.patient_name,
+                "queue_number": entry.queue_number,
+                "time_slot": entry.time_slot,
+                "position": ahead + 1,
+                "wait_minutes": wait,
+                "eta": max(entry.time_slot, start + timedelta(minutes=wait)),
+            }
+
+        return {
+            "doctor": doctor_name,
+            "date": day,
+            "pace": round(pace, 3),
+            "waiting": waiting,
+            "queue": [row(*item) for item in items],
+        }
+
+
+queues = QueueEngine()
@@ -0,0 +1,42 @@
+"""
+Queue number allocation.
+
+Each (doctor, day) has one row in `queue_counters`. Allocating a number is
+a single upsert that increments the row and returns the new value, so it
+neither scans the day's appointments nor races with concurrent bookings:
+the counter row stays locked until the booking transaction commits, and a
+rolled-back booking also rolls back its number.
+"""
+
+from database import upsert_insert
+from models import QueueCounter
+
+
+def _counter_upsert(db):
+    stmt = upsert_insert(db)(QueueCounter)
+    return stmt.on_conflict_do_update(
+        index_elements=[QueueCounter.doctor_name, QueueCounter.day],
+        set_={"last_number": QueueCounter.last_number + stmt.excluded.last_number},
+    )
+
+
+def next_queue_number(db, doctor_name, day, count=1):
+    """Reserve `count` numbers and return the last one."""
+    stmt = _counter_upsert(db).returning(QueueCounter.last_number)
+    return db.execute(
+        stmt, {"doctor_name": doctor_name, "day": day, "last_number": count}
+    ).scalar_one()
+
+
+def reserve_queue_numbers(db, counts):
+    """Reserve counts[(doctor_name, day)] numbers for each key in one
+    executemany; returns {(doctor_name, day): last number reserved}.
+    Keys are locked in sorted order so concurrent imports cannot deadlock."""
+    stmt = _counter_upsert(db).returning(
+        QueueCounter.doctor_name, QueueCounter.day, QueueCounter.last_number
+    )
+    params = [
+        {"doctor_name": doctor_name, "day": day, "last_number": n}
+        for (doctor_name, day), n in sorted(counts.items())
+    ]
+    return {(d, day): last for d, day, last in db.execute(stmt, params)}
@@ -0,0 +1,220 @@
+"""
+RRULE-style recurrence rules (a subset of RFC 5545) and their expansion.
+
+Supported: FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, BYDAY (WEEKLY only, e.g.
+MO,TH), COUNT and UNTIL (YYYYMMDD or YYYYMMDDTHHMMSS). The first
+occurrence is the series' own time_slot; every occurrence keeps its time
+of day. A MONTHLY rule repeats on that day of the month and, as in RFC
+5545, skips months that do not have it (the 31st, February 30th).
+
+`occurrences(rule, dtstart, start, end)` seeks straight to `start`: the
+period containing it, and the index of its first occurrence (for COUNT),
+are computed rather than found by generating every earlier occurrence.
+
+    python recurrence.py "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=6" 2025-03-03T09:00
+"""
+
+import argparse
+from collections import deque
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+FREQS = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+MAX_INTERVAL = 1000
+MAX_COUNT = 10000
+
+
+class Rule(NamedTuple):
+    freq: str
+    interval: int = 1
+    byday: tuple = ()  # weekday numbers, 0 = Monday; () = dtstart's weekday
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[d] for d in self.byday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%dT%H%M%S}")
+        return ";".join(parts)
+
+
+def _parse_until(value):
+    value = value.rstrip("Z")
+    for fmt in ("%Y%m%dT%H%M%S", "%Y%m%d"):
+        try:
+            until = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # a bare date includes that whole day
+        return until if "T" in value else until + timedelta(days=1, microseconds=-1)
+    raise ValueError(f"UNTIL must be YYYYMMDD or YYYYMMDDTHHMMSS, not '{value}'")
+
+
+def _positive(name, value, limit):
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, not '{value}'")
+    if not 1 <= number <= limit:
+        raise ValueError(f"{name} must be between 1 and {limit}")
+    return number
+
+
+@lru_cache(maxsize=4096)
+def parse(text):
+    """Rule for an RRULE string; ValueError says what is wrong with it."""
+    text = text.strip()
+    if text.upper().startswith("RRULE:"):
+        text = text[6:]
+    fields = {}
+    for part in filter(None, text.split(";")):
+        name, sep, value = part.partition("=")
+        name = name.strip().upper()
+        if not sep or not value.strip():
+            raise ValueError(f"Expected NAME=VALUE, got '{part}'")
+        if name in fields:
+            raise ValueError(f"{name} is given twice")
+        fields[name] = value.strip().upper()
+
+    unsupported = set(fields) - {"FREQ", "INTERVAL", "BYDAY", "COUNT", "UNTIL"}
+    if unsupported:
+        raise ValueError(f"Unsupported rule parts: {', '.join(sorted(unsupported))}")
+    freq = fields.get("FREQ")
+    if freq not in FREQS:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQS)}")
+
+    byday = ()
+    if "BYDAY" in fields:
+        if freq != "WEEKLY":
+            raise ValueError("BYDAY is only supported with FREQ=WEEKLY")
+        days = fields["BYDAY"].split(",")
+        unknown = [d for d in days if d not in WEEKDAYS]
+        if unknown:
+            raise ValueError(f"Unknown BYDAY values: {', '.join(unknown)}")
+        byday = tuple(sorted({WEEKDAYS.index(d) for d in days}))
+
+    return Rule(
+        freq=freq,
+        interval=_positive("INTERVAL", fields.get("INTERVAL", "1"), MAX_INTERVAL),
+        byday=byday,
+        count=_positive("COUNT", fields["COUNT"], MAX_COUNT) if "COUNT" in fields else None,
+        until=_parse_until(fields["UNTIL"]) if "UNTIL" in fields else None,
+    )
+
+
+def check(rule, dtstart):
+    """ValueError unless dtstart is the rule's first occurrence."""
+    if rule.byday and dtstart.weekday() not in rule.byday:
+        raise ValueError(
+            f"The first occurrence ({WEEKDAYS[dtstart.weekday()]}) must be one of BYDAY"
+        )
+    if rule.until is not None and rule.until < dtstart:
+        raise ValueError("UNTIL is before the first occurrence")
+
+
+# -------------------------
+# Expansion
+# -------------------------
+# Each generator yields (index, start) from the period containing `start`
+# on; index counts occurrences from dtstart (0-based) for COUNT.
+def _daily(rule, dtstart, start):
+    step = timedelta(days=rule.interval)
+    k = -((dtstart - start) // step) if start > dtstart else 0  # ceil
+    while True:
+        yield k, dtstart + k * step
+        k += 1
+
+
+def _weekly(rule, dtstart, start):
+    days = rule.byday or (dtstart.weekday(),)
+    monday = dtstart - timedelta(days=dtstart.weekday())
+    first_week = [d for d in days if d >= dtstart.weekday()]
+    n = max(0, (start - monday).days // 7 // rule.interval)
+    index = len(first_week) + (n - 1) * len(days) if n else 0
+    while True:
+        week = monday + timedelta(weeks=n * rule.interval)
+        for d in (days if n else first_week):
+            yield index, week + timedelta(days=d)
+            index += 1
+        n += 1
+
+
+def _add_months(dt, months):
+    """dt moved `months` ahead, or None when that month lacks its day."""
+    month = dt.month - 1 + months
+    try:
+        return dt.replace(year=dt.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None
+
+
+def _monthly(rule, dtstart, start):
+    months = (start.year - dtstart.year) * 12 + start.month - dtstart.month
+    n = max(0, months // rule.interval)
+    if dtstart.day <= 28:
+        index = n
+    else:  # skipped months do not count: walk them (12 steps per year)
+        index = sum(
+            _add_months(dtstart, i * rule.interval) is not None for i in range(n)
+        )
+    while True:
+        at = _add_months(dtstart, n * rule.interval)
+        if at is not None:
+            yield index, at
+            index += 1
+        n += 1
+
+
+GENERATORS = {"DAILY": _daily, "WEEKLY": _weekly, "MONTHLY": _monthly}
+
+
+def occurrences(rule, dtstart, start=None, end=None):
+    """Occurrence starts in [start, end), in order; lazy and unbounded
+    when the rule and `end` are."""
+    start = max(start or dtstart, dtstart)
+    for index, at in GENERATORS[rule.freq](rule, dtstart, start):
+        if rule.count is not None and index >= rule.count:
+            return
+        if rule.until is not None and at > rule.until:
+            return
+        if end is not None and at >= end:
+            return
+        if at >= start:
+            yield at
+
+
+def is_occurrence(rule, dtstart, at):
+    return next(occurrences(rule, dtstart, at, at + timedelta(seconds=1)), None) == at
+
+
+def last_occurrence(rule, dtstart):
+    """The final occurrence (at most UNTIL), or None for an endless rule."""
+    if rule.count is not None:
+        return deque(occurrences(rule, dtstart), maxlen=1)[0]
+    return rule.until
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a rule's occurrences")
+    parser.add_argument("rule")
+    parser.add_argument("dtstart", type=datetime.fromisoformat)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rule = parse(args.rule)
+    check(rule, args.dtstart)
+    print(rule)
+    for i, at in zip(range(args.limit), occurrences(rule, args.dtstart)):
+        print(f"{i + 1:>4}  {at:%a %Y-%m-%d %H:%M}")
+
+
+if __name__ == "__main__":
+    main()
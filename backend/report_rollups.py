@@ -0,0 +1,101 @@
+"""
+Per-(day, doctor, status) appointment counters behind the /reports endpoints.
+
+Each booking, status change or delete adjusts the affected counters in the
+same transaction, so reports sum at most one row per doctor and status for
+each day instead of loading appointments.
+
+    python report_rollups.py check     # diff the rollup against the live aggregate
+    python report_rollups.py rebuild   # recompute it from appointments
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import delete, func, select
+from database import engine, upsert_insert
+from models import Appointment, DailyStatusCount
+
+
+def bump_many(db, counts):
+    """Add counts[(day, doctor_name, status)] to each counter in one executemany."""
+    stmt = upsert_insert(db)(DailyStatusCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            DailyStatusCount.day,
+            DailyStatusCount.doctor_name,
+            DailyStatusCount.status,
+        ],
+        set_={"count": DailyStatusCount.count + stmt.excluded.count},
+    )
+    db.execute(stmt, [
+        {"day": day, "doctor_name": doctor_name, "status": status, "count": n}
+        for (day, doctor_name, status), n in sorted(counts.items())
+    ])
+
+
+def bump(db, day, doctor_name, status, delta=1):
+    bump_many(db, {(day, doctor_name, status): delta})
+
+
+def move(db, day, doctor_name, old_status, new_status):
+    if old_status == new_status:
+        return
+    bump(db, day, doctor_name, old_status, -1)
+    bump(db, day, doctor_name, new_status, 1)
+
+
+def live_aggregate():
+    return select(
+        Appointment.queue_date,
+        Appointment.doctor_name,
+        Appointment.status,
+        func.count(Appointment.id),
+    ).group_by(Appointment.queue_date, Appointment.doctor_name, Appointment.status)
+
+
+def rebuild(conn):
+    conn.execute(delete(DailyStatusCount))
+    conn.execute(
+        DailyStatusCount.__table__.insert().from_select(
+            ["day", "doctor_name", "status", "count"], live_aggregate()
+        )
+    )
+
+
+def diff(conn):
+    """Return ((day, doctor, status), stored, live) for every mismatch."""
+    stored = {
+        (r.day, r.doctor_name, r.status): r.count
+        for r in conn.execute(select(DailyStatusCount))
+        if r.count
+    }
+    live = {
+        (day, doctor, status): count
+        for day, doctor, status, count in conn.execute(live_aggregate())
+    }
+    return [
+        (key, stored.get(key), live.get(key))
+        for key in sorted(stored.keys() | live.keys(), key=str)
+        if stored.get(key) != live.get(key)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or rebuild daily_status_counts")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.command == "rebuild":
+            rebuild(conn)
+        mismatches = diff(conn)
+
+    for key, stored, live in mismatches:
+        print(f"{key}: rollup={stored} live={live}")
+    print(f"{len(mismatches)} mismatched counters")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Response cache for read-heavy endpoints (/appointments/dates, /patients,
+/reports/*, GET /settings).
+
+Endpoints wrap their body in `respond(request, namespaces, compute)`. The
+JSON body is cached under the request path + query string together with
+the current generation of each namespace it depends on, and every response
+carries a strong ETag; a matching `If-None-Match` gets a bodyless 304.
+
+Mutating endpoints call `invalidate(db, *namespaces)` before committing.
+Like change events, invalidations only apply once the transaction commits:
+they bump the namespace generations, so stale entries are never read again
+and simply age out of the LRU.
+
+Backends (CACHE_BACKEND):
+
+- `memory` (default): per-process LRU with a TTL. Invalidations reach only
+  the worker that committed; other workers serve at most CACHE_TTL seconds
+  of stale data.
+- `redis`: shared entries and generations in Redis (CACHE_REDIS_URL), so
+  invalidation is immediate across workers. Needs the `redis` package.
+- `off`: compute every response (ETags and 304s still work).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from database import env_int
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL = env_int("CACHE_TTL", 60)
+CACHE_MAX_ENTRIES = env_int("CACHE_MAX_ENTRIES", 1024)
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Response headers stored with the body (pagination cursor)
+CACHED_HEADERS = ("x-next-cursor",)
+
+
+# -------------------------
+# Backends
+# -------------------------
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def generations(self, namespaces):
+        with self._lock:
+            return [self._generations[ns] for ns in namespaces]
+
+    def bump(self, namespaces):
+        with self._lock:
+            for ns in namespaces:
+                self._generations[ns] += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    name = "redis"
+    prefix = "emr:cache:"
+
+    def __init__(self, url=CACHE_REDIS_URL, ttl=CACHE_TTL):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(f"{self.prefix}entry:*"))
+
+    def generations(self, namespaces):
+        values = self.client.mget([f"{self.prefix}gen:{ns}" for ns in namespaces])
+        return [int(v or 0) for v in values]
+
+    def bump(self, namespaces):
+        pipe = self.client.pipeline(transaction=False)
+        for ns in namespaces:
+            pipe.incr(f"{self.prefix}gen:{ns}")
+        pipe.execute()
+
+    def get(self, key):
+        value = self.client.get(f"{self.prefix}entry:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(f"{self.prefix}entry:{key}", json.dumps(value), ex=self.ttl)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f"{self.prefix}entry:*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullBackend(MemoryBackend):
+    name = "off"
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+BACKENDS = {"memory": MemoryBackend, "redis": RedisBackend, "off": NullBackend}
+backend = BACKENDS[CACHE_BACKEND]()
+
+stats = {"hits": Counter(), "misses": Counter(), "not_modified": 0, "invalidations": Counter()}
+
+
+def snapshot():
+    """Hit/miss counters per namespace (served by GET /cache/stats)."""
+    return {
+        "backend": backend.name,
+        "entries": len(backend),
+        "hits": dict(stats["hits"]),
+        "misses": dict(stats["misses"]),
+        "not_modified": stats["not_modified"],
+        "invalidations": dict(stats["invalidations"]),
+    }
+
+
+# -------------------------
+# Serving
+# -------------------------
+def _etag(body):
+    return '"' + hashlib.blake2b(body.encode(), digest_size=12).hexdigest() + '"'
+
+
+def _not_modified(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (t.strip() for t in header.split(","))
+
+
+def respond(request, namespaces, compute, response=None):
+    """Serve compute()'s JSON from the cache, honouring If-None-Match.
+
+    `response` is the endpoint's injected Response; cursor headers that
+    compute() sets on it are cached alongside the body.
+    """
+    label = namespaces[0].split(":")[0]
+    key = entry = None
+    try:
+        generations = backend.generations(namespaces)
+        key = "|".join(
+            [f"{ns}@{gen}" for ns, gen in zip(namespaces, generations)]
+            + [request.url.path, str(request.query_params)]
+        )
+        entry = backend.get(key)
+    except Exception:
+        logger.exception("Cache read failed; computing response")
+
+    if entry is not None:
+        stats["hits"][label] += 1
+    else:
+        stats["misses"][label] += 1
+        body = dumps(compute()).decode()
+        headers = {}
+        if response is not None:
+            headers = {
+                k: v for k, v in response.headers.items() if k in CACHED_HEADERS
+            }
+        entry = {"body": body, "etag": _etag(body), "headers": headers}
+        try:
+            if key is not None:
+                backend.set(key, entry)
+        except Exception:
+            logger.exception("Cache write failed")
+
+    headers = {
+        **entry["headers"],
+        "ETag": entry["etag"],
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, entry["etag"]):
+        stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry["body"], media_type="application/json", headers=headers)
+
+
+# -------------------------
+# Invalidation
+# -------------------------
+def invalidate(db, *namespaces):
+    """Drop cached responses for the namespaces once `db` commits."""
+    db.info.setdefault("cache_invalidations", set()).update(namespaces)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    namespaces = session.info.pop("cache_invalidations", None)
+    if namespaces:
+        stats["invalidations"].update(namespaces)
+        try:
+            backend.bump(sorted(namespaces))
+        except Exception:
+            logger.exception("Cache invalidation failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("cache_invalidations", None)
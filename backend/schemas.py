@@ -1,10 +1,17 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from datetime import date, datetime
+from typing import Optional
 
+from availability import MAX_APPOINTMENT_MINUTES
+
+
+# Durations everywhere are bounded as /availability's are: the overlap
+# check only looks MAX_APPOINTMENT_MINUTES back for earlier bookings.
 class AppointmentCreate(BaseModel):
     patient_name: str
     doctor_name: str
     time_slot: datetime
+    duration: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
     status: str = "waiting"
     
 
@@ -13,12 +20,80 @@ class AppointmentOut(BaseModel):
     patient_name: str
     doctor_name: str
     time_slot: datetime
+    duration: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
     queue_number: int
     status: str
+    series_id: Optional[str] = None
 
     class Config:
         from_attributes = True
 
+
+# The columns listing endpoints select: exactly AppointmentOut, read into
+# plain dicts (no queue_date / created_at, no Appointment objects)
+APPOINTMENT_OUT_FIELDS = tuple(AppointmentOut.model_fields)
+
+
+class PatientDetailsOut(BaseModel):
+    patient_name: str
+    total_visits: int
+    appointments: list[AppointmentOut]
+
+
+class StatusChange(BaseModel):
+    id: str
+    status: str
+
+
+class SeriesCreate(BaseModel):
+    patient_name: str
+    doctor_name: str
+    time_slot: datetime  # first occurrence
+    duration: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
+    status: str = "waiting"
+    rrule: str  # e.g. "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=12"
+
+
+class SeriesOut(SeriesCreate):
+    id: str
+    starts_on: date
+    ends_on: Optional[date] = None
+
+    class Config:
+        from_attributes = True
+
+
+class OccurrenceUpdate(BaseModel):
+    time_slot: Optional[datetime] = None
+    duration: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
+    status: Optional[str] = None
+
+
+class OccurrenceOut(BaseModel):
+    id: str  # "<series_id>:<occurrence_start>"
+    series_id: str
+    occurrence_start: datetime
+    patient_name: str
+    doctor_name: str
+    time_slot: datetime
+    duration: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
+    status: str
+    appointment_id: Optional[str] = None  # set once booked
+    queue_number: Optional[int] = None
+
+
+class SyncedAppointment(AppointmentOut):
+    version: int
+
+
+class SyncOut(BaseModel):
+    version: int  # pass back as `since`
+    more: bool  # another page is waiting
+    reset: bool  # drop local data first: `since` is too old
+    appointments: list[SyncedAppointment]
+    deleted: list[str]  # appointment ids
+
+
 class SettingsOut(BaseModel):
     clinic_name: str
     timezone: str
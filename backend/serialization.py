@@ -0,0 +1,35 @@
+"""
+Fast JSON encoding for responses (orjson).
+
+orjson encodes dicts, lists, str/int/float, datetime and date natively and
+far faster than json.dumps over jsonable_encoder's output. Anything else
+(pydantic models, Decimal, ...) falls back to jsonable_encoder, value by
+value.
+
+ORJSONResponse is the app's default response class. Hot listing endpoints
+return it directly over plain row dicts from column-only selects: FastAPI
+then skips jsonable_encoder and response_model validation for them, and
+no Appointment objects are built at all. (FastAPI ships its own
+ORJSONResponse, deprecated in favour of Pydantic serialization, which
+warns on every response; this one does not.)
+"""
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def dumps(value):
+    """JSON bytes for `value`."""
+    return orjson.dumps(value, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content):
+        return dumps(content)
+
+
+def row_dicts(result):
+    """A SQLAlchemy result's rows as plain dicts keyed by column name."""
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
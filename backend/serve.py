@@ -0,0 +1,150 @@
+"""
+Production entry point: migrate once, preload the app, fork the workers.
+
+    python serve.py --migrate --workers 4 --port 8000
+
+The parent process runs the migration (with --migrate), imports main (and
+with it FastAPI, SQLAlchemy, pydantic and every mapper) once, binds the
+listening socket and then forks the workers, which share all of it
+copy-on-write. A worker therefore starts in the time its lifespan takes
+(pool pre-fill, queue and query warm-up) rather than a fresh interpreter
+plus imports, and no worker runs DDL or reflection.
+
+Database connections never cross the fork: the parent closes the ones the
+migration left in the pool before forking. The parent restarts workers
+that die and turns SIGINT/SIGTERM into one graceful shutdown of all of
+them. With --workers 1, or where os.fork is missing, it serves in process.
+
+With several workers, set PROMETHEUS_MULTIPROC_DIR (see metrics.py) and
+EVENTS_BACKEND=postgres (see events.py).
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from database import env_int
+
+logger = logging.getLogger("emr.serve")
+
+RESTART_BACKOFF_SECONDS = 1
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload(run_migrations):
+    """Import the app in the parent; returns it."""
+    if run_migrations:
+        from migrate import migrate
+        migrate()
+
+    from main import app
+    from database import engine
+
+    engine.pool.dispose()  # keeps the (instrumented) pool, closes its connections
+    # Objects that exist now are shared with every worker; keep the
+    # collector from touching (and so copying) their pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def serve(app, sock, args):
+    config = uvicorn.Config(
+        app,
+        log_level=args.log_level,
+        access_log=args.access_log,
+        proxy_headers=True,
+        timeout_keep_alive=args.keep_alive,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def supervise(app, sock, args):
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            os.setpgid(0, 0)  # a terminal Ctrl-C reaches the parent only
+            code = 0
+            try:
+                serve(app, sock, args)
+            except BaseException:
+                logger.exception("Worker %d crashed", os.getpid())
+                code = 1
+            finally:
+                os._exit(code)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if stopping:
+            return
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    logger.info("Started %d workers on %s:%d", args.workers, args.host, args.port)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited (status %d); restarting", pid, status)
+        if time.monotonic() - started < RESTART_BACKOFF_SECONDS:
+            time.sleep(RESTART_BACKOFF_SECONDS)
+        spawn()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the EMR API with preforked workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=env_int("WEB_CONCURRENCY", os.cpu_count() or 1))
+    parser.add_argument("--migrate", action="store_true", help="run migrate.py before forking")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(levelname)s: %(message)s")
+
+    app = preload(args.migrate)
+    sock = bind_socket(args.host, args.port, args.backlog)
+    if args.workers > 1 and hasattr(os, "fork"):
+        supervise(app, sock, args)
+    else:
+        serve(app, sock, args)
+
+
+if __name__ == "__main__":
+    main()
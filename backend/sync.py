@@ -0,0 +1,215 @@
+"""
+Incremental sync for offline clients (GET /sync).
+
+Every appointments row carries a change version, and every deleted
+appointment leaves a row in appointment_tombstones with the version of its
+deletion. A client keeps the `version` of its last sync and asks for what
+changed after it; with nothing changed the answer is an empty page.
+
+Versions are set by the database, in triggers installed by migrate.py, so
+every write path (the API, bulk imports, series bookings, raw SQL) is
+covered:
+
+- SQLite: a counter in sync_clock, bumped per row changed. SQLite runs one
+  writer at a time, so versions are handed out in commit order.
+- PostgreSQL: the id of the writing transaction. Transactions can commit
+  out of id order, so a sync only reports versions below the oldest
+  transaction still running (`pg_snapshot_xmin`); anything newer is
+  picked up by the next sync, nothing is skipped.
+
+Tombstones older than SYNC_TOMBSTONE_DAYS can be pruned
+(`python sync.py prune`); a client that last synced before the pruned
+versions gets `reset`: drop local data and take the full listing again.
+Tombstones keep deleted appointments out of the appointments table, so no
+other query has to skip them.
+"""
+
+import argparse
+import heapq
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text, update
+
+from database import SessionLocal, env_int, upsert_insert
+from models import Appointment, AppointmentTombstone, SyncClock
+from schemas import APPOINTMENT_OUT_FIELDS
+
+SYNC_PAGE_SIZE = env_int("SYNC_PAGE_SIZE", 5000)
+SYNC_TOMBSTONE_DAYS = env_int("SYNC_TOMBSTONE_DAYS", 90)
+
+COLUMNS = tuple(getattr(Appointment, f) for f in APPOINTMENT_OUT_FIELDS) + (Appointment.version,)
+
+SQLITE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS appointments_version_insert
+        AFTER INSERT ON appointments
+        BEGIN
+            UPDATE sync_clock SET version = version + 1;
+            UPDATE appointments SET version = (SELECT version FROM sync_clock)
+            WHERE rowid = new.rowid;
+        END""",
+    # The version update itself does not count as a change
+    """CREATE TRIGGER IF NOT EXISTS appointments_version_update
+        AFTER UPDATE ON appointments WHEN new.version IS old.version
+        BEGIN
+            UPDATE sync_clock SET version = version + 1;
+            UPDATE appointments SET version = (SELECT version FROM sync_clock)
+            WHERE rowid = new.rowid;
+        END""",
+    """CREATE TRIGGER IF NOT EXISTS appointments_tombstone
+        AFTER DELETE ON appointments
+        BEGIN
+            UPDATE sync_clock SET version = version + 1;
+            INSERT OR REPLACE INTO appointment_tombstones (id, doctor_name, version, deleted_at)
+            VALUES (
+                old.id, old.doctor_name, (SELECT version FROM sync_clock),
+                strftime('%Y-%m-%d %H:%M:%f', 'now')
+            );
+        END""",
+]
+
+POSTGRES_DDL = [
+    """CREATE OR REPLACE FUNCTION appointments_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := pg_current_xact_id()::text::bigint;
+            RETURN NEW;
+        END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS appointments_version ON appointments",
+    """CREATE TRIGGER appointments_version BEFORE INSERT OR UPDATE ON appointments
+        FOR EACH ROW EXECUTE FUNCTION appointments_version()""",
+    """CREATE OR REPLACE FUNCTION appointments_tombstone() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO appointment_tombstones (id, doctor_name, version, deleted_at)
+            VALUES (
+                OLD.id, OLD.doctor_name, pg_current_xact_id()::text::bigint,
+                now() AT TIME ZONE 'utc'
+            )
+            ON CONFLICT (id) DO UPDATE
+            SET version = EXCLUDED.version, deleted_at = EXCLUDED.deleted_at;
+            RETURN OLD;
+        END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS appointments_tombstone ON appointments",
+    """CREATE TRIGGER appointments_tombstone AFTER DELETE ON appointments
+        FOR EACH ROW EXECUTE FUNCTION appointments_tombstone()""",
+]
+
+
+def install(conn):
+    """Create the clock row and the version / tombstone triggers."""
+    conn.execute(upsert_insert(conn)(SyncClock).values(id=1).on_conflict_do_nothing())
+    ddl = POSTGRES_DDL if conn.dialect.name == "postgresql" else SQLITE_DDL
+    for statement in ddl:
+        conn.execute(text(statement))
+
+
+def backfill(conn):
+    """Version 1 for rows written before versions existed (migrate.py)."""
+    conn.execute(
+        update(Appointment).where(Appointment.version.is_(None))
+        .values(version=1, updated_at=func.coalesce(Appointment.created_at, datetime.utcnow()))
+    )
+
+
+# -------------------------
+# Reading changes
+# -------------------------
+def watermark(db):
+    """Highest version every change up to which is committed and visible.
+    Read before the changes themselves."""
+    if db.get_bind().dialect.name == "postgresql":
+        return db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")) - 1
+    return db.scalar(select(SyncClock.version))
+
+
+def _changed(db, since, upto, doctor_name, limit=None, version=None):
+    where = [Appointment.version > since, Appointment.version <= upto]
+    gone = [AppointmentTombstone.version > since, AppointmentTombstone.version <= upto]
+    if version is not None:
+        where, gone = [Appointment.version == version], [AppointmentTombstone.version == version]
+    if doctor_name is not None:
+        where.append(Appointment.doctor_name == doctor_name)
+        gone.append(AppointmentTombstone.doctor_name == doctor_name)
+
+    rows = select(*COLUMNS).where(*where).order_by(Appointment.version, Appointment.id)
+    tombstones = (
+        select(AppointmentTombstone.version, AppointmentTombstone.id).where(*gone)
+        .order_by(AppointmentTombstone.version, AppointmentTombstone.id)
+    )
+    if limit is not None:
+        rows, tombstones = rows.limit(limit), tombstones.limit(limit)
+
+    keys = tuple(c.key for c in COLUMNS)
+    changed = ((r.version, dict(zip(keys, r))) for r in db.execute(rows))
+    deleted = ((t.version, t.id) for t in db.execute(tombstones))
+    return list(heapq.merge(changed, deleted, key=lambda change: change[0]))
+
+
+def changes(db, since=0, limit=SYNC_PAGE_SIZE, doctor_name=None):
+    """Appointments changed and ids deleted after version `since`, at most
+    about `limit` of them. Pages end between versions, so `version` of the
+    answer is always a valid `since`; `more` asks for another page."""
+    upto = watermark(db)
+    clock = db.get(SyncClock, 1)
+    # tombstones after `since` are gone, or `since` is from another database
+    reset = 0 < since < clock.pruned_version or since > upto
+    if reset:
+        since = 0
+
+    page = _changed(db, since, upto, doctor_name, limit + 1)
+    more = len(page) > limit
+    if more:
+        boundary = page[limit][0]
+        page = [change for change in page if change[0] < boundary]
+        if page:
+            upto = boundary - 1
+        else:  # one version holds more than a page: send all of it
+            page = _changed(db, since, upto, doctor_name, version=boundary)
+            more, upto = boundary < upto, boundary
+
+    appointments, deleted = [], []
+    for _, change in page:
+        if isinstance(change, dict):
+            appointments.append(change)
+        elif since:  # a first sync has nothing to delete
+            deleted.append(change)
+    return {
+        "version": upto,
+        "more": more,
+        "reset": reset,
+        "appointments": appointments,
+        "deleted": deleted,
+    }
+
+
+# -------------------------
+# Tombstone pruning
+# -------------------------
+def prune(db, days=SYNC_TOMBSTONE_DAYS):
+    """Drop tombstones older than `days`; returns how many."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    newest = db.scalar(
+        select(func.max(AppointmentTombstone.version))
+        .where(AppointmentTombstone.deleted_at < cutoff)
+    )
+    if newest is None:
+        return 0
+    count = db.execute(
+        delete(AppointmentTombstone).where(AppointmentTombstone.version <= newest)
+    ).rowcount
+    clock = db.get(SyncClock, 1)
+    clock.pruned_version = max(clock.pruned_version, newest)
+    db.commit()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune old sync tombstones")
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--days", type=int, default=SYNC_TOMBSTONE_DAYS)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        print(f"Pruned {prune(db, args.days)} tombstones older than {args.days} days")
+
+
+if __name__ == "__main__":
+    main()
@@ -29,10 +29,21 @@ export default function Dashboard() {
   // ---------------------------
   const fetchAppointments = async () => {
     try {
-      const res = await fetch(`${API_URL}/appointments/all`);
-      if (!res.ok) return;
-      const data = await res.json();
-      setAppointments(data);
+      const all: Appointment[] = [];
+      let cursor: string | null = null;
+
+      // Pages are keyset-based; follow X-Next-Cursor until it is absent
+      do {
+        const params = new URLSearchParams({ limit: "5000" });
+        if (cursor) params.set("cursor", cursor);
+
+        const res = await fetch(`${API_URL}/appointments/all?${params}`);
+        if (!res.ok) return;
+        all.push(...(await res.json()));
+        cursor = res.headers.get("X-Next-Cursor");
+      } while (cursor);
+
+      setAppointments(all);
     } catch (err) {
       console.error("Failed to load dashboard data", err);
     }